@@ -1,5 +1,6 @@
 import adsk.core, adsk.fusion, adsk.cam, traceback
 import math
+import time
 
 # Global variables for application and UI
 _app = adsk.core.Application.cast(None)
@@ -62,6 +63,13 @@ class TurbineCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             airfoilTurbineParametersInputs.addValueInput('chordLength', 'Chord Length', 'in', adsk.core.ValueInput.createByString('3.0 in'))
             airfoilTurbineParametersInputs.addValueInput('distanceFromCenter', 'Distance from Center', 'in', adsk.core.ValueInput.createByString('15.0 in'))
 
+            # Create a new group for stacking modules on the shared shaft
+            stackParametersGroup = inputs.addGroupCommandInput('stackParameters', 'Stack Parameters')
+            stackParametersInputs = stackParametersGroup.children
+            stackParametersInputs.addIntegerSpinnerCommandInput('moduleCount', 'Module Count', 1, 50, 1, 1)
+            # Each module is turned this much further than the one below it; 360 / (airfoilCount * moduleCount) spreads the torque peaks evenly
+            stackParametersInputs.addValueInput('phaseOffset', 'Phase Offset', 'deg', adsk.core.ValueInput.createByString('0 deg'))
+
             # Connect to command related events
             onExecute = TurbineCommandExecuteHandler()
             cmd.command.execute.add(onExecute)
@@ -87,6 +95,7 @@ class TurbineCommandExecuteHandler(adsk.core.CommandEventHandler):
             # Retrieve the groups
             dragTurbineParametersInputs = inputs.itemById('dragTurbineParameters').children
             airfoilTurbineParametersInputs = inputs.itemById('airfoilTurbineParameters').children
+            stackParametersInputs = inputs.itemById('stackParameters').children
 
             # Retrieve and cast the input values to float for precision
             holeDiameter = float(0.0575*25.4)
@@ -107,8 +116,25 @@ class TurbineCommandExecuteHandler(adsk.core.CommandEventHandler):
             distanceFromCenter = float(airfoilTurbineParametersInputs.itemById('distanceFromCenter').value)
             twistCount = int(dragTurbineParametersInputs.itemById('twistCount').value)  # Twist count is an integer
 
-            # Create the turbine components
-            createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bladeDepth, turbineHeight, bladeCount, twistCount, nacaProfile, halfCosineSpacing, numPoints, finiteThicknessTE, chordLength, distanceFromCenter, airfoilCount)
+            # Retrieve the stack parameters (the phase offset value is in radians)
+            moduleCount = int(stackParametersInputs.itemById('moduleCount').value)
+            phaseOffset = float(stackParametersInputs.itemById('phaseOffset').value)
+
+            # Create the turbine components once, then place the other modules of the stack
+            start = time.perf_counter()
+            moduleOcc = createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bladeDepth, turbineHeight, bladeCount, twistCount, nacaProfile, halfCosineSpacing, numPoints, finiteThicknessTE, chordLength, distanceFromCenter, airfoilCount)
+            moduleTime = time.perf_counter() - start
+            if not moduleOcc:
+                # createTurbine has already shown its error
+                if moduleCount > 1:
+                    _ui.messageBox(f'The module could not be built, so the other {moduleCount - 1} modules of the stack were not placed.')
+            elif moduleCount > 1:
+                stackTime = createStack(moduleOcc, moduleCount, phaseOffset, turbineHeight)
+                _ui.messageBox(f'Built {moduleCount} modules in {moduleTime + stackTime:.2f} s\n'
+                               f'Module geometry: {moduleTime:.2f} s\n'
+                               f'Each further module: {stackTime / (moduleCount - 1) * 1000:.1f} ms')
+            else:
+                _ui.messageBox(f'Built 1 module in {moduleTime:.2f} s')
         except:
             if _ui:
                 _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
@@ -126,7 +152,11 @@ def createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bl
         app = adsk.core.Application.get()
         design = app.activeProduct
         rootComp = design.rootComponent
-        occs = rootComp.occurrences
+        # Every part goes into one module component, so a stack can place it again as transformed occurrences
+        moduleOcc = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
+        moduleComp = moduleOcc.component
+        moduleComp.name = "TurbineModule"
+        occs = moduleComp.occurrences
         newOcc = occs.addNewComponent(adsk.core.Matrix3D.create())
         newComp = newOcc.component 
         newComp.name = "DragTurbine" 
@@ -289,13 +319,11 @@ def createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bl
         def createNacaAirfoil(nacaProfile, halfCosineSpacing, numPoints, finiteThicknessTE, chordLength, distanceFromCenter, turbineHeight, airfoilCount):
             app = adsk.core.Application.get()
             ui = app.userInterface
-            design = app.activeProduct
-            rootComp = design.rootComponent
-            xzPlane = rootComp.xZConstructionPlane
-            xyPlane = rootComp.xYConstructionPlane
 
-            airfoilComp = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
+            airfoilComp = moduleComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
             airfoilComp.component.name = "Airfoils"
+            xzPlane = airfoilComp.component.xZConstructionPlane
+            xyPlane = airfoilComp.component.xYConstructionPlane
 
             # Generate NACA airfoil points
             X, Z = naca4(nacaProfile, int(numPoints), finiteThicknessTE, halfCosineSpacing)
@@ -473,14 +501,10 @@ def createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bl
         def create_connectors(connectorDiameter, turbineHeight, airfoilCount):
             
             def create_bottom_connector(connectorDiameter, airfoilCount):
-                # Get the active product
-                product = adsk.core.Application.get().activeProduct
-                # Get the root component of the active design.
-                rootComp = product.rootComponent
-                xzPlane = rootComp.xZConstructionPlane
-                yzPlane = rootComp.yZConstructionPlane
-                bconnectorComp = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
+                bconnectorComp = moduleComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
                 bconnectorComp.component.name = "BottomConnector"
+                xzPlane = bconnectorComp.component.xZConstructionPlane
+                yzPlane = bconnectorComp.component.yZConstructionPlane
                 # Create a new sketch on the xz plane.
                 sketches = bconnectorComp.component.sketches
                 sketchbbase = sketches.add(xzPlane)
@@ -579,14 +603,10 @@ def createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bl
                 circularPattern = circularPatterns.add(patternInput)
             
             def create_top_connector(connectorDiameter,turbineHeight, airfoilCount):
-                # Get the active product
-                product = adsk.core.Application.get().activeProduct
-                # Get the root component of the active design.
-                rootComp = product.rootComponent
-                xzPlane = rootComp.xZConstructionPlane
-                yzPlane = rootComp.yZConstructionPlane
-                tconnectorComp = rootComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
+                tconnectorComp = moduleComp.occurrences.addNewComponent(adsk.core.Matrix3D.create())
                 tconnectorComp.component.name = "TopConnector"
+                xzPlane = tconnectorComp.component.xZConstructionPlane
+                yzPlane = tconnectorComp.component.yZConstructionPlane
                 # Create a new sketch on the xz plane.
                 sketches = tconnectorComp.component.sketches
                 sketchtbase = sketches.add(xzPlane)
@@ -710,11 +730,26 @@ def createTurbine(holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bl
                 
 
         create_connectors(0.3*24.5, turbineHeight, airfoilCount)
+        return moduleOcc
       
     except Exception as e:
         ui = adsk.core.Application.get().userInterface
         ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
+def createStack(moduleOcc, moduleCount, phaseOffset, turbineHeight):
+    # Places moduleCount - 1 more occurrences of the module component above the first one, each turned
+    # phaseOffset (radians) further about the shaft axis. No geometry is rebuilt. Returns the time taken.
+    start = time.perf_counter()
+    design = adsk.core.Application.get().activeProduct
+    rootComp = design.rootComponent
+    modulePitch = turbineHeight + 2 * 2.54  # a 1 in connector below and above every module
+    for k in range(1, moduleCount):
+        transform = adsk.core.Matrix3D.create()
+        transform.setToRotation(phaseOffset * k, adsk.core.Vector3D.create(0, 1, 0), adsk.core.Point3D.create(0, 0, 0))
+        transform.translation = adsk.core.Vector3D.create(0, modulePitch * k, 0)
+        rootComp.occurrences.addExistingComponent(moduleOcc.component, transform)
+    return time.perf_counter() - start
+
 def stop(context):
     try:
         if _ui:
@@ -1,15 +1,74 @@
 import requests
 import datetime
-from flask import Flask, render_template, request
-import wexpect
+from flask import Flask, Response, g, jsonify, redirect, render_template, request, stream_with_context, url_for
+import contextlib
 import os
 import re 
+import sys
+import threading
+import time
+
+# Shared turbine and XFOIL modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from polar_store import RE_MAX, RE_MIN, PolarDatabase
+from reynolds_field import DESIGN_TSR, bin_polars, reynolds_bins, reynolds_field, reynolds_table
+from turbine_design import CM, turbine_design
+from geocoder import get_geocoder
+from wind_store import get_wind_store
+from xfoil_batch import XFOIL_PATH, format_polar, parse_polar, xfoil_available
+from xfoil_pool import XfoilPool
+from jobs import JobQueue
+from metrics import annotate, registry, span, trace
+from hybrid import LIFT_TSR
+from screening import REFERENCE_WIND_SPEED, STANDARD_AIR_DENSITY, csv_lines, design_curve, ndjson_lines, read_sites, screen_sites
 
 
 # Ensure the API key is correctly copied and placed here
 api_key = '0ada37d5339bccddde9ea598c7ac93b9'
 print("Starting Flask application...")
 
+# Persistent XFOIL workers, started on the first simulation request
+xfoil_pool = None
+xfoil_pool_lock = threading.Lock()
+
+# Stored polars answer most requests without running XFOIL
+polar_db = None
+polar_db_lock = threading.Lock()
+
+# Geocoded coordinates by normalised location name
+geocode_cache = {}
+geocode_cache_lock = threading.Lock()
+
+# Sites of a bulk screening request that are geocoded and fetched at once
+SCREEN_WORKERS = int(os.environ.get('SCREEN_WORKERS', 8))
+
+# Served at /metrics; the XFOIL and job queue gauges are read when scraped
+REQUEST_SECONDS = registry.histogram('vawt360_http_request_duration_seconds', 'Request latency', ['endpoint', 'method', 'status'])
+UPSTREAM_REQUESTS = registry.counter('vawt360_upstream_requests_total', 'Calls to external APIs', ['service', 'status'])
+UPSTREAM_SECONDS = registry.histogram('vawt360_upstream_request_duration_seconds', 'External API latency', ['service'])
+CACHE_LOOKUPS = registry.counter('vawt360_cache_lookups_total', 'Cache and offline store lookups', ['cache', 'result'])
+XFOIL_SECONDS = registry.histogram('vawt360_xfoil_job_duration_seconds', 'XFOIL polar runs including queueing')
+
+
+def upstream_get(service, url):
+    # requests.get, counted and timed per external service
+    start = time.perf_counter()
+    with span('upstream', service=service):
+        try:
+            response = requests.get(url)
+        except Exception:
+            UPSTREAM_REQUESTS.inc(service=service, status='error')
+            raise
+    UPSTREAM_REQUESTS.inc(service=service, status=response.status_code)
+    UPSTREAM_SECONDS.observe(time.perf_counter() - start, service=service)
+    return response
+
+
+def render(template, **context):
+    with span('render', template=template):
+        return render_template(template, **context)
+
 
 def fetch_monthly_average_wind_speed(lat, lon, month, year):
     start_date = datetime.datetime(year, month, 1)
@@ -22,7 +81,7 @@ def fetch_monthly_average_wind_speed(lat, lon, month, year):
     end_timestamp = int(end_date.timestamp())
     
     monthly_url = f"http://history.openweathermap.org/data/2.5/history/city?lat={lat}&lon={lon}&type=hour&start={start_timestamp}&end={end_timestamp}&appid={api_key}"
-    response = requests.get(monthly_url)
+    response = upstream_get('owm_history', monthly_url)
     
     if response.status_code == 200:
         data = response.json()
@@ -47,7 +106,7 @@ def fetch_monthly_average_temp_pressure(lat, lon, month, year):
     end_timestamp = int(end_date.timestamp())
     
     monthly_url = f"http://history.openweathermap.org/data/2.5/history/city?lat={lat}&lon={lon}&type=hour&start={start_timestamp}&end={end_timestamp}&appid={api_key}"
-    response = requests.get(monthly_url)
+    response = upstream_get('owm_history', monthly_url)
     
     if response.status_code == 200:
         data = response.json()
@@ -69,22 +128,60 @@ def calculate_air_density(temp, pressure):
     air_density = pressure / (R_specific * temp_kelvin)
     return air_density
 
-def fetch_yearly_average_data(location):
+def geocode_location(location):
+    # (lat, lon) of a place name, or None. Answers are cached, so repeated locations (bulk screening,
+    # resubmitted forms) skip the round trip; failed requests are not cached.
+    key = location.strip().lower()
+    with geocode_cache_lock:
+        if key in geocode_cache:
+            CACHE_LOOKUPS.inc(cache='geocode', result='hit')
+            return geocode_cache[key]
+    CACHE_LOOKUPS.inc(cache='geocode', result='miss')
+    # The offline gazetteer (geocoder.py) first, the OpenWeatherMap API for places it does not know. A fuzzy
+    # (one edit away) gazetteer match is only a guess at a misspelling, so the API is asked first and the guess
+    # is used only when the API knows no such place.
+    with span('geocoder'):
+        place = get_geocoder().lookup(location)
+    CACHE_LOOKUPS.inc(cache='geocoder', result='miss' if place is None else 'hit' if place['match'] == 'exact' else 'fuzzy')
+    if place is not None and place['match'] == 'exact':
+        coordinates = (place['lat'], place['lon'])
+        print(f"Coordinates found offline: lat={coordinates[0]}, lon={coordinates[1]}")
+        with geocode_cache_lock:
+            geocode_cache[key] = coordinates
+        return coordinates
+    guess = (place['lat'], place['lon']) if place is not None else None
     print(f"Fetching geographical coordinates for location: {location}")
     geocode_url = f"http://api.openweathermap.org/geo/1.0/direct?q={location}&appid={api_key}"
-    geocode_response = requests.get(geocode_url)
-    if geocode_response.status_code == 200:
-        geocode_data = geocode_response.json()
-        if not geocode_data:
-            print("Geocode data not found")
-            return None, None
-        lat = geocode_data[0]['lat']
-        lon = geocode_data[0]['lon']
-        print(f"Coordinates found: lat={lat}, lon={lon}")
-    else:
+    geocode_response = upstream_get('owm_geocode', geocode_url)
+    if geocode_response.status_code != 200:
         print(f"Failed to fetch geocode data: {geocode_response.status_code} - {geocode_response.text}")
-        return None, None
-    
+        return guess
+    geocode_data = geocode_response.json()
+    if geocode_data:
+        coordinates = (geocode_data[0]['lat'], geocode_data[0]['lon'])
+        print(f"Coordinates found: lat={coordinates[0]}, lon={coordinates[1]}")
+    elif guess is not None:
+        print(f"Coordinates found offline for {place['name']}: lat={guess[0]}, lon={guess[1]}")
+        coordinates = guess
+    else:
+        print("Geocode data not found")
+        coordinates = None
+    with geocode_cache_lock:
+        geocode_cache[key] = coordinates
+    return coordinates
+
+
+def fetch_site_wind(lat, lon):
+    # Wind resource at a coordinate: wind_speed, air_density and, from the wind store, Weibull k and A.
+    # None when neither the store nor the history API has data. Imported wind grids (wind_store.py) answer
+    # without the 24 history requests.
+    with span('wind_store'):
+        resource = get_wind_store().lookup(lat, lon)
+    CACHE_LOOKUPS.inc(cache='wind_store', result='miss' if resource is None else 'hit')
+    if resource is not None:
+        print(f"Wind store: {resource}")
+        return dict(resource, air_density=resource.get('air_density', STANDARD_AIR_DENSITY), source='wind store')
+
     current_date = datetime.datetime.now()
     monthly_wind_speeds = []
     monthly_air_densities = []
@@ -102,7 +199,8 @@ def fetch_yearly_average_data(location):
 
         monthly_average_temp, monthly_average_pressure = fetch_monthly_average_temp_pressure(lat, lon, month, year)
         if monthly_average_temp is not None and monthly_average_pressure is not None:
-            monthly_average_air_density = calculate_air_density(monthly_average_temp, monthly_average_pressure)
+            with span('air_density'):
+                monthly_average_air_density = calculate_air_density(monthly_average_temp, monthly_average_pressure)
             monthly_air_densities.append(monthly_average_air_density)
             print(f"Month {month}, Year {year}: Average air density = {monthly_average_air_density} kg/m^3")
 
@@ -111,10 +209,22 @@ def fetch_yearly_average_data(location):
         yearly_average_air_density = sum(monthly_air_densities) / len(monthly_air_densities)
         print(f"Yearly average wind speed: {yearly_average_wind_speed} m/s")
         print(f"Yearly average air density: {yearly_average_air_density} kg/m^3")
-        return yearly_average_wind_speed, yearly_average_air_density
+        return {'wind_speed': yearly_average_wind_speed, 'air_density': yearly_average_air_density, 'source': 'openweathermap'}
     else:
         print("No monthly averages collected")
+        return None
+
+
+def fetch_yearly_average_data(location):
+    with span('geocode'):
+        coordinates = geocode_location(location)
+    if coordinates is None:
+        return None, None
+    with span('wind'):
+        resource = fetch_site_wind(*coordinates)
+    if resource is None:
         return None, None
+    return resource['wind_speed'], resource['air_density']
 
 
 def calculate_reynolds_number(wind_speed, characteristic_length, air_density):
@@ -125,47 +235,101 @@ def calculate_reynolds_number(wind_speed, characteristic_length, air_density):
 
 
 
-def run_xfoil_simulation(reynolds_number):
-    xfoil_path = r"C:\Users\tgoldberg\Documents\GitHub\VAWT360\Website Wind\XFOIL6.99\xfoil.exe"  # Adjust this path to your XFOIL installation
-    print(f"XFOIL path: {xfoil_path}")
-    if not os.path.exists(xfoil_path):
-        raise FileNotFoundError(f"XFOIL executable not found at: {xfoil_path}")
-    try:
-        child = wexpect.spawn(xfoil_path)
-    except Exception as e:
-        raise RuntimeError(f"Failed to start XFOIL: {e}")
-    
-    commands = [
-        "naca 0015",
-        "OPER",
-        "iter 200"
-        f"VISC {reynolds_number}",
-        "autoPolarSave.txt",
-        "autoPolarDump.txt",
-        "ASEQ -5 15 1",
-        "QUIT"
-    ]
+def get_xfoil_pool():
+    global xfoil_pool
+    with xfoil_pool_lock:
+        if xfoil_pool is None:
+            xfoil_pool = XfoilPool(workers=int(os.environ.get('XFOIL_WORKERS', os.cpu_count() or 1)))
+    return xfoil_pool
 
-    try:
-        for command in commands:
-            print(f"Sending command: {command}")
-            child.sendline(command)
-            child.expect('>')
 
-        child.close()
+def run_pool_polar(job):
+    with XFOIL_SECONDS.time():
+        return parse_polar(get_xfoil_pool().submit(job).result())
 
-        if not os.path.exists("results.txt"):
-            raise FileNotFoundError("XFOIL did not create the results file.")
 
-        with open("results.txt", "r") as file:
-            return file.read()
+def get_polar_db():
+    global polar_db
+    with polar_db_lock:
+        if polar_db is None:
+            # Without a runnable XFOIL the database serves (and computes) panel method polars instead
+            polar_db = PolarDatabase(runner=run_pool_polar, source='xfoil') if xfoil_available() else PolarDatabase(source='panel')
+    return polar_db
+
+
+def run_xfoil_simulation(reynolds_numbers, naca_profile='0015'):
+    # One stored polar per Reynolds bin the airfoils pass through, not a single free-stream run
+    print(f"XFOIL path: {XFOIL_PATH}")
+    try:
+        database = get_polar_db()
+        centres, _ = reynolds_bins(np.clip(reynolds_numbers, RE_MIN, RE_MAX))
+        missing = len(database.missing(naca_profile, centres))
+        CACHE_LOOKUPS.inc(len(centres) - missing, cache='polar', result='hit')
+        CACHE_LOOKUPS.inc(missing, cache='polar', result='miss')
+        with span('xfoil', bins=len(centres), missing=missing):
+            _, _, polars = bin_polars(database, naca_profile, reynolds_numbers)
+        return "\n".join(format_polar(dict(polar, name=f"NACA {naca_profile}", mach=0.0, ncrit=9.0)) for polar in polars)
     except Exception as e:
         raise RuntimeError(f"XFOIL command execution failed: {e}")
 
-app = Flask(__name__)
+def calculate_results(location, characteristic_length):
+    # Everything /calculate shows, computed in a job worker rather than the request thread (its own trace)
+    with trace('calculate_results', location=location, characteristic_length=characteristic_length):
+        average_wind_speed, average_air_density = fetch_yearly_average_data(location)
+        if average_wind_speed is None or average_air_density is None:
+            return dict(location=location, wind_speed="Data not available", air_density="N/A", reynolds_number="N/A", xfoil_results="N/A")
+        reynolds_number = calculate_reynolds_number(average_wind_speed, characteristic_length, average_air_density)
+        # The airfoils see the free stream plus their own speed, which changes around the revolution
+        with span('reynolds_field'):
+            field = reynolds_field(turbine_design(chordLength=characteristic_length / CM), DESIGN_TSR, average_wind_speed, average_air_density)
+        reynolds = field['reynolds']
+        xfoil_results = run_xfoil_simulation(reynolds)
+    reynolds_range = f"{np.min(reynolds):.0f} to {np.max(reynolds):.0f} at TSR {DESIGN_TSR:g}"
+    return dict(location=location, wind_speed=average_wind_speed, air_density=average_air_density, reynolds_number=reynolds_number, reynolds_range=reynolds_range, xfoil_results=xfoil_results)
+
+
+app = Flask(__name__, template_folder='Templates')
+job_queue = JobQueue(workers=int(os.environ.get('JOB_WORKERS', 4)))
+
+registry.gauge('vawt360_job_queue_depth', 'Calculations waiting for a job thread', job_queue.depth)
+registry.gauge('vawt360_xfoil_queue_depth', 'XFOIL jobs waiting for a worker', lambda: xfoil_pool.queue_depth() if xfoil_pool else 0)
+registry.gauge('vawt360_xfoil_workers', 'XFOIL worker processes', lambda: len(xfoil_pool.workers) if xfoil_pool else 0)
+registry.gauge('vawt360_xfoil_workers_busy', 'XFOIL workers running a job', lambda: xfoil_pool.busy if xfoil_pool else 0)
+registry.gauge('vawt360_xfoil_utilisation', 'Share of XFOIL workers running a job', lambda: xfoil_pool.busy / len(xfoil_pool.workers) if xfoil_pool else 0)
+
+
+@app.before_request
+def start_trace():
+    # Every request but the metrics scrape is timed and traced
+    if request.path == '/metrics':
+        return
+    g.start = time.perf_counter()
+    g.trace = contextlib.ExitStack()
+    g.trace.enter_context(trace('request', method=request.method, path=request.path))
+
+@app.after_request
+def record_status(response):
+    g.status = response.status_code
+    return response
+
+@app.teardown_request
+def finish_trace(error=None):
+    stack = g.pop('trace', None)
+    if stack is None:
+        return
+    status = g.get('status', 500)
+    annotate(status=status)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.start, endpoint=endpoint, method=request.method, status=status)
+    stack.close()
+
+@app.route('/metrics')
+def metrics():
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
 def home():
-    return render_template('index.html')
+    return render('index.html')
 
 @app.route('/calculate', methods=['POST'])
 def calculate():
@@ -173,18 +337,62 @@ def calculate():
     try:
         characteristic_length = float(request.form['characteristic_length'])
     except ValueError:
-        return render_template('result.html', location=location, wind_speed="Invalid input for characteristic length", air_density="N/A", reynolds_number="N/A", xfoil_results="N/A")
-    
-    average_wind_speed, average_air_density = fetch_yearly_average_data(location)
-    if average_wind_speed is not None and average_air_density is not None:
-        reynolds_number = calculate_reynolds_number(average_wind_speed, characteristic_length, average_air_density)
+        return render('result.html', location=location, wind_speed="Invalid input for characteristic length", air_density="N/A", reynolds_number="N/A", xfoil_results="N/A")
+
+    key = (location.strip().lower(), characteristic_length)
+    job_id = job_queue.submit(key, calculate_results, location, characteristic_length)
+    annotate(job_id=job_id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id), result_url=url_for('job_result', job_id=job_id)), 202
+    return redirect(url_for('job_result', job_id=job_id), code=303)
+
+@app.route('/screen', methods=['POST'])
+def screen():
+    # Bulk site screening: a CSV of sites (file field 'sites', or the request body) and an optional turbine design
+    # (naca, airfoil_count, chord, radius, height in inches). Rows stream back as NDJSON, or CSV with format=csv.
+    upload = request.files.get('sites')
+    text = upload.read().decode('utf-8-sig') if upload else request.get_data(as_text=True)
+    sites = read_sites(text.splitlines())
     try:
-        xfoil_results = run_xfoil_simulation(reynolds_number)
-        return render_template('result.html', wind_speed=wind_speed, reynolds_number=reynolds_number, xfoil_results=xfoil_results)
-    except Exception as e:
-        return str(e), 500
-    else:
-        return render_template('result.html', location=location, wind_speed="Data not available", air_density="N/A", reynolds_number="N/A", xfoil_results="N/A")
+        design = turbine_design(nacaProfile=request.values.get('naca', '0015'),
+                                airfoilCount=int(request.values.get('airfoil_count', 3)),
+                                chordLength=float(request.values.get('chord', 3.0)) * 2.54,
+                                distanceFromCenter=float(request.values.get('radius', 15.0)) * 2.54,
+                                turbineHeight=float(request.values.get('height', 10.0)) * 2.54)
+    except ValueError as e:
+        return jsonify(error=f"Invalid turbine design: {e}"), 400
+    if not sites:
+        return jsonify(error="No sites in the CSV"), 400
+    polar = reynolds_table(get_polar_db(), design, REFERENCE_WIND_SPEED, (LIFT_TSR[0], LIFT_TSR[-1]))
+    results = screen_sites(sites, design_curve(design, polar), geocode_location, fetch_site_wind, SCREEN_WORKERS)
+    if request.values.get('format') == 'csv':
+        return Response(stream_with_context(csv_lines(results)), mimetype='text/csv')
+    return Response(stream_with_context(ndjson_lines(results)), mimetype='application/x-ndjson')
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = job_queue.status(job_id)
+    if status is None:
+        return jsonify(error="Unknown job"), 404
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    if job is None:
+        return (jsonify(error="Unknown job"), 404) if wants_json else ("Unknown job", 404)
+    if job['status'] == 'failed':
+        if wants_json:
+            return jsonify(status=job['status'], error=job['error']), 500
+        return render('failed.html', job_id=job_id, error=job['error']), 500
+    if job['status'] != 'done':
+        if wants_json:
+            return jsonify(status=job['status'], error=None), 202
+        return render('pending.html', job_id=job_id, status=job['status']), 202
+    if wants_json:
+        return jsonify(job['result'])
+    return render('result.html', **job['result'])
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
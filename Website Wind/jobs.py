@@ -0,0 +1,66 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Finished jobs are kept this long so clients can still collect the result
+JOB_TTL = 3600
+
+# What clients see of a failed job. Exception texts can carry upstream URLs with the API key, so they only go
+# to the server log.
+FAILED_MESSAGE = "The calculation failed. Please try again later."
+
+
+class JobQueue:
+    def __init__(self, workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {}
+        self.active = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        # Identical submissions (same key) while a job is queued or running share that job
+        with self._lock:
+            self._prune()
+            job_id = self.active.get(key)
+            if job_id is not None:
+                return job_id
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {'id': job_id, 'status': 'queued', 'submitted': time.time(), 'finished': None, 'result': None, 'error': None}
+            self.active[key] = job_id
+        self.executor.submit(self._run, job_id, key, fn, args)
+        return job_id
+
+    def _run(self, job_id, key, fn, args):
+        job = self.jobs[job_id]
+        job['status'] = 'running'
+        try:
+            job['result'] = fn(*args)
+            job['status'] = 'done'
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            job['error'] = FAILED_MESSAGE
+            job['status'] = 'failed'
+        finally:
+            job['finished'] = time.time()
+            with self._lock:
+                if self.active.get(key) == job_id:
+                    del self.active[key]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        return {name: job[name] for name in ('id', 'status', 'submitted', 'finished', 'error')}
+
+    def depth(self):
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job['status'] == 'queued')
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL
+        for job_id in [job_id for job_id, job in self.jobs.items() if job['finished'] and job['finished'] < cutoff]:
+            del self.jobs[job_id]
@@ -0,0 +1,182 @@
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+
+# Upper bounds in seconds of the latency histogram buckets, from a cache hit to a cold XFOIL sweep
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in self.values.items()]
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, (counts, total) in self.values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append((self.name + '_bucket', key, (('le', _format_value(bound)),), cumulative))
+                samples.append((self.name + '_sum', key, (), total))
+                samples.append((self.name + '_count', key, (), cumulative))
+        return samples
+
+
+class Gauge:
+    # Read when scraped: callback returns a number, or a dict of label value tuples to numbers
+    type = 'gauge'
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.callback = callback
+
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return [(self.name, key, (), v) for key, v in value.items()]
+        return [(self.name, (), (), value)]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self.register(Gauge(name, help, callback, labels))
+
+    def render(self):
+        # Prometheus text exposition format, version 0.0.4
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, key, extra, value in metric.samples():
+                lines.append(f'{name}{_format_labels(metric.labels, key, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+SPAN_SECONDS = registry.histogram('vawt360_span_duration_seconds', 'Duration of traced steps', ['span'])
+
+# Traces go to stdout as one JSON object per line, or to the file named by TRACE_LOG
+trace_log = logging.getLogger('vawt360.trace')
+if not trace_log.handlers:
+    _handler = logging.FileHandler(os.environ['TRACE_LOG']) if os.environ.get('TRACE_LOG') else logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_log.addHandler(_handler)
+    trace_log.setLevel(logging.INFO)
+    trace_log.propagate = False
+
+_current = contextvars.ContextVar('vawt360_trace', default=None)
+
+
+@contextlib.contextmanager
+def trace(name, **attributes):
+    # Root of a request or job: collects the spans run inside it and logs them as one JSON line at the end
+    record = dict(attributes, trace_id=uuid.uuid4().hex[:16], name=name, timestamp=time.time(), spans=[])
+    token = _current.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record['error'] = str(e)
+        raise
+    finally:
+        record['duration_ms'] = (time.perf_counter() - start) * 1e3
+        _current.reset(token)
+        record['spans'] = [dict(span, start_ms=(span['start_ms'] - start) * 1e3) for span in record['spans']]
+        trace_log.info(json.dumps(record, default=str))
+
+
+@contextlib.contextmanager
+def span(name, **attributes):
+    # Timed step of the current trace (if any); always feeds vawt360_span_duration_seconds
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, span=name)
+        record = _current.get()
+        if record is not None:
+            record['spans'].append(dict(attributes, name=name, start_ms=start, duration_ms=elapsed * 1e3))
+
+
+def annotate(**attributes):
+    # Adds attributes to the current trace, e.g. the job a request queued
+    record = _current.get()
+    if record is not None:
+        record.update(attributes)
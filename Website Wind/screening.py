@@ -0,0 +1,157 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Shared turbine modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from dmst import flat_plate_polar
+from hybrid import LIFT_TSR, annual_energy, power_curve
+from reynolds_field import reynolds_table
+from structural import max_safe_rpm
+from turbine_design import turbine_design
+
+# Wind speeds of the design's power curve, computed once per batch
+SCREEN_WIND_SPEEDS = np.arange(1.0, 20.5, 0.5)
+
+# Wind speed (m/s) at which the Reynolds-binned polars are looked up for the power curve
+REFERENCE_WIND_SPEED = 5.0
+
+# Air density of the power curve; sites scale its power by their own density
+STANDARD_AIR_DENSITY = 1.225
+
+# Columns of a CSV result row, in order
+RESULT_COLUMNS = ['row', 'id', 'location', 'lat', 'lon', 'wind_speed', 'air_density', 'weibull_k', 'weibull_a', 'energy_kwh', 'source', 'error']
+
+
+def read_sites(lines):
+    # Candidate sites from CSV lines with a header: a 'location' (place name or 'lat, lon') column, or 'lat'/'lon'
+    # ('latitude'/'longitude') columns; an 'id' or 'name' column is passed through to the results
+    sites = []
+    for row in csv.DictReader(lines):
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items() if key}
+        site = {'row': len(sites), 'id': row.get('id') or row.get('name') or '', 'location': row.get('location', ''), 'lat': None, 'lon': None}
+        lat = row.get('lat') or row.get('latitude')
+        lon = row.get('lon') or row.get('longitude')
+        if not (lat and lon) and site['location'].count(',') == 1:
+            lat, lon = site['location'].split(',')
+        try:
+            site['lat'], site['lon'] = float(lat), float(lon)
+        except (TypeError, ValueError):
+            pass
+        sites.append(site)
+    return sites
+
+
+def design_curve(design, polar):
+    # Power curve of the design at standard air density, with wind speeds above the structural limit braked
+    curve = power_curve(design, polar, SCREEN_WIND_SPEEDS)
+    curve['power'] = np.where(curve['rpm'] <= max_safe_rpm(design, curve['wind_speed']), curve['power'], 0.0)
+    return curve
+
+
+def site_energy(curve, resource):
+    # Annual energy in kWh at a site's Weibull wind distribution, power scaled with the site's air density
+    density = resource.get('air_density') or STANDARD_AIR_DENSITY
+    scaled = dict(curve, power=curve['power'] * density / STANDARD_AIR_DENSITY)
+    if resource.get('weibull_a'):
+        return float(annual_energy(scaled, shape=resource.get('weibull_k') or 2.0, scale=resource['weibull_a']))
+    return float(annual_energy(scaled, resource['wind_speed']))
+
+
+def screen_site(site, curve, resolve, wind):
+    # resolve(location) -> (lat, lon) or None; wind(lat, lon) -> dict with wind_speed and optionally air_density,
+    # weibull_k, weibull_a and source. Failures are reported in the row instead of stopping the batch. Rows
+    # only name the failed step: exception texts can hold upstream URLs with the API key, so they are printed
+    # on the server instead.
+    result = dict(site)
+    step = 'Geocoding failed'
+    try:
+        if result['lat'] is None:
+            coordinates = resolve(site['location']) if site['location'] else None
+            if coordinates is None:
+                return dict(result, error='Location not found')
+            result['lat'], result['lon'] = coordinates
+        step = 'Wind data request failed'
+        resource = wind(result['lat'], result['lon'])
+        if resource is None or resource.get('wind_speed') is None:
+            return dict(result, error='Wind data not available')
+        step = 'Energy calculation failed'
+        result.update({name: resource.get(name) for name in ('wind_speed', 'air_density', 'weibull_k', 'weibull_a', 'source')})
+        result['energy_kwh'] = site_energy(curve, resource)
+    except Exception as e:
+        print(f"Screening row {site['row']} failed: {step}: {e}")
+        result['error'] = step
+    return result
+
+
+def screen_sites(sites, curve, resolve, wind, workers=8):
+    # Results of screen_site for every site, yielded as they complete. At most twice workers sites are in
+    # flight, so a long batch neither floods the upstream APIs nor holds every pending result in memory.
+    pending = set()
+    sites = iter(sites)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for site in sites:
+                pending.add(executor.submit(screen_site, site, curve, resolve, wind))
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def ndjson_lines(results):
+    for result in results:
+        yield json.dumps(result) + '\n'
+
+
+def csv_lines(results):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, RESULT_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Annual energy of a turbine design at many candidate sites')
+    parser.add_argument('sites', help="CSV with a 'location' column or 'lat'/'lon' columns ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv')
+    parser.add_argument('--workers', type=int, default=8, help='sites geocoded and fetched at once')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--airfoil-count', type=int, default=3)
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--radius', type=float, default=15.0, help='distance from center in inches')
+    parser.add_argument('--height', type=float, default=10.0, help='turbine height in inches')
+    parser.add_argument('--polar', choices=['database', 'flat'], default='database')
+    args = parser.parse_args()
+
+    # Geocoding and wind data through the web app's cached lookups (wind store first, then OpenWeatherMap).
+    # The app logs to stdout, so its output goes to stderr and stdout carries only result rows.
+    output = sys.stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        from app import fetch_site_wind, geocode_location, get_polar_db
+        design = turbine_design(nacaProfile=args.naca, airfoilCount=args.airfoil_count, chordLength=args.chord * 2.54, distanceFromCenter=args.radius * 2.54, turbineHeight=args.height * 2.54)
+        polar = flat_plate_polar() if args.polar == 'flat' else reynolds_table(get_polar_db(), design, REFERENCE_WIND_SPEED, (LIFT_TSR[0], LIFT_TSR[-1]))
+        with (sys.stdin if args.sites == '-' else open(args.sites, newline='')) as handle:
+            sites = read_sites(handle)
+        start = time.perf_counter()
+        results = screen_sites(sites, design_curve(design, polar), geocode_location, fetch_site_wind, args.workers)
+        for line in (ndjson_lines if args.format == 'ndjson' else csv_lines)(results):
+            output.write(line)
+            output.flush()
+        print(f"{len(sites)} sites in {time.perf_counter() - start:.1f} s")
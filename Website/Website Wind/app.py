@@ -1,5 +1,11 @@
 from flask import Flask, render_template, request
+import os
 import requests
+import sys
+
+# The offline wind store lives in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from wind_store import get_wind_store
 
 app = Flask(__name__)
 
@@ -9,11 +15,20 @@ def index():
 
 @app.route('/calculate', methods=['POST'])
 def calculate():
-    location = request.form['location']  # Although not used in the API call yet
-    mean_wind_speed = fetch_wind_data()
+    location = request.form['location']
+    mean_wind_speed = fetch_wind_data(location)
     return render_template('result.html', location=location, speed=mean_wind_speed)
 
-def fetch_wind_data():
+def fetch_wind_data(location):
+    # 'latitude, longitude' covered by the imported wind grids is answered offline
+    try:
+        lat, lon = (float(part) for part in location.split(','))
+    except ValueError:
+        lat = lon = None
+    if lat is not None:
+        resource = get_wind_store().lookup(lat, lon)
+        if resource is not None:
+            return resource['wind_speed']
     api_url = "https://globalwindatlas.info/api/gis/country/USA/wind-speed/10"
     response = requests.get(api_url)
     if response.status_code == 200:
@@ -0,0 +1,140 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from polar_tables import compiled_table
+from turbine_design import naca_symmetric, rotor_radius, swept_area, turbine_design
+
+# Buhl's high-induction correction takes over from momentum theory above this local thrust coefficient
+CT_GLAUERT = 0.96
+
+# Induction cap so the wake velocity behind a stalled, heavily loaded rotor stays positive
+A_MAX = 0.95
+
+
+def polar_coefficients(table, alpha, w2):
+    # CL and CD at alpha (radians) from a polar_table or a callable (alpha, W^2 / V^2) -> (CL, CD),
+    # e.g. a polar_tables.compiled_table
+    if callable(table):
+        return table(alpha, w2)
+    alpha_table, cl_table, cd_table = table
+    return np.interp(alpha, alpha_table, cl_table), np.interp(alpha, alpha_table, cd_table)
+
+
+def induction_from_loading(ct):
+    # Inverse of C_T = 4a(1 - a), switching to Buhl's empirical branch for heavily loaded streamtubes
+    ct = np.maximum(ct, 0.0)
+    momentum = 0.5 * (1.0 - np.sqrt(np.maximum(1.0 - np.minimum(ct, CT_GLAUERT), 0.0)))
+    buhl = (4.0 / 9.0 + np.sqrt(np.maximum(16.0 / 81.0 - 4.0 * (14.0 / 9.0) * (8.0 / 9.0 - ct), 0.0))) / (2.0 * 14.0 / 9.0)
+    return np.minimum(np.where(ct <= CT_GLAUERT, momentum, buhl), A_MAX)
+
+
+def blade_loads(theta, velocity, tsr, table, inflow=1.0):
+    # Relative velocity (in units of the streamtube inflow), angle of attack and normal/tangential
+    # force coefficients of a blade at azimuth theta, with theta = 0..pi on the upwind pass.
+    # table is anything polar_coefficients takes.
+    chordwise = velocity * np.cos(theta) + tsr
+    normal = -velocity * np.sin(theta)
+    w2 = chordwise ** 2 + normal ** 2
+    alpha = np.arctan2(normal, chordwise)
+    cl, cd = polar_coefficients(table, alpha, w2 * inflow ** 2)
+    cn = cl * np.cos(alpha) + cd * np.sin(alpha)
+    ct = cl * np.sin(alpha) - cd * np.cos(alpha)
+    return w2, alpha, cn, ct
+
+
+def _solve_half(theta, inflow, tsr, table, blade_factor, relaxation, tolerance, iterations):
+    # Fixed-point iteration on the induction factor of every streamtube and every TSR at once;
+    # inflow and tsr are in units of free-stream speed and broadcast against theta
+    a = np.zeros(np.broadcast(inflow, theta, tsr).shape)
+    sin_theta = np.abs(np.sin(theta))
+    for _ in range(iterations):
+        w2, alpha, cn, ct = blade_loads(theta, 1.0 - a, tsr / inflow, table, inflow)
+        loading = 4.0 * blade_factor * w2 * -(cn * np.sin(theta) + ct * np.cos(theta)) / sin_theta
+        a_new = induction_from_loading(loading)
+        change = np.max(np.abs(a_new - a)) if a.size else 0.0
+        a += relaxation * (a_new - a)
+        if change < tolerance:
+            break
+    w2, alpha, cn, ct = blade_loads(theta, 1.0 - a, tsr / inflow, table, inflow)
+    return a, w2 * inflow ** 2, alpha, ct
+
+
+def dmst(design, polar, tsr, n_theta=36, relaxation=0.5, tolerance=1e-6, iterations=300):
+    # Double-multiple-streamtube Cp and torque for the airfoil ring of a design over an array of tip-speed ratios.
+    # polar is one polar, or a reynolds_field.reynolds_table for polars following the local Reynolds number.
+    tsr = np.atleast_1d(np.asarray(tsr, dtype=np.float64))[:, None]
+    table = polar if callable(polar) else compiled_table(polar, symmetric=naca_symmetric(design['nacaProfile']))
+    radius = design['distanceFromCenter']
+    # N c / (8 pi R), the blade share of each streamtube's momentum balance
+    blade_factor = design['airfoilCount'] * design['chordLength'] / (8.0 * math.pi * radius)
+
+    # Streamtube centres, avoiding the tangent points at theta = 0 and pi where the tubes vanish
+    dtheta = math.pi / n_theta
+    theta_up = (np.arange(n_theta) + 0.5) * dtheta
+    theta_down = theta_up + math.pi
+
+    a_up, w2_up, alpha_up, ct_up = _solve_half(theta_up, 1.0, tsr, table, blade_factor, relaxation, tolerance, iterations)
+    # Downstream tubes see the upstream wake, V_e = V(1 - 2a), at the mirrored azimuth (same cross-stream position)
+    inflow_down = np.maximum(1.0 - 2.0 * a_up[:, ::-1], 1e-3)
+    a_down, w2_down, alpha_down, ct_down = _solve_half(theta_down, inflow_down, tsr, table, blade_factor, relaxation, tolerance, iterations)
+
+    theta = np.concatenate((theta_up, theta_down))
+    # Tangential force per blade in units of 0.5 rho V^2 c H
+    tangential = np.concatenate((w2_up * ct_up, w2_down * ct_down), axis=1)
+    # Cp = (N c lambda / (4 pi R)) * integral of (W/V)^2 Ct over the revolution
+    cp = design['airfoilCount'] * design['chordLength'] * tsr[:, 0] / (4.0 * math.pi * radius) * tangential.sum(axis=1) * dtheta
+    return {
+        'tsr': tsr[:, 0],
+        'cp': cp,
+        # Torque coefficient Q / (0.5 rho A R V^2)
+        'cq': cp / tsr[:, 0],
+        'theta': theta,
+        'alpha': np.concatenate((alpha_up, alpha_down), axis=1),
+        'induction': np.concatenate((a_up, a_down), axis=1),
+        'tangential': tangential,
+        'velocity_ratio': np.sqrt(np.concatenate((w2_up, w2_down), axis=1)),
+    }
+
+
+def rotor_power(design, result, wind_speed, air_density=1.225):
+    # Shaft power in W and rotor speed in rad/s for each TSR of a dmst() result at one wind speed
+    power = 0.5 * air_density * swept_area(design) * wind_speed ** 3 * result['cp']
+    omega = result['tsr'] * wind_speed / rotor_radius(design)
+    return power, omega
+
+
+def flat_plate_polar():
+    # Thin-plate stand-in when no XFOIL polar is at hand, good enough for timing and rough trends
+    alpha = np.linspace(-180.0, 180.0, 361)
+    a = np.radians(alpha)
+    cl = np.where(np.abs(alpha) < 12.0, 2.0 * math.pi * a * 0.9, 2.0 * np.sin(a) * np.cos(a))
+    cd = np.where(np.abs(alpha) < 12.0, 0.010 + 0.4 * a ** 2, 0.010 + 1.8 * np.sin(a) ** 2)
+    return {'alpha': alpha, 'CL': cl, 'CD': cd}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cp-TSR curve of the airfoil ring by double-multiple-streamtube theory')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=None, help='look the polar up in the polar database instead of using a flat plate')
+    parser.add_argument('--airfoil-count', type=int, default=3)
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--radius', type=float, default=15.0, help='distance from center in inches')
+    parser.add_argument('--height', type=float, default=10.0, help='turbine height in inches')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca, airfoilCount=args.airfoil_count, chordLength=args.chord * 2.54, distanceFromCenter=args.radius * 2.54, turbineHeight=args.height * 2.54)
+    if args.reynolds:
+        from polar_store import PolarDatabase
+        polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    else:
+        polar = flat_plate_polar()
+    tsr = np.linspace(0.5, 6.0, 45)
+    start = time.perf_counter()
+    result = dmst(design, polar, tsr)
+    elapsed = time.perf_counter() - start
+    for x, cp in zip(result['tsr'], result['cp']):
+        print(f"{x:5.2f} {cp:8.4f}")
+    print(f"{len(tsr)} TSR points in {elapsed * 1e3:.1f} ms")
@@ -0,0 +1,161 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from dmst import dmst, flat_plate_polar
+from polar_tables import compiled_table, uniform_index
+from turbine_design import naca_symmetric, turbine_design
+
+# Beddoes-Leishman type dynamic stall in the four-state form of Hansen, Gaunaa and Madsen: two states lag the
+# circulatory angle of attack, one the pressure response and one the trailing edge separation point.
+# Time constants are in semi-chord times c / (2W).
+A1, B1 = 0.165, 0.0455
+A2, B2 = 0.335, 0.3
+T_PRESSURE = 1.5
+T_SEPARATION = 6.0
+
+# Half-width of the angle range (radians) around zero lift used to fit the lift slope
+LINEAR_RANGE = math.radians(4.0)
+
+
+def virtual_camber(chord_ratio):
+    # Incidence shift of a symmetric blade on a circular path (Migliore): in the curved relative flow it behaves
+    # like a circular-arc camber of f/c = (c/R) / 8 convex toward the rotor axis, i.e. a zero-lift angle 2 f/c
+    # on the outward side. More lift on the upwind pass (negative alpha), less downwind.
+    return -np.asarray(chord_ratio, dtype=np.float64) / 4.0
+
+
+def stall_model(polar, chord_ratio=0.0, symmetric=False):
+    # Static polar split into the attached-flow line, the separation point f and the fully separated lift
+    # (Kirchhoff: CL = CL_alpha (alpha - alpha0) ((1 + sqrt f) / 2)^2), with the virtual camber of chord_ratio (c/R).
+    # Everything is tabulated on the uniform +-180 degree grid of polar_tables.compiled_table.
+    table = compiled_table(polar, symmetric=symmetric)
+    alpha, cl, cd = table.alpha, table.cl, table.cd
+    crossing = np.flatnonzero(np.diff(np.signbit(cl)) & (np.abs(alpha[:-1]) < math.radians(20.0)))
+    if len(crossing):
+        i = crossing[np.argmin(np.abs(alpha[crossing]))]
+        alpha0 = alpha[i] - cl[i] * (alpha[i + 1] - alpha[i]) / (cl[i + 1] - cl[i])
+    else:
+        alpha0 = 0.0
+    linear = np.abs(alpha - alpha0) <= LINEAR_RANGE
+    cl_alpha = np.polyfit(alpha[linear], cl[linear], 1)[0] if np.count_nonzero(linear) >= 3 else 2.0 * math.pi
+
+    attached = cl_alpha * (alpha - alpha0)
+    ratio = np.divide(cl, attached, out=np.ones_like(cl), where=np.abs(attached) > 1e-9)
+    f = np.clip((2.0 * np.sqrt(np.maximum(ratio, 0.0)) - 1.0) ** 2, 0.0, 1.0)
+    f = np.where(ratio >= 1.0, 1.0, f)
+    separated = np.where(f < 0.999, (cl - attached * f) / np.maximum(1.0 - f, 1e-3), attached / 2.0)
+    return {
+        'alpha': alpha, 'cl': cl, 'cd': cd, 'f': f, 'cl_separated': separated,
+        'alpha0': alpha0, 'cl_alpha': cl_alpha, 'cd0': float(np.interp(alpha0, alpha, cd)),
+        'camber': float(virtual_camber(chord_ratio)), 'size': len(alpha) - 1,
+    }
+
+
+def _lookup(model, name, alpha):
+    index, fraction = uniform_index(alpha, model['size'])
+    values = model[name]
+    return values[index] + fraction * (values[index + 1] - values[index])
+
+
+def initial_state(model, alpha):
+    # Steady-state lag states at alpha (any shape); one entry per blade element
+    alpha = np.asarray(alpha, dtype=np.float64) + model['camber']
+    return {
+        'x1': A1 * alpha,
+        'x2': A2 * alpha,
+        'x3': model['cl_alpha'] * (alpha - model['alpha0']),
+        'x4': _lookup(model, 'f', alpha),
+        'alpha': alpha,
+    }
+
+
+def stall_step(model, state, alpha, velocity, dt, chord):
+    # Advance every blade element by dt at once. alpha (radians, geometric), velocity W, dt and chord broadcast
+    # together in any consistent units (the solvers use rotor radii and free-stream speed). Inputs are held
+    # constant over the step and the lag equations are integrated exactly. Returns CL, CD and the new state;
+    # state is not modified, so a solver may call this repeatedly while iterating a time step.
+    alpha = np.asarray(alpha, dtype=np.float64) + model['camber']
+    rate = 2.0 * np.asarray(velocity) / chord  # 1 / semi-chord time
+    alpha_dot = ((alpha - state['alpha'] + math.pi) % (2.0 * math.pi) - math.pi) / dt
+    x1 = alpha * A1 + (state['x1'] - alpha * A1) * np.exp(-B1 * rate * dt)
+    x2 = alpha * A2 + (state['x2'] - alpha * A2) * np.exp(-B2 * rate * dt)
+    effective = alpha * (1.0 - A1 - A2) + x1 + x2
+    added_mass = math.pi * alpha_dot / rate
+    pressure = model['cl_alpha'] * (effective - model['alpha0']) + added_mass
+    x3 = pressure + (state['x3'] - pressure) * np.exp(-rate * dt / T_PRESSURE)
+    f_target = _lookup(model, 'f', x3 / model['cl_alpha'] + model['alpha0'])
+    x4 = f_target + (state['x4'] - f_target) * np.exp(-rate * dt / T_SEPARATION)
+
+    attached = model['cl_alpha'] * (effective - model['alpha0'])
+    cl = attached * x4 + _lookup(model, 'cl_separated', effective) * (1.0 - x4) + added_mass
+    cd_static = _lookup(model, 'cd', effective)
+    f_static = _lookup(model, 'f', effective)
+    cd = cd_static + (alpha - effective) * cl + (cd_static - model['cd0']) * (((1.0 - np.sqrt(x4)) / 2.0) ** 2 - ((1.0 - np.sqrt(f_static)) / 2.0) ** 2)
+    return cl, cd, {'x1': x1, 'x2': x2, 'x3': x3, 'x4': x4, 'alpha': alpha}
+
+
+def dynamic_loads(model, alpha, velocity, dt, chord, revolutions=3):
+    # Runs the time-stepper over periodic alpha and W histories (..., n_steps) for a few revolutions, every
+    # row (TSR, blade, span element) at once, and returns CL, CD of the last one
+    alpha = np.asarray(alpha, dtype=np.float64)
+    velocity = np.broadcast_to(velocity, alpha.shape)
+    dt = np.asarray(dt, dtype=np.float64)
+    state = initial_state(model, alpha[..., 0])
+    cl = np.empty(alpha.shape)
+    cd = np.empty(alpha.shape)
+    for _ in range(revolutions):
+        for k in range(alpha.shape[-1]):
+            cl[..., k], cd[..., k], state = stall_step(model, state, alpha[..., k], velocity[..., k], dt, chord)
+    return cl, cd
+
+
+def dmst_dynamic_stall(design, polar, result, revolutions=3):
+    # Post-processes a dmst() result: replays each TSR's azimuthal angle of attack and relative velocity through
+    # the dynamic stall model (induction kept from the static solution) and recomputes tangential loads and Cp
+    chord = design['chordLength'] / design['distanceFromCenter']
+    model = stall_model(polar, chord, naca_symmetric(design['nacaProfile']))
+    theta = result['theta']
+    dtheta = theta[1] - theta[0]
+    cl, cd = dynamic_loads(model, result['alpha'], result['velocity_ratio'], dtheta / result['tsr'], chord, revolutions)
+    alpha = result['alpha']
+    tangential = result['velocity_ratio'] ** 2 * (cl * np.sin(alpha) - cd * np.cos(alpha))
+    cp = design['airfoilCount'] * chord * result['tsr'] / (4.0 * math.pi) * tangential.sum(axis=1) * dtheta
+    dynamic = dict(result)
+    dynamic.update({'cp': cp, 'cq': cp / result['tsr'], 'tangential': tangential, 'cl': cl, 'cd': cd})
+    return dynamic
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Dynamic stall and virtual camber correction of the airfoil ring Cp')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=None, help='look the polar up in the polar database instead of using a flat plate')
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--radius', type=float, default=15.0, help='distance from center in inches')
+    parser.add_argument('--benchmark', type=int, default=10000, help='blade elements for the timing run')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca, chordLength=args.chord * 2.54, distanceFromCenter=args.radius * 2.54)
+    if args.reynolds:
+        from polar_store import PolarDatabase
+        polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    else:
+        polar = flat_plate_polar()
+    static = dmst(design, polar, np.linspace(1.0, 6.0, 21))
+    dynamic = dmst_dynamic_stall(design, polar, static)
+    for tsr, cp, cp_dynamic in zip(static['tsr'], static['cp'], dynamic['cp']):
+        print(f"{tsr:5.2f}  static {cp:8.4f}  dynamic {cp_dynamic:8.4f}")
+
+    model = stall_model(polar, design['chordLength'] / design['distanceFromCenter'], naca_symmetric(args.naca))
+    theta = np.linspace(0.0, 2.0 * math.pi, 360, endpoint=False)
+    tsr = np.linspace(1.0, 6.0, args.benchmark)[:, None]
+    alpha = np.arctan2(-np.sin(theta), tsr + np.cos(theta))
+    velocity = np.hypot(tsr + np.cos(theta), np.sin(theta))
+    state = initial_state(model, alpha[:, 0])
+    start = time.perf_counter()
+    for k in range(len(theta)):
+        cl, cd, state = stall_step(model, state, alpha[:, k], velocity[:, k], (theta[1] - theta[0]) / tsr[:, 0], 0.2)
+    elapsed = time.perf_counter() - start
+    print(f"{args.benchmark} blade elements x {len(theta)} steps in {elapsed * 1e3:.0f} ms ({elapsed / len(theta) * 1e3:.2f} ms per step)")
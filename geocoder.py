@@ -0,0 +1,288 @@
+import argparse
+import bisect
+import mmap
+import os
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+GEOCODER_PATH = os.environ.get('GEOCODER_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geocoder')
+
+# Fixed-width record of one place; names are UTF-8 truncated to 64 bytes
+PLACE_DTYPE = np.dtype([('lat', '<f8'), ('lon', '<f8'), ('population', '<i8'), ('country', 'S2'), ('admin1', 'S20'), ('name', 'S64')])
+
+# Edit distance allowed for fuzzy matches. Names are padded with two PAD bytes each side and split into
+# trigrams; one edit changes at most three of them, so a key within k edits shares all but 3k of the query's
+# trigrams, and only keys from the trigram postings that pass this count are compared.
+MAX_EDITS = 2
+PAD = ord('$')
+
+
+def normalize(name):
+    # Lower case ASCII-folded words: 'Saint-Étienne' and 'saint etienne' give the same key
+    folded = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in folded).split())
+
+
+def edit_distance(a, b, limit=MAX_EDITS):
+    # Levenshtein distance, giving up (limit + 1) once every alignment exceeds limit
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def trigrams(key):
+    # Distinct trigrams of a key (bytes) as 24-bit codes
+    padded = bytes((PAD, PAD)) + key + bytes((PAD, PAD))
+    return {padded[i] << 16 | padded[i + 1] << 8 | padded[i + 2] for i in range(len(padded) - 2)}
+
+
+def read_geonames(path, min_population=0, alternate_names=True):
+    # Places of a GeoNames dump (cities500.txt, allCountries.txt, ...): populated places (feature class P) and
+    # administrative areas (A), with their name, ASCII name and optionally alternate names as search keys
+    places = []
+    keys = []
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 15 or fields[6] not in ('P', 'A'):
+                continue
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            names = {normalize(fields[1]), normalize(fields[2])}
+            if alternate_names and fields[3]:
+                names.update(normalize(name) for name in fields[3].split(','))
+            index = len(places)
+            places.append((float(fields[4]), float(fields[5]), population, fields[8].encode(), fields[10].encode(),
+                           fields[1].encode('utf-8')[:64]))
+            keys.extend((name.encode('utf-8'), index) for name in names if name)
+    return np.array(places, dtype=PLACE_DTYPE), keys
+
+
+def build(path, store=GEOCODER_PATH, min_population=0, alternate_names=True):
+    # Writes the index: keys.bin (sorted keys back to back), offsets.bin (int64 key boundaries), entries.bin
+    # (int32 place of each key), places.npy, and the trigram postings for fuzzy matching: grams.npy (sorted
+    # codes), gram_offsets.npy (int64 boundaries) and gram_keys.npy (int32 sorted key positions of each code).
+    # Returns the number of places and keys.
+    places, keys = read_geonames(path, min_population, alternate_names)
+    keys.sort()
+    lengths = np.fromiter((len(key) for key, _ in keys), dtype=np.int64, count=len(keys))
+    os.makedirs(store, exist_ok=True)
+    with open(os.path.join(store, 'keys.bin'), 'wb') as handle:
+        for key, _ in keys:
+            handle.write(key)
+    np.concatenate(([0], np.cumsum(lengths))).astype('<i8').tofile(os.path.join(store, 'offsets.bin'))
+    np.fromiter((index for _, index in keys), dtype='<i4', count=len(keys)).tofile(os.path.join(store, 'entries.bin'))
+    np.save(os.path.join(store, 'places.npy'), places)
+    codes = []
+    owners = []
+    for i, (key, _) in enumerate(keys):
+        grams = trigrams(key)
+        codes.extend(grams)
+        owners.extend([i] * len(grams))
+    codes = np.array(codes, dtype=np.int32)
+    owners = np.array(owners, dtype=np.int32)
+    order = np.lexsort((owners, codes))
+    grams, starts = np.unique(codes[order], return_index=True)
+    np.save(os.path.join(store, 'grams.npy'), grams.astype(np.int32))
+    np.save(os.path.join(store, 'gram_offsets.npy'), np.append(starts, len(codes)).astype(np.int64))
+    np.save(os.path.join(store, 'gram_keys.npy'), owners[order])
+    return len(places), len(keys)
+
+
+def _map(path, fmt):
+    # Read-only memory map of a raw little-endian array file as a memoryview: indexing gives plain Python ints
+    # without numpy's per-element overhead (the bisect in a lookup touches a few dozen entries)
+    with open(path, 'rb') as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            return memoryview(b'').cast(fmt)
+        return memoryview(mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)).cast(fmt)
+
+
+class _Keys:
+    # Sequence view of the memory-mapped sorted keys, for bisect
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+
+class Geocoder:
+    def __init__(self, path=GEOCODER_PATH):
+        self.path = path
+        self.available = os.path.exists(os.path.join(path, 'places.npy'))
+        if self.available:
+            self.offsets = _map(os.path.join(path, 'offsets.bin'), 'q')
+            self.entries = _map(os.path.join(path, 'entries.bin'), 'i')
+            self.places = np.load(os.path.join(path, 'places.npy'), mmap_mode='r')
+            self.keys = _Keys(_map(os.path.join(path, 'keys.bin'), 'B'), self.offsets)
+            # Indexes built before the trigram postings have no fuzzy matching until rebuilt
+            self.fuzzy = os.path.exists(os.path.join(path, 'gram_keys.npy'))
+            if self.fuzzy:
+                self.grams = np.load(os.path.join(path, 'grams.npy'), mmap_mode='r')
+                self.gram_offsets = np.load(os.path.join(path, 'gram_offsets.npy'), mmap_mode='r')
+                self.gram_keys = np.load(os.path.join(path, 'gram_keys.npy'), mmap_mode='r')
+
+    def _place(self, index, match):
+        place = self.places[index]
+        return {'name': place['name'].decode('utf-8', 'ignore'), 'country': place['country'].decode(), 'admin1': place['admin1'].decode(),
+                'lat': float(place['lat']), 'lon': float(place['lon']), 'population': int(place['population']), 'match': match}
+
+    def _ranked(self, indices, country, admin1, limit):
+        # Distinct places of indices passing the country / region filter, most populous first
+        if len(indices) <= 32:
+            # Few candidates (any exact match): plain tuples are quicker than numpy's per-call overhead
+            indices = sorted(set(indices))
+            places = [self.places[index].item() for index in indices]
+            keep = [not country or place[3] == country.encode() for place in places]
+            if admin1:
+                region = [k and place[4] == admin1.encode() for k, place in zip(keep, places)]
+                # A middle part that is no region code of the country (e.g. a county name) is not used as a filter
+                if any(region):
+                    keep = region
+            ranked = sorted((i for i in range(len(indices)) if keep[i]), key=lambda i: -places[i][2])
+            return [indices[i] for i in ranked[:limit]]
+        indices = np.unique(np.frombuffer(indices, dtype=np.int32) if isinstance(indices, memoryview) else np.asarray(indices))
+        places = self.places[indices]
+        keep = np.ones(len(indices), dtype=bool)
+        if country:
+            keep &= places['country'] == country.encode()
+        if admin1 and (keep & (places['admin1'] == admin1.encode())).any():
+            keep &= places['admin1'] == admin1.encode()
+        indices, population = indices[keep], places['population'][keep]
+        if len(indices) > limit:
+            top = np.argpartition(-population, limit)[:limit]
+            indices, population = indices[top], population[top]
+        return indices[np.argsort(-population, kind='stable')].tolist()
+
+    def search(self, query, limit=10, prefix=True, fuzzy=True, max_edits=MAX_EDITS):
+        # Places matching 'name[, region][, country code]': exact name matches, then names starting with it,
+        # then names 1, .., max_edits edits away. Each group is most populous first.
+        # 'Springfield, MA' tries MA as a country code first, then as a region code.
+        if not self.available:
+            return []
+        parts = [part.strip() for part in query.split(',')]
+        name = normalize(parts[0])
+        if not name:
+            return []
+        country = parts[-1].upper() if len(parts) > 1 and len(parts[-1]) == 2 else ''
+        admin1 = parts[1].upper() if len(parts) > 2 or (len(parts) == 2 and not country) else ''
+        if len(parts) != 2 or not country:
+            return self._match(name, country, admin1, limit, prefix, fuzzy, max_edits)
+        return self._match(name, country, '', limit, prefix, fuzzy, max_edits) or self._match(name, '', country, limit, prefix, fuzzy, max_edits)
+
+    def _match(self, name, country, admin1, limit, prefix, fuzzy, max_edits=MAX_EDITS):
+        key = name.encode('utf-8')
+        results = []
+        seen = set()
+
+        def add(indices, match):
+            if not len(indices):
+                return
+            for index in self._ranked(indices, country, admin1, limit):
+                if len(results) < limit and index not in seen:
+                    seen.add(index)
+                    results.append(self._place(index, match))
+
+        lo = bisect.bisect_left(self.keys, key)
+        exact = bisect.bisect_left(self.keys, key + b'\x00', lo)
+        add(self.entries[lo:exact], 'exact')
+        if prefix and len(results) < limit:
+            add(self.entries[lo:bisect.bisect_left(self.keys, key + b'\xff', exact)], 'prefix')
+        if fuzzy and not results and self.fuzzy:
+            for close in self._close(name, max_edits):
+                add(close, 'fuzzy')
+        return results
+
+    def _close(self, name, max_edits):
+        # Places of the keys 1, .., max_edits edits from name (one list per distance). Short names allow fewer
+        # edits, as many as still leave a shared trigram: a 4 letter name with 2 edits would match nearly anything.
+        key = name.encode('utf-8')
+        grams = trigrams(key)
+        edits = min(max_edits, (len(grams) - 1) // 3)
+        if edits < 1:
+            return []
+        postings = []
+        for gram in grams:
+            i = int(np.searchsorted(self.grams, gram))
+            if i < len(self.grams) and self.grams[i] == gram:
+                postings.append(self.gram_keys[self.gram_offsets[i]:self.gram_offsets[i + 1]])
+        needed = len(grams) - 3 * edits
+        if len(postings) < needed:
+            return []
+        candidates, counts = np.unique(np.concatenate(postings), return_counts=True)
+        close = [[] for _ in range(edits)]
+        offsets = self.offsets
+        for i in candidates[counts >= needed].tolist():
+            if abs(offsets[i + 1] - offsets[i] - len(key)) <= edits:
+                distance = edit_distance(name, self.keys[i].decode('utf-8'), edits)
+                if 0 < distance <= edits:
+                    close[distance - 1].append(self.entries[i])
+        return close
+
+    def lookup(self, query):
+        # The most populous exact match, else the only place one edit away, as a place whose 'match' is 'exact'
+        # or 'fuzzy'; None otherwise. Near misses are not ranked by population: 'Parms' is as close to Parma as
+        # to Paris, so it matches neither.
+        results = self.search(query, limit=1, prefix=False, fuzzy=False)
+        if results:
+            return results[0]
+        close = self.search(query, limit=2, prefix=False, max_edits=1)
+        return close[0] if len(close) == 1 else None
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    # Shared geocoder for the web apps, opened on first use
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder()
+    return _geocoder
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline geocoder built from a GeoNames dump')
+    parser.add_argument('command', choices=['build', 'search'])
+    parser.add_argument('args', nargs='+', help='GeoNames file to build from, or the place to search for')
+    parser.add_argument('--store', default=GEOCODER_PATH)
+    parser.add_argument('--min-population', type=int, default=0)
+    parser.add_argument('--no-alternate-names', action='store_true')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--benchmark', type=int, default=10000, help='repeated lookups to time after a search')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        places, keys = build(args.args[0], args.store, args.min_population, not args.no_alternate_names)
+        print(f"{places} places, {keys} keys in {time.perf_counter() - start:.1f} s")
+    else:
+        geocoder = Geocoder(args.store)
+        query = ' '.join(args.args)
+        for place in geocoder.search(query, args.limit):
+            print(f"{place['name']}, {place['admin1']}, {place['country']}  {place['lat']:.4f} {place['lon']:.4f}  pop {place['population']}  ({place['match']})")
+        start = time.perf_counter()
+        print(f"lookup: {geocoder.lookup(query)}")
+        for _ in range(args.benchmark):
+            geocoder.lookup(query)
+        elapsed = time.perf_counter() - start
+        print(f"{args.benchmark} lookups in {elapsed * 1e3:.0f} ms ({elapsed / args.benchmark * 1e6:.1f} us each)")
@@ -0,0 +1,132 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from dmst import dmst, flat_plate_polar
+from savonius import drag_rotor_area, savonius
+from turbine_design import CM, rotor_radius, swept_area, turbine_design
+
+# TSR grid (of the airfoil ring) on which the DMST torque curve is tabulated once per design
+LIFT_TSR = np.linspace(0.1, 8.0, 80)
+
+# TSR grid (of the drag rotor) for the Savonius torque curve
+DRAG_TSR = np.linspace(0.0, 3.0, 61)
+
+
+def quadratic_load(coefficient, friction=0.0):
+    # Generator + bearing torque in N m at shaft speed omega (rad/s): Q = friction + k omega^2,
+    # the load curve of a maximum power point tracking controller
+    return lambda omega: friction + coefficient * omega ** 2
+
+
+def optimal_load_coefficient(design, lift, air_density=1.225):
+    # k that places the operating point at the ring's best Cp: Q = 0.5 rho A R^3 Cp_max / tsr_opt^3 omega^2,
+    # lift is the ring's dmst() result
+    best = np.argmax(lift['cp'])
+    radius = rotor_radius(design)
+    return 0.5 * air_density * swept_area(design) * radius ** 3 * lift['cp'][best] / lift['tsr'][best] ** 3
+
+
+def shaft_torque(design, lift, omega, wind_speed, air_density=1.225):
+    # Torque of each stage in N m on the shared shaft, broadcast over omega and wind_speed arrays
+    wind_speed = np.maximum(wind_speed, 1e-6)
+    lift_radius = rotor_radius(design)
+    drag_radius = design['outerDiameter'] * CM / 2.0
+    lift_tsr = omega * lift_radius / wind_speed
+    drag_tsr = omega * drag_radius / wind_speed
+    dynamic_pressure = 0.5 * air_density * wind_speed ** 2
+
+    lift_cq = np.interp(lift_tsr, lift['tsr'], lift['cq'])
+    drag_cq = np.interp(drag_tsr, DRAG_TSR, savonius(design, DRAG_TSR)['cq'])
+    lift_torque = lift_cq * dynamic_pressure * swept_area(design) * lift_radius
+    drag_torque = drag_cq * dynamic_pressure * drag_rotor_area(design) * drag_radius
+    return lift_torque, drag_torque
+
+
+def power_curve(design, polar, wind_speeds, load=None, air_density=1.225, n_omega=400):
+    # Operating point of the combined rotor for every wind speed in one vectorized pass.
+    # Starting from rest the rotor speeds up while drive torque exceeds the load, so it settles at
+    # the first speed where net torque turns negative; no such point with positive torque means it stalls.
+    wind_speeds = np.atleast_1d(np.asarray(wind_speeds, dtype=np.float64))
+    lift = dmst(design, polar, LIFT_TSR)
+    if load is None:
+        load = quadratic_load(optimal_load_coefficient(design, lift, air_density))
+
+    # Shaft speed grid up to the ring's runaway speed at the highest wind speed
+    omega_max = LIFT_TSR[-1] * wind_speeds.max() / rotor_radius(design)
+    omega = np.linspace(0.0, omega_max, n_omega)
+    lift_torque, drag_torque = shaft_torque(design, lift, omega[None, :], wind_speeds[:, None], air_density)
+    net = lift_torque + drag_torque - load(omega)[None, :]
+
+    # Only a rotor with positive net torque at rest starts; it then runs up to the first grid speed where
+    # net torque is no longer positive, and a later sign change is out of its reach
+    self_starting = net[:, 0] > 0.0
+    stopped = net <= 0.0
+    found = self_starting & stopped.any(axis=1)
+    i = np.where(found, np.argmax(stopped, axis=1) - 1, 0)
+    rows = np.arange(len(wind_speeds))
+    # Linear interpolation of the zero crossing between grid points i and i + 1
+    fraction = net[rows, i] / np.where(found, net[rows, i] - net[rows, i + 1], 1.0)
+    operating_omega = np.where(found, omega[i] + fraction * (omega[1] - omega[0]), 0.0)
+
+    # Run-up speed at which the airfoil ring starts out-pulling the Savonius
+    lift_leads = lift_torque > drag_torque
+    handover_omega = np.where(lift_leads.any(axis=1), omega[np.argmax(lift_leads, axis=1)], np.nan)
+
+    lift_at, drag_at = shaft_torque(design, lift, operating_omega, wind_speeds, air_density)
+    lift_at = np.where(found, lift_at, 0.0)
+    drag_at = np.where(found, drag_at, 0.0)
+    return {
+        'wind_speed': wind_speeds,
+        'omega': operating_omega,
+        'rpm': operating_omega * 60.0 / (2.0 * math.pi),
+        'power': (lift_at + drag_at) * operating_omega,
+        'lift_power': lift_at * operating_omega,
+        'drag_power': drag_at * operating_omega,
+        'lift_torque': lift_at,
+        'drag_torque': drag_at,
+        'lift_tsr': operating_omega * rotor_radius(design) / wind_speeds,
+        'self_starting': self_starting,
+        'handover_rpm': handover_omega * 60.0 / (2.0 * math.pi),
+    }
+
+
+def weibull_pdf(wind_speeds, shape, scale):
+    v = np.maximum(wind_speeds, 0.0) / scale
+    return (shape / scale) * v ** (shape - 1.0) * np.exp(-v ** shape)
+
+
+def annual_energy(curve, mean_wind_speed=None, shape=2.0, scale=None):
+    # Annual energy in kWh from a power curve and a Weibull wind distribution (Rayleigh by default)
+    if scale is None:
+        scale = mean_wind_speed / math.gamma(1.0 + 1.0 / shape)
+    pdf = weibull_pdf(curve['wind_speed'], shape, scale)
+    energy = curve['power'] * pdf
+    return np.sum(0.5 * (energy[1:] + energy[:-1]) * np.diff(curve['wind_speed'])) * 8760.0 / 1000.0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Power curve of the combined Savonius + airfoil rotor')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=None, help='look the polar up in the polar database instead of using a flat plate')
+    parser.add_argument('--mean-wind-speed', type=float, default=5.0)
+    parser.add_argument('--friction', type=float, default=0.0, help='bearing and cogging torque in N m')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca)
+    if args.reynolds:
+        from polar_store import PolarDatabase
+        polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    else:
+        polar = flat_plate_polar()
+    wind_speeds = np.arange(1.0, 20.5, 0.5)
+    start = time.perf_counter()
+    lift = dmst(design, polar, LIFT_TSR)
+    curve = power_curve(design, polar, wind_speeds, quadratic_load(optimal_load_coefficient(design, lift), args.friction))
+    elapsed = time.perf_counter() - start
+    for v, rpm, p, pd, handover in zip(curve['wind_speed'], curve['rpm'], curve['power'], curve['drag_power'], curve['handover_rpm']):
+        print(f"{v:5.1f} m/s  {rpm:7.1f} rpm  {p:8.2f} W  (drag {pd:6.2f} W, airfoils lead above {handover:6.1f} rpm)")
+    print(f"Annual energy at {args.mean_wind_speed} m/s mean: {annual_energy(curve, args.mean_wind_speed):.1f} kWh")
+    print(f"{len(wind_speeds)} wind speeds in {elapsed * 1e3:.1f} ms")
@@ -1,125 +1,416 @@
-import requests
+import argparse
 import json
 import math
+import os
+import re
+import secrets
+import string
+import time
 from base64 import b64encode
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
 from hashlib import sha256
 from hmac import new as hmac_new
-from time import time
+from urllib.parse import urlencode
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from print_estimate import (BOTTOM_PIN_RADIUS, CONNECTOR_DIAMETER, CONNECTOR_HEIGHT, CONNECTOR_HEX_DIAMETER, CONNECTOR_SHAFT_DEPTH,
+                            PIN_CUT_EXTRA, PIN_OFFSET, SCREW_DEPTH, SCREW_RADIUS, TOP_PIN_RADIUS, airfoil_span)
+from turbine_design import CM, blade_arc, naca4, naca_half_thickness, turbine_design, twist_angle
+
+# API keys come from the environment only (create them in the Onshape developer portal)
+BASE_URL = os.environ.get('ONSHAPE_URL', 'https://cad.onshape.com')
+
+# Responses worth another try: rate limiting and transient server errors
+RETRY_STATUS = {429, 500, 502, 503, 504}
 
-# Replace these with your API key and secret
-API_KEY = 'VqjFWqvS4xGkLqaZg7Vr13My '
-API_SECRET = 'kyeNKmmZkIj1qKkc2ehlvo3BQhDvbKpaYh4pPDI3ccywL73r'
+# Methods that may be sent again after a timeout or a server error without creating anything twice. Other
+# requests (POST) are only retried on 429, which Onshape answers without executing the request.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+
+class OnshapeError(RuntimeError):
+    def __init__(self, message, status=None, body=None):
+        super().__init__(message)
+        self.status = status
+        self.body = body
 
 
 def generate_nonce():
-    return str(int(time() * 1000))
-
-def generate_auth_header(method, url, nonce):
-    auth = b64encode(hmac_new(API_SECRET.encode(), f'{method} {url} {nonce}'.encode(), sha256).digest()).decode()
-    return f'Bearer {API_KEY}:{auth}'
-
-def create_document():
-    url = 'https://cad.onshape.com/api/documents'
-    headers = {
-        'Content-Type': 'application/json',
-        'On-Nonce': generate_nonce(),
-    }
-    headers['On-Authorization'] = generate_auth_header('POST', url, headers['On-Nonce'])
-
-    data = {
-        "name": "Wind Turbine Design",
-        "ownerType": 0
-    }
-
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-
-    if response.status_code == 200:
-        document = response.json()
-        return document
-    else:
-        print(f'Error creating document: {response.text}')
-        return None
-
-document = create_document()
-
-if document:
-    document_id = document["id"]
-    print(f'Document ID: {document_id}')
-    print(f'Document URL: https://cad.onshape.com/documents/{document_id}')
-
-    # Create a workspace
-    url = f'https://cad.onshape.com/api/documents/{document_id}/workspaces'
-    headers['On-Nonce'] = generate_nonce()
-    headers['On-Authorization'] = generate_auth_header('POST', url, headers['On-Nonce'])
-
-    data = {
-        "name": "Workspace 1"
-    }
-
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-
-    if response.status_code == 200:
-        workspace = response.json()
-        workspace_id = workspace["id"]
-        print(f'Workspace ID: {workspace_id}')
-    else:
-        print(f'Error creating workspace: {response.text}')
-        workspace_id = None
-else:
-    workspace_id = None
-
-def create_turbine(document_id, workspace_id, holeDiameter, shaftDiameter, outerDiameter, bladeThickness, bladeDepth, turbineHeight, bladeCount, twistCount):
-    if not document_id or not workspace_id:
-        print("Invalid document or workspace ID.")
-        return
-
-    url = f'https://cad.onshape.com/api/partstudios/d/{document_id}/w/{workspace_id}/e/{element_id}/features'
-    headers = {
-        'Content-Type': 'application/json',
-        'On-Nonce': generate_nonce(),
-    }
-    headers['On-Authorization'] = generate_auth_header('POST', url, headers['On-Nonce'])
-
-    # Create the shaft (cylinder)
-    features = [
-        {
-            "featureType": "cylinder",
-            "parameters": {
-                "diameter": shaftDiameter,
-                "height": turbineHeight,
-                "position": {"x": 0, "y": 0, "z": 0}
-            }
-        }
-    ]
-
-    # Create the hexagon
-    radius = holeDiameter / 2.0
-    hexagon_points = []
-    for i in range(6):
-        angle_deg = 60 * i - 30
-        angle_rad = math.radians(angle_deg)
-        x = radius * math.cos(angle_rad)
-        y = radius * math.sin(angle_rad)
-        hexagon_points.append({"x": x, "y": y})
-
-    features.append({
-        "featureType": "polygon",
-        "parameters": {
-            "vertices": hexagon_points,
-            "height": turbineHeight,
-            "operation": "join"
+    return ''.join(secrets.choice(string.ascii_letters + string.digits) for _ in range(25))
+
+
+class OnshapeClient:
+    # One keep-alive connection pool for every call; each request is signed with the API keys when it is sent.
+    # Nothing talks to Onshape until a method is called.
+    def __init__(self, access_key=None, secret_key=None, base_url=BASE_URL, timeout=(5.0, 60.0), retries=3, backoff=0.5, pool_size=10):
+        self.access_key = (access_key or os.environ.get('ONSHAPE_ACCESS_KEY', '')).strip()
+        self.secret_key = (secret_key or os.environ.get('ONSHAPE_SECRET_KEY', '')).strip()
+        if not self.access_key or not self.secret_key:
+            raise OnshapeError("Onshape API keys missing: set ONSHAPE_ACCESS_KEY and ONSHAPE_SECRET_KEY")
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sign(self, method, path, query='', content_type='application/json'):
+        # Onshape HMAC-SHA256 request signature over method, nonce, date, content type, path and query
+        nonce = generate_nonce()
+        date = formatdate(usegmt=True)
+        message = f'{method}\n{nonce}\n{date}\n{content_type}\n{path}\n{query}\n'.lower()
+        signature = b64encode(hmac_new(self.secret_key.encode(), message.encode(), sha256).digest()).decode()
+        return {
+            'Content-Type': content_type,
+            'Accept': 'application/json',
+            'Date': date,
+            'On-Nonce': nonce,
+            'Authorization': f'On {self.access_key}:HmacSHA256:{signature}',
         }
-    })
 
-    data = {"features": features}
+    def request(self, method, path, query=None, body=None):
+        query = urlencode(query or {})
+        url = f'{self.base_url}{path}' + (f'?{query}' if query else '')
+        data = json.dumps(body) if body is not None else None
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(self.retries + 1):
+            # A fresh signature per attempt, nonces must not be reused
+            headers = self.sign(method, path, query)
+            try:
+                response = self.session.request(method, url, headers=headers, data=data, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A POST that timed out may still have been executed
+                if attempt == self.retries or not idempotent:
+                    raise OnshapeError(f'{method} {path} failed: {e}')
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            retry = response.status_code in RETRY_STATUS if idempotent else response.status_code == 429
+            if retry and attempt < self.retries:
+                delay = response.headers.get('Retry-After')
+                time.sleep(float(delay) if delay and delay.isdigit() else self.backoff * 2 ** attempt)
+                continue
+            if not response.ok:
+                raise OnshapeError(f'{method} {path} returned {response.status_code}: {response.text}', response.status_code, response.text)
+            return response.json() if response.content else None
+
+    # Documents and workspaces
+
+    def create_document(self, name='Wind Turbine Design', public=False):
+        return self.request('POST', '/api/documents', body={'name': name, 'isPublic': public})
+
+    def delete_document(self, document_id):
+        return self.request('DELETE', f'/api/documents/{document_id}')
+
+    def workspaces(self, document_id):
+        return self.request('GET', f'/api/documents/d/{document_id}/workspaces')
+
+    def create_workspace(self, document_id, name='Workspace 1'):
+        return self.request('POST', f'/api/documents/d/{document_id}/workspaces', body={'name': name})
+
+    def default_workspace(self, document_id):
+        return self.request('GET', f'/api/documents/{document_id}')['defaultWorkspace']['id']
+
+    # Part studios and features
+
+    def create_part_studio(self, document_id, workspace_id, name):
+        return self.request('POST', f'/api/partstudios/d/{document_id}/w/{workspace_id}', body={'name': name})
+
+    def features(self, document_id, workspace_id, element_id):
+        return self.request('GET', f'/api/partstudios/d/{document_id}/w/{workspace_id}/e/{element_id}/features')
+
+    def add_feature(self, document_id, workspace_id, element_id, feature):
+        # The features endpoint takes one feature per request; the answer carries its featureId and regeneration state
+        return self.request('POST', f'/api/partstudios/d/{document_id}/w/{workspace_id}/e/{element_id}/features',
+                            body={'btType': 'BTFeatureDefinitionCall-1406', 'feature': feature})
+
+
+# Feature JSON in Onshape's BTM format. Lengths are passed in Fusion internal units (cm) and sent in metres.
+# Queries are FeatureScript query strings; <<name>> stands for the featureId Onshape gives the feature of that
+# name, filled in by create_turbine once the feature exists. The standard planes are features named after them.
+
+def quantity(parameter_id, value, unit='m'):
+    return {"btType": "BTMParameterQuantity-147", "parameterId": parameter_id, "expression": f"{float(value)!r} {unit}", "isInteger": False}
+
+
+def length(parameter_id, value):
+    return quantity(parameter_id, value * CM)
+
+
+def enum(parameter_id, enum_name, value):
+    return {"btType": "BTMParameterEnum-145", "parameterId": parameter_id, "enumName": enum_name, "value": value, "namespace": ""}
+
+
+def boolean(parameter_id, value):
+    return {"btType": "BTMParameterBoolean-144", "parameterId": parameter_id, "value": bool(value)}
+
+
+def query_list(parameter_id, *statements):
+    return {"btType": "BTMParameterQueryList-148", "parameterId": parameter_id,
+            "queries": [{"btType": "BTMIndividualQuery-138", "queryString": f"query={statement};"} for statement in statements]}
+
+
+def plane_query(name):
+    return f'qCreatedBy(makeId("<<{name}>>"), EntityType.FACE)'
+
+
+def region_query(sketch):
+    return f'qSketchRegion(makeId("<<{sketch}>>"), false)'
+
+
+def edge_query(sketch, entity_id):
+    return f'sketchEntityQuery(makeId("<<{sketch}>>"), EntityType.EDGE, "{entity_id}")'
+
 
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+def feature(feature_type, name, parameters):
+    return {"btType": "BTMFeature-134", "featureType": feature_type, "name": name, "parameters": parameters}
 
-    if response.status_code == 200:
-        print('Turbine inner structure created successfully.')
-    else:
-        print(f'Error creating turbine: {response.text}')
 
-# Example usage
-if document_id and workspace_id:
-    create_turbine(document_id, workspace_id, 5, 10, 20, 1, 5, 100, 3, 2)
\ No newline at end of file
+def sketch_line(entity_id, start, end, construction=False):
+    # start and end in cm on the sketch plane
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    size = math.hypot(dx, dy)
+    return {"btType": "BTMSketchCurveSegment-155", "entityId": entity_id, "startPointId": f"{entity_id}.start", "endPointId": f"{entity_id}.end",
+            "startParam": 0.0, "endParam": size * CM, "isConstruction": construction,
+            "geometry": {"btType": "BTCurveGeometryLine-117", "pntX": start[0] * CM, "pntY": start[1] * CM, "dirX": dx / size, "dirY": dy / size}}
+
+
+def sketch_circle(entity_id, center, radius):
+    return {"btType": "BTMSketchCurve-4", "entityId": entity_id, "centerId": f"{entity_id}.center", "isConstruction": False,
+            "geometry": {"btType": "BTCurveGeometryCircle-115", "radius": radius * CM, "xCenter": center[0] * CM, "yCenter": center[1] * CM,
+                         "xDir": 1.0, "yDir": 0.0, "clockwise": False}}
+
+
+def sketch_polygon(entity_id, points):
+    # Closed outline of line segments through points; repeated points (the closed trailing edge of naca4) are dropped
+    points = [p for i, p in enumerate(points) if math.dist(p, points[i - 1]) > 1e-9]
+    return [sketch_line(f"{entity_id}.{i}", points[i], points[(i + 1) % len(points)]) for i in range(len(points))]
+
+
+def sketch(name, plane, entities):
+    return {"btType": "BTMSketch-151", "featureType": "newSketch", "name": name,
+            "parameters": [query_list("sketchPlane", plane_query(plane))], "entities": entities, "constraints": []}
+
+
+def offset_plane(name, offset):
+    # Plane parallel to Top at height offset (cm); sketches on it keep Top's x and y directions
+    return feature("cPlane", name, [enum("cplaneType", "CPlaneType", "OFFSET"), query_list("entities", plane_query("Top")),
+                                    length("offset", abs(offset)), boolean("oppositeDirection", offset < 0)])
+
+
+def extrude(name, profile, depth, operation, symmetric=False):
+    # Extrusion of every region of the sketch profile along +Z (-Z for a negative depth); NEW, ADD or REMOVE
+    return feature("extrude", name, [
+        enum("bodyType", "ExtendedToolBodyType", "SOLID"), enum("operationType", "NewBodyOperationType", operation),
+        query_list("entities", region_query(profile)), enum("endBound", "BoundingType", "SYMMETRIC" if symmetric else "BLIND"),
+        length("depth", abs(depth)), boolean("oppositeDirection", depth < 0), boolean("defaultScope", True)])
+
+
+def revolve(name, profile, axis, operation):
+    # Full revolution of the sketch regions about the sketch's construction line axis
+    return feature("revolve", name, [
+        enum("bodyType", "ExtendedToolBodyType", "SOLID"), enum("operationType", "NewBodyOperationType", operation),
+        query_list("entities", region_query(profile)), query_list("axis", edge_query(profile, axis)),
+        enum("revolveType", "RevolveType", "FULL"), boolean("defaultScope", True)])
+
+
+def loft(name, profiles, operation):
+    items = [{"btType": "BTMArrayParameterItem-1843", "parameters": [query_list("sheetProfileEntities", region_query(profile))]} for profile in profiles]
+    return feature("loft", name, [
+        enum("bodyType", "ExtendedToolBodyType", "SOLID"), enum("operationType", "NewBodyOperationType", operation),
+        {"btType": "BTMParameterArray-2025", "parameterId": "sheetProfilesArray", "items": items}, boolean("defaultScope", True)])
+
+
+def hexagon(radius, x=0.0, y=0.0):
+    # Inscribed hexagon as sketched in createTurbine (first vertex at -30 degrees)
+    return [(x + radius * math.cos(math.radians(60 * i - 30)), y + radius * math.sin(math.radians(60 * i - 30))) for i in range(6)]
+
+
+def rotate(points, angle, x=0.0, y=0.0):
+    # points turned by angle about the axis, then moved by (x, y)
+    c, s = math.cos(angle), math.sin(angle)
+    return [(x + px * c - py * s, y + px * s + py * c) for px, py in points]
+
+
+def blade_outline(design, segments=16):
+    # Savonius blade section as sketched in createTurbine: an arc from the axis with bladeDepth as sagitta,
+    # offset inwards by bladeThickness, the ends joined
+    radius, sweep_angle = blade_arc(design)
+    cx, cy = -radius + design['bladeDepth'], design['outerDiameter'] / 4.0
+    start = math.atan2(-cy, -cx)
+    angles = start + np.linspace(0.0, sweep_angle, segments + 1)
+    inner = radius - design['bladeThickness']
+    return [(cx + radius * math.cos(a), cy + radius * math.sin(a)) for a in angles] + [(cx + inner * math.cos(a), cy + inner * math.sin(a)) for a in angles[::-1]]
+
+
+def revolve_profile(axis_start, axis_end, radii):
+    # Half section of a body of revolution about the line axis_start -> axis_end: radii (r0, r1) at the two ends
+    ux, uy = axis_end[0] - axis_start[0], axis_end[1] - axis_start[1]
+    size = math.hypot(ux, uy)
+    nx, ny = -uy / size, ux / size
+    return [axis_start, (axis_start[0] + nx * radii[0], axis_start[1] + ny * radii[0]), (axis_end[0] + nx * radii[1], axis_end[1] + ny * radii[1]), axis_end]
+
+
+def turbine_features(design, phase=0.0, base=0.0):
+    # Every feature createTurbine builds for one module, from the headless description (turbine_design), in the
+    # order they have to be created. Z is up; the module stands at height base (cm) turned phase (radians) about
+    # the shaft, as the stacked occurrences of VAWT360. Circular patterns are laid out directly in the sketches.
+    H = design['turbineHeight']
+    hole_radius = design['holeDiameter'] / 2.0
+    features = []
+    planes = {}
+
+    def plane(z):
+        # Top plane for the ground, an offset plane for every other height
+        z = round(base + z, 9)
+        if z == 0.0:
+            return "Top"
+        if z not in planes:
+            planes[z] = f"Plane {len(planes) + 1}"
+            features.append(offset_plane(planes[z], z))
+        return planes[z]
+
+    def place(points, angle=0.0, x=0.0, y=0.0):
+        # Module coordinates of points given in a frame turned by angle and moved by (x, y)
+        return rotate(rotate(points, angle, x, y), phase)
+
+    def revolved(name, z, outline, axis, operation):
+        features.append(sketch(f"{name} sketch", plane(z), sketch_polygon("profile", outline) + [sketch_line("axis", axis[0], axis[1], construction=True)]))
+        features.append(revolve(name, f"{name} sketch", "axis", operation))
+
+    # Shaft with the hex bore
+    features.append(sketch("Shaft sketch", plane(0.0), [sketch_circle("shaft", place([(0.0, 0.0)])[0], design['shaftDiameter'] / 2.0)]))
+    features.append(extrude("Shaft", "Shaft sketch", H, "NEW"))
+    features.append(sketch("Shaft hex bore sketch", plane(0.0), sketch_polygon("bore", place(hexagon(hole_radius)))))
+    features.append(extrude("Shaft hex bore", "Shaft hex bore sketch", H, "REMOVE"))
+
+    # Savonius blades: the twisted sweep as a loft through sections turned along the height
+    twist = -float(twist_angle(design))
+    sections = max(2, math.ceil(abs(twist) / math.radians(45.0))) + 1
+    outline = blade_outline(design)
+    for b in range(design['bladeCount']):
+        names = []
+        for k in range(sections):
+            names.append(f"Blade {b + 1} section {k + 1}")
+            angle = 2.0 * math.pi * b / design['bladeCount'] + twist * k / (sections - 1)
+            features.append(sketch(names[-1], plane(H * k / (sections - 1)), sketch_polygon("blade", place(outline, angle))))
+        features.append(loft(f"Blade {b + 1}", names, "NEW"))
+
+    # Airfoils: naca4 outline flipped for clockwise rotation at distanceFromCenter, extruded symmetrically about mid-height
+    chord = design['chordLength']
+    X, Y = naca4(design['nacaProfile'], n=50)
+    section = [(chord / 2.0 - x * chord, y * chord) for x, y in zip(X[:-1], Y[:-1])]
+    count = design['airfoilCount']
+    airfoils = [place(section, 2.0 * math.pi * k / count, *rotate([(0.0, -design['distanceFromCenter'])], 2.0 * math.pi * k / count)[0]) for k in range(count)]
+    features.append(sketch("Airfoil sketch", plane(H / 2.0), [line for k, points in enumerate(airfoils) for line in sketch_polygon(f"airfoil{k}", points)]))
+    features.append(extrude("Airfoils", "Airfoil sketch", float(airfoil_span(design)), "NEW", symmetric=True))
+
+    # Cone pins at both ends of every airfoil along its thickness direction, with a socket for the hex shaft
+    # (round, of the hexagon's corner radius: a revolve cannot cut a hexagon)
+    pin_height = naca_half_thickness(design['nacaProfile'], 0.5) * chord + PIN_OFFSET
+    pin_cut = naca_half_thickness(design['nacaProfile'], 0.5) + PIN_CUT_EXTRA
+    for end, z in (("Bottom", -BOTTOM_PIN_RADIUS), ("Top", H + BOTTOM_PIN_RADIUS)):
+        for k in range(count):
+            angle = 2.0 * math.pi * k / count
+            centre = rotate([(0.0, -design['distanceFromCenter'])], angle)[0]
+            axis = place([(0.0, 0.0), (0.0, pin_height)], angle, *centre)
+            revolved(f"{end} pin {k + 1}", z, revolve_profile(axis[0], axis[1], (BOTTOM_PIN_RADIUS, TOP_PIN_RADIUS)), axis, "ADD")
+            socket = place([(0.0, pin_height - pin_cut), (0.0, pin_height)], angle, *centre)
+            revolved(f"{end} pin {k + 1} socket", z, revolve_profile(socket[0], socket[1], (hole_radius, hole_radius)), socket, "REMOVE")
+
+    # Connectors: 1 in discs below and above the module, a hex socket for the shaft, and a screw hole and a
+    # pin socket for every airfoil
+    hex_radius = CONNECTOR_HEX_DIAMETER / 2.0
+    radius = CONNECTOR_DIAMETER / 2.0
+    for end, z, direction in (("Bottom", 0.0, -1.0), ("Top", H, 1.0)):
+        features.append(sketch(f"{end} connector sketch", plane(z), [sketch_circle("disc", place([(0.0, 0.0)])[0], radius)]))
+        features.append(extrude(f"{end} connector", f"{end} connector sketch", direction * CONNECTOR_HEIGHT, "NEW"))
+        features.append(sketch(f"{end} connector shaft hex sketch", plane(z), sketch_polygon("hex", place(hexagon(hex_radius)))))
+        features.append(extrude(f"{end} connector shaft hex", f"{end} connector shaft hex sketch",
+                                direction * (CONNECTOR_SHAFT_DEPTH if end == "Top" else CONNECTOR_HEIGHT), "REMOVE"))
+        screws = place([(-CONNECTOR_DIAMETER / 3.0, 0.0)])
+        features.append(sketch(f"{end} connector screw sketch", plane(z),
+                               [sketch_circle(f"screw{k}", rotate(screws, 2.0 * math.pi * k / count)[0], SCREW_RADIUS) for k in range(count)]))
+        features.append(extrude(f"{end} connector screws", f"{end} connector screw sketch", direction * SCREW_DEPTH, "REMOVE"))
+        for k in range(count):
+            socket = place([(-radius, 0.0), (-radius + CONNECTOR_DIAMETER / 4.0, 0.0)], 2.0 * math.pi * k / count)
+            revolved(f"{end} connector socket {k + 1}", z + direction * BOTTOM_PIN_RADIUS, revolve_profile(socket[0], socket[1], (hex_radius, hex_radius)), socket, "REMOVE")
+    return features
+
+
+def resolve(feature, feature_ids):
+    # feature with every <<name>> reference replaced by that feature's id
+    return json.loads(re.sub(r'<<(.+?)>>', lambda match: feature_ids[match.group(1)], json.dumps(feature)))
+
+
+def create_turbine(client, document_id, workspace_id, element_id, design, phase=0.0, base=0.0):
+    # Submits one module's features, one request each since later features refer to the ids of earlier ones.
+    # Returns per-request timings; a feature Onshape cannot regenerate stops the build.
+    feature_ids = {"Top": "Top"}
+    timings = []
+    for item in turbine_features(design, phase, base):
+        start = time.perf_counter()
+        answer = client.add_feature(document_id, workspace_id, element_id, resolve(item, feature_ids))
+        status = answer.get('featureState', {}).get('featureStatus', 'OK')
+        if status != 'OK':
+            raise OnshapeError(f"Feature '{item['name']}' did not regenerate: {status}", body=answer)
+        feature_ids[item['name']] = answer['feature']['featureId']
+        timings.append({"feature": item['name'], "seconds": time.perf_counter() - start})
+    return timings
+
+
+def create_stack(client, document_id, workspace_id, design, phases, workers=4):
+    # One part studio per module of a stack, each module turned by its phase (radians) and raised by the module
+    # pitch as in VAWT360's stack mode, submitted concurrently over the client's connection pool
+    pitch = design['turbineHeight'] + 2 * CONNECTOR_HEIGHT
+
+    def build(index, phase):
+        start = time.perf_counter()
+        element_id = client.create_part_studio(document_id, workspace_id, f"Module {index + 1}")['id']
+        timings = create_turbine(client, document_id, workspace_id, element_id, design, phase, index * pitch)
+        return {"module": index + 1, "element_id": element_id, "phase": phase, "requests": timings, "seconds": time.perf_counter() - start}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(build, range(len(phases)), phases))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create an Onshape document with a stack of turbine modules')
+    parser.add_argument('--name', default='Wind Turbine Design')
+    parser.add_argument('--url', default=BASE_URL)
+    parser.add_argument('--modules', type=int, default=1)
+    parser.add_argument('--phase-offset', type=float, default=None, help='rotation of each module over the one below, degrees (default spreads the blades evenly)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--naca', default='0015')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca)
+    offset = args.phase_offset if args.phase_offset is not None else 360.0 / (design['airfoilCount'] * args.modules)
+    with OnshapeClient(base_url=args.url, pool_size=max(args.workers, 1)) as client:
+        document = client.create_document(args.name)
+        document_id = document['id']
+        print(f'Document ID: {document_id}')
+        print(f'Document URL: {args.url}/documents/{document_id}')
+        workspace_id = client.default_workspace(document_id)
+        print(f'Workspace ID: {workspace_id}')
+        start = time.perf_counter()
+        modules = create_stack(client, document_id, workspace_id, design, [math.radians(offset * i) for i in range(args.modules)], args.workers)
+        for module in modules:
+            slowest = max(module['requests'], key=lambda r: r['seconds'])
+            print(f"Module {module['module']} ({module['element_id']}, {math.degrees(module['phase']):.1f} deg): {len(module['requests'])} features, "
+                  f"slowest {slowest['feature']} {slowest['seconds'] * 1e3:.0f} ms; {module['seconds'] * 1e3:.0f} ms total")
+        print(f"{args.modules} modules in {time.perf_counter() - start:.2f} s")
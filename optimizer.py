@@ -0,0 +1,326 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dmst import flat_plate_polar
+from hybrid import LIFT_TSR, annual_energy, power_curve
+from polar_store import NACA_PROFILES, PolarDatabase, default_source
+from surrogate import SurrogateCache, source_digest
+from print_estimate import estimate_print
+from reynolds_field import reynolds_table
+from structural import max_safe_rpm
+from turbine_design import design_problems, turbine_design
+
+# Searched parameters: (name, low, high); lengths in Fusion internal units (cm)
+CONTINUOUS = [
+    ('chordLength', 1.0 * 2.54, 6.0 * 2.54),
+    ('distanceFromCenter', 6.0 * 2.54, 20.0 * 2.54),
+]
+INTEGER = [
+    ('bladeCount', 2, 5),
+    ('twistCount', 1, 3),
+    ('airfoilCount', 2, 6),
+]
+DIMENSIONS = len(CONTINUOUS) + len(INTEGER) + 1  # + NACA profile
+
+# Objectives, all minimised
+OBJECTIVES = ['energy_kwh', 'volume_cm3', 'print_hours']
+
+WIND_SPEEDS = np.arange(1.0, 20.5, 0.5)
+
+# Modules whose code determines the metrics of evaluate(), besides this one
+MODEL_MODULES = ['dmst', 'hybrid', 'savonius', 'print_estimate', 'structural', 'reynolds_field', 'polar_tables', 'polar_store', 'panel', 'turbine_design']
+
+_polar_db = None
+
+
+def decode(unit, base=None):
+    # Point in the unit hypercube -> turbine design
+    design = dict(base or turbine_design())
+    for u, (name, low, high) in zip(unit, CONTINUOUS):
+        design[name] = float(low + u * (high - low))
+    for u, (name, low, high) in zip(unit[len(CONTINUOUS):], INTEGER):
+        design[name] = int(min(low + np.floor(u * (high - low + 1)), high))
+    design['nacaProfile'] = NACA_PROFILES[min(int(unit[-1] * len(NACA_PROFILES)), len(NACA_PROFILES) - 1)]
+    return design
+
+
+def design_polar(design, mean_wind_speed, polar_source):
+    if polar_source == 'flat':
+        return flat_plate_polar()
+    global _polar_db
+    if _polar_db is None:
+        _polar_db = PolarDatabase()
+    # Polars following each blade element's Reynolds number over the ring's TSR range
+    return reynolds_table(_polar_db, design, mean_wind_speed, (LIFT_TSR[0], LIFT_TSR[-1]))
+
+
+def evaluate(design, mean_wind_speed=5.0, polar_source='database'):
+    problems = design_problems(design)
+    if problems:
+        return {'valid': False, 'energy_kwh': 0.0, 'volume_cm3': float('inf'), 'print_hours': float('inf'), 'problems': problems}
+    curve = power_curve(design, design_polar(design, mean_wind_speed, polar_source), WIND_SPEEDS)
+    # Above the structural speed limit the rotor has to be braked, so those wind speeds produce nothing
+    rpm_limit = max_safe_rpm(design, curve['wind_speed'])
+    curve['power'] = np.where(curve['rpm'] <= rpm_limit, curve['power'], 0.0)
+    printed = estimate_print(design)
+    return {
+        'valid': True,
+        'energy_kwh': float(annual_energy(curve, mean_wind_speed)),
+        'volume_cm3': float(printed['volume_cm3']),
+        'print_hours': float(printed['print_hours']),
+        'mass_g': float(printed['mass_g']),
+        'max_safe_rpm': float(np.min(rpm_limit)),
+        'problems': [],
+    }
+
+
+def evaluation_context(mean_wind_speed, polar_source):
+    # Everything besides the design that evaluate() depends on, for keying stored surrogate evaluations
+    directory = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.abspath(__file__)] + [os.path.join(directory, name + '.py') for name in MODEL_MODULES]
+    context = {'mean_wind_speed': float(mean_wind_speed), 'polar_source': polar_source, 'model': source_digest(paths)}
+    if polar_source == 'database':
+        # XFOIL and panel method polars give different energies
+        context['polar_solver'] = default_source()
+    return context
+
+
+def _evaluate_units(args):
+    units, base, mean_wind_speed, polar_source = args
+    return [evaluate(decode(unit, base), mean_wind_speed, polar_source) for unit in units]
+
+
+def objective_matrix(metrics):
+    # Minimisation form: energy is maximised, infeasible designs are dominated by every feasible one
+    return np.array([[-m['energy_kwh'], m['volume_cm3'], m['print_hours']] if m['valid'] else [np.inf, np.inf, np.inf] for m in metrics])
+
+
+def latin_hypercube(n, dimensions, rng):
+    # One sample per stratum in every dimension, strata shuffled independently
+    samples = (np.arange(n)[:, None] + rng.random((n, dimensions))) / n
+    for d in range(dimensions):
+        samples[:, d] = samples[rng.permutation(n), d]
+    return samples
+
+
+def dominates(a, b):
+    return np.all(a <= b, axis=-1) & np.any(a < b, axis=-1)
+
+
+def nondominated_ranks(objectives):
+    # Front index of every point (0 = Pareto front)
+    n = len(objectives)
+    dominated_by = dominates(objectives[:, None, :], objectives[None, :, :])  # [i, j]: i dominates j
+    counts = dominated_by.sum(axis=0)
+    ranks = np.full(n, -1)
+    front = np.flatnonzero(counts == 0)
+    rank = 0
+    while front.size:
+        ranks[front] = rank
+        counts = counts - dominated_by[front].sum(axis=0)
+        counts[ranks >= 0] = -1
+        front = np.flatnonzero(counts == 0)
+        rank += 1
+    return ranks
+
+
+def crowding_distance(objectives):
+    n, m = objectives.shape
+    distance = np.zeros(n)
+    if n <= 2:
+        return np.full(n, np.inf)
+    finite = np.where(np.isfinite(objectives), objectives, np.nanmax(np.where(np.isfinite(objectives), objectives, np.nan), axis=0) + 1.0)
+    for k in range(m):
+        order = np.argsort(finite[:, k])
+        span = finite[order[-1], k] - finite[order[0], k]
+        distance[order[0]] = distance[order[-1]] = np.inf
+        if span > 0:
+            distance[order[1:-1]] += (finite[order[2:], k] - finite[order[:-2], k]) / span
+    return distance
+
+
+def select(objectives, size):
+    # Truncate to size by front rank, then by crowding distance within the last front taken
+    ranks = nondominated_ranks(objectives)
+    chosen = []
+    for rank in range(ranks.max() + 1):
+        front = np.flatnonzero(ranks == rank)
+        if len(chosen) + len(front) <= size:
+            chosen.extend(front)
+        else:
+            crowding = crowding_distance(objectives[front])
+            chosen.extend(front[np.argsort(-crowding)][:size - len(chosen)])
+            break
+    return np.array(chosen)
+
+
+class Optimizer:
+    # Multi-objective differential evolution (DEMO): a trial replaces its parent if it dominates it,
+    # is dropped if dominated, and otherwise joins the population, which is then truncated by
+    # non-dominated sorting and crowding distance.
+    def __init__(self, population=32, mean_wind_speed=5.0, polar_source='database', base=None, workers=None, checkpoint=None, seed=0, differential_weight=0.6, crossover=0.8, surrogate=False, surrogate_threshold=0.02):
+        self.size = population
+        self.mean_wind_speed = mean_wind_speed
+        self.polar_source = polar_source
+        self.base = base or turbine_design()
+        self.workers = workers
+        self.checkpoint = checkpoint
+        self.differential_weight = differential_weight
+        self.crossover = crossover
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+        self.units = None
+        self.metrics = None
+        self.archive = []  # every evaluated (unit, metrics) pair
+        self.full_evaluations = 0
+        self.surrogate_threshold = surrogate_threshold
+        self.surrogate = self._surrogate() if surrogate else None
+
+    def _surrogate(self):
+        # Keyed by the current settings; load() builds it again once the checkpoint has replaced them
+        mean_wind_speed, polar_source = self.mean_wind_speed, self.polar_source
+        return SurrogateCache(lambda design: evaluate(design, mean_wind_speed, polar_source), OBJECTIVES, evaluation_context(mean_wind_speed, polar_source), threshold=self.surrogate_threshold)
+
+    def evaluate(self, executor, units):
+        # Surrogate answers first (when enabled), the rest goes to the process pool
+        designs = [decode(unit, self.base) for unit in units]
+        metrics = self.surrogate.predict(designs) if self.surrogate else [None] * len(units)
+        todo = [i for i, m in enumerate(metrics) if m is None]
+        chunk = max(1, len(todo) // (4 * (self.workers or os.cpu_count() or 1)))
+        jobs = [(units[todo[i:i + chunk]], self.base, self.mean_wind_speed, self.polar_source) for i in range(0, len(todo), chunk)]
+        for i, m in zip(todo, [m for batch in executor.map(_evaluate_units, jobs) for m in batch]):
+            metrics[i] = m
+            if self.surrogate:
+                self.surrogate.record(designs[i], m)
+        self.full_evaluations += len(todo)
+        self.archive.extend(zip(units.tolist(), metrics))
+        return metrics
+
+    def step(self, executor):
+        if self.units is None:
+            self.units = latin_hypercube(self.size, DIMENSIONS, self.rng)
+            self.metrics = self.evaluate(executor, self.units)
+            self.generation += 1
+            return
+
+        n = len(self.units)
+        # DE/rand/1/bin mutation and crossover for every member at once
+        picks = np.array([self.rng.choice(np.delete(np.arange(n), i), 3, replace=False) for i in range(n)])
+        mutant = self.units[picks[:, 0]] + self.differential_weight * (self.units[picks[:, 1]] - self.units[picks[:, 2]])
+        cross = self.rng.random((n, DIMENSIONS)) < self.crossover
+        cross[np.arange(n), self.rng.integers(DIMENSIONS, size=n)] = True
+        trials = np.clip(np.where(cross, mutant, self.units), 0.0, 1.0)
+        trial_metrics = self.evaluate(executor, trials)
+
+        parents = objective_matrix(self.metrics)
+        children = objective_matrix(trial_metrics)
+        replace = dominates(children, parents)
+        dropped = dominates(parents, children)
+        units = np.where(replace[:, None], trials, self.units)
+        metrics = [t if r else p for p, t, r in zip(self.metrics, trial_metrics, replace)]
+        extra = ~replace & ~dropped
+        units = np.concatenate((units, trials[extra]))
+        metrics = metrics + [m for m, e in zip(trial_metrics, extra) if e]
+
+        keep = select(objective_matrix(metrics), self.size)
+        self.units = units[keep]
+        self.metrics = [metrics[i] for i in keep]
+        self.generation += 1
+
+    def run(self, generations):
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            while self.generation < generations:
+                start = time.perf_counter()
+                self.step(executor)
+                front = self.pareto_front()
+                best = max((m['energy_kwh'] for _, m in front), default=0.0)
+                print(f"Generation {self.generation}: {len(self.archive)} evaluations ({self.full_evaluations} full), {len(front)} on the front, best {best:.1f} kWh/yr ({time.perf_counter() - start:.1f} s)")
+                self.save()
+
+    def pareto_front(self):
+        if not self.archive:
+            return []
+        objectives = objective_matrix([m for _, m in self.archive])
+        feasible = np.all(np.isfinite(objectives), axis=1)
+        if not feasible.any():
+            return []
+        front = np.flatnonzero(feasible)[nondominated_ranks(objectives[feasible]) == 0]
+        return [(decode(np.array(self.archive[i][0]), self.base), self.archive[i][1]) for i in front]
+
+    def save(self):
+        if not self.checkpoint:
+            return
+        state = {
+            'generation': self.generation,
+            'units': self.units.tolist(),
+            'metrics': self.metrics,
+            'archive': self.archive,
+            'full_evaluations': self.full_evaluations,
+            'rng': self.rng.bit_generator.state,
+            'settings': {'size': self.size, 'mean_wind_speed': self.mean_wind_speed, 'polar_source': self.polar_source, 'base': self.base},
+        }
+        temp = self.checkpoint + '.tmp'
+        with open(temp, 'w') as file:
+            json.dump(state, file, default=_json_default)
+        os.replace(temp, self.checkpoint)
+
+    def load(self):
+        with open(self.checkpoint, 'r') as file:
+            state = json.load(file)
+        self.generation = state['generation']
+        self.units = np.array(state['units'])
+        self.metrics = state['metrics']
+        self.archive = [tuple(entry) for entry in state['archive']]
+        # Checkpoints written before the counter was saved count every archived point as a full evaluation
+        self.full_evaluations = state.get('full_evaluations', len(self.archive))
+        self.rng.bit_generator.state = state['rng']
+        settings = state['settings']
+        self.size, self.mean_wind_speed, self.polar_source, self.base = settings['size'], settings['mean_wind_speed'], settings['polar_source'], settings['base']
+        if self.surrogate:
+            self.surrogate = self._surrogate()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialise {type(value)}")
+
+
+def write_front(front, path):
+    names = [name for name, _, _ in CONTINUOUS] + [name for name, _, _ in INTEGER] + ['nacaProfile']
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(names + OBJECTIVES)
+        for design, metrics in sorted(front, key=lambda entry: -entry[1]['energy_kwh']):
+            writer.writerow([design[name] for name in names] + [round(metrics[name], 4) for name in OBJECTIVES])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Search bladeCount, twistCount, chordLength, distanceFromCenter, airfoilCount and NACA profile for the energy / material / print time Pareto front')
+    parser.add_argument('--generations', type=int, default=30)
+    parser.add_argument('--population', type=int, default=32)
+    parser.add_argument('--mean-wind-speed', type=float, default=5.0)
+    parser.add_argument('--polar', choices=['database', 'flat'], default='database', help='polars from the polar database or a flat-plate stand-in')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default='optimizer_checkpoint.json')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='pareto_front.csv')
+    parser.add_argument('--surrogate', action='store_true', help='answer confident points from a Gaussian process fitted on stored evaluations')
+    parser.add_argument('--surrogate-threshold', type=float, default=0.02, help='largest predicted std, as a fraction of each metric\'s spread, the surrogate may answer with')
+    args = parser.parse_args()
+
+    optimizer = Optimizer(args.population, args.mean_wind_speed, args.polar, workers=args.workers, checkpoint=args.checkpoint, seed=args.seed, surrogate=args.surrogate, surrogate_threshold=args.surrogate_threshold)
+    if args.resume and os.path.exists(args.checkpoint):
+        optimizer.load()
+        print(f"Resuming at generation {optimizer.generation} with {len(optimizer.archive)} evaluations")
+    optimizer.run(args.generations)
+    front = optimizer.pareto_front()
+    write_front(front, args.output)
+    print(f"Wrote {len(front)} Pareto-optimal designs to {args.output}")
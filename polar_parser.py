@@ -0,0 +1,246 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+POLAR_COLUMNS = ['alpha', 'CL', 'CD', 'CDp', 'CM', 'Top_Xtr', 'Bot_Xtr']
+
+
+def _table_row(line):
+    stripped = line.lstrip()
+    return stripped[:1] in ('-', '.', '*', '0', '1', '2', '3', '4', '5', '6', '7', '8', '9') and not stripped.startswith('--')
+
+
+def _field_bounds(dashes):
+    # Column boundaries from the '------ --------' line under the header: each field ends where its dashes end
+    bounds = []
+    start = 0
+    for i, c in enumerate(dashes):
+        if c == '-' and (i + 1 == len(dashes) or dashes[i + 1] != '-'):
+            bounds.append((start, i + 1))
+            start = i + 1
+    return bounds
+
+
+def _parse_fixed(rows, bounds):
+    # Field by field at the fixed column positions; fields XFOIL overflowed ('********') become NaN
+    table = np.full((len(rows), len(bounds)), np.nan)
+    for i, row in enumerate(rows):
+        for c, (start, end) in enumerate(bounds):
+            try:
+                table[i, c] = float(row[start:end])
+            except ValueError:
+                pass
+    return table
+
+
+def _parse_table(rows, columns, dashes):
+    # Whole table in one numpy call; the slow fixed-column path only for tables with overflowed fields
+    text = ' '.join(rows)
+    if '*' not in text:
+        values = np.fromstring(text, sep=' ') if rows else np.empty(0)
+        if values.size == len(rows) * len(columns):
+            return values.reshape(len(rows), len(columns))
+    bounds = _field_bounds(dashes)
+    if len(bounds) != len(columns):
+        raise ValueError(f"Polar table columns {columns} do not match the separator line")
+    return _parse_fixed(rows, bounds)
+
+
+def parse_polars(text):
+    # One pass over the lines: headers are read as they come, table rows are collected per polar
+    # and each table is converted to floats in a single numpy call
+    polars = []
+    tables = []
+    polar = None
+    in_table = False
+    for line in text.splitlines():
+        if in_table:
+            if _table_row(line):
+                tables[-1][2].append(line)
+                continue
+            if line.strip():
+                in_table = False
+        if 'Calculated polar for:' in line:
+            polar = {'name': line.split(':', 1)[1].strip(), 'mach': None, 'reynolds': None, 'ncrit': None}
+            polars.append(polar)
+            tables.append([POLAR_COLUMNS, '', []])
+        elif polar is None:
+            continue
+        elif 'Re =' in line and 'Mach =' in line:
+            # " Mach =   0.000     Re =     0.620 e 6     Ncrit =   9.000"
+            fields = line.replace('=', ' ').split()
+            polar['mach'] = float(fields[1])
+            polar['reynolds'] = float(fields[3]) * 10 ** int(fields[5])
+            polar['ncrit'] = float(fields[7])
+        elif line.lstrip().startswith('alpha'):
+            tables[-1][0] = line.split()
+        elif line.lstrip().startswith('------'):
+            tables[-1][1] = line
+            in_table = True
+
+    for polar, (columns, dashes, rows) in zip(polars, tables):
+        table = _parse_table(rows, columns, dashes)
+        for c, name in enumerate(columns):
+            polar[name] = table[:, c]
+    return polars
+
+
+def parse_polar(text):
+    polars = parse_polars(text)
+    if not polars:
+        raise ValueError("No XFOIL polar found")
+    return polars[0]
+
+
+def read_polars(path):
+    with open(path, 'r') as file:
+        return parse_polars(file.read())
+
+
+def parse_dumps(text):
+    # XFOIL DUMP output: a '#' header naming the columns followed by numeric rows,
+    # several dumps may be appended to one file
+    blocks = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            blocks.append((stripped[1:].split(), []))
+        elif stripped and blocks:
+            blocks[-1][1].append(stripped)
+    dumps = []
+    for columns, rows in blocks:
+        # Wake points carry fewer columns than surface points, pad them with NaN
+        table = np.full((len(rows), len(columns)), np.nan)
+        for i, row in enumerate(rows):
+            row_values = np.fromstring(row, sep=' ')
+            table[i, :len(row_values)] = row_values[:len(columns)]
+        dumps.append({name: table[:, c] for c, name in enumerate(columns)})
+    return dumps
+
+
+def read_dumps(path):
+    with open(path, 'r') as file:
+        return parse_dumps(file.read())
+
+
+def columnar(polars):
+    # All polars in one set of contiguous column arrays; rows of polar i are offsets[i]:offsets[i + 1]
+    counts = np.array([len(polar['alpha']) for polar in polars], dtype=np.int64)
+    store = {
+        'name': np.array([polar['name'] for polar in polars]),
+        'reynolds': np.array([polar['reynolds'] for polar in polars], dtype=np.float64),
+        'mach': np.array([polar['mach'] for polar in polars], dtype=np.float64),
+        'ncrit': np.array([polar['ncrit'] for polar in polars], dtype=np.float64),
+        'offsets': np.concatenate(([0], np.cumsum(counts))),
+    }
+    for name in POLAR_COLUMNS:
+        store[name] = np.concatenate([polar.get(name, np.full(len(polar['alpha']), np.nan)) for polar in polars]) if polars else np.empty(0)
+    return store
+
+
+def store_polar(store, i):
+    start, end = store['offsets'][i], store['offsets'][i + 1]
+    polar = {'name': str(store['name'][i]), 'reynolds': store['reynolds'][i], 'mach': store['mach'][i], 'ncrit': store['ncrit'][i]}
+    for name in POLAR_COLUMNS:
+        polar[name] = store[name][start:end]
+    return polar
+
+
+def _read_files(paths):
+    return columnar([polar for path in paths for polar in read_polars(path)])
+
+
+def merge(stores):
+    merged = {name: np.concatenate([store[name] for store in stores]) for name in ['name', 'reynolds', 'mach', 'ncrit'] + POLAR_COLUMNS}
+    counts = np.concatenate([np.diff(store['offsets']) for store in stores])
+    merged['offsets'] = np.concatenate(([0], np.cumsum(counts)))
+    return merged
+
+
+def load_directory(directory, workers=None, chunk_size=64):
+    # Parses every polar file under directory across a process pool and returns one columnar store
+    paths = sorted(os.path.join(root, name) for root, _, names in os.walk(directory) for name in names if not name.startswith('.'))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return _read_files(paths)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return merge(list(executor.map(_read_files, chunks)))
+
+
+def save_store(store, path):
+    np.savez(path, **store)
+
+
+def load_store(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def synthetic_polar(name, reynolds, alpha):
+    cl = 0.105 * alpha * (1 - 0.08 / np.log10(reynolds))
+    cd = 0.006 + 1e-4 * alpha ** 2 * (6.0 / np.log10(reynolds))
+    lines = [
+        "  ",
+        "       XFOIL         Version 6.99",
+        "  ",
+        f" Calculated polar for: {name}",
+        "  ",
+        " 1 1 Reynolds number fixed          Mach number fixed         ",
+        "  ",
+        " xtrf =   1.000 (top)        1.000 (bottom)  ",
+        f" Mach =   0.000     Re = {reynolds / 1e6:9.3f} e 6     Ncrit =   9.000",
+        "  ",
+        "   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr",
+        "  ------ -------- --------- --------- -------- -------- --------",
+    ]
+    for a, l, d in zip(alpha, cl, cd):
+        lines.append(" %7.3f %8.4f %9.5f %9.5f %8.4f %8.4f %8.4f" % (a, l, d, 0.4 * d, -0.002 * a, 0.9 - 0.03 * a, 0.1 + 0.03 * a))
+    return '\n'.join(lines) + '\n'
+
+
+def benchmark(n_polars=10000, polars_per_file=10, workers=None):
+    alpha = np.arange(-5.0, 15.5, 0.5)
+    reynolds = np.geomspace(2e4, 2e6, n_polars)
+    with tempfile.TemporaryDirectory(prefix='polars_') as directory:
+        for f in range(0, n_polars, polars_per_file):
+            with open(os.path.join(directory, f'polar{f:06d}.txt'), 'w') as file:
+                file.write(''.join(synthetic_polar('NACA 0015', re, alpha) for re in reynolds[f:f + polars_per_file]))
+
+        start = time.perf_counter()
+        serial = load_directory(directory, workers=1)
+        serial_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parallel = load_directory(directory, workers=workers)
+        parallel_time = time.perf_counter() - start
+
+    assert len(serial['reynolds']) == len(parallel['reynolds']) == n_polars
+    print(f"{n_polars} polars, {len(serial['alpha'])} rows")
+    print(f"serial:   {serial_time:.3f} s ({serial_time / n_polars * 1e6:.1f} us/polar)")
+    print(f"parallel: {parallel_time:.3f} s ({parallel_time / n_polars * 1e6:.1f} us/polar)")
+    return serial_time, parallel_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parse XFOIL polar files into a columnar NumPy store')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    load_parser = subparsers.add_parser('load', help='bulk-load a directory of polar files into an .npz store')
+    load_parser.add_argument('directory')
+    load_parser.add_argument('output')
+    load_parser.add_argument('--workers', type=int, default=None)
+    bench_parser = subparsers.add_parser('benchmark', help='time parsing of a synthetic polar corpus')
+    bench_parser.add_argument('--polars', type=int, default=10000)
+    bench_parser.add_argument('--per-file', type=int, default=10)
+    bench_parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        store = load_directory(args.directory, args.workers)
+        save_store(store, args.output)
+        print(f"Stored {len(store['reynolds'])} polars in {args.output}")
+    else:
+        benchmark(args.polars, args.per_file, args.workers)
@@ -0,0 +1,237 @@
+import argparse
+import bisect
+import math
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from polar_parser import POLAR_COLUMNS
+from polar_tables import TABLE_STEP, table_grids, uniform_table
+from turbine_design import naca_symmetric
+import panel
+from xfoil_batch import XFOIL_PATH, polar_job, run_polar, run_polar_batches, xfoil_available
+
+POLAR_DB_PATH = os.environ.get('POLAR_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'polars.sqlite')
+
+# NACA profiles offered for the add-in's airfoil ring
+NACA_PROFILES = ['0012', '0015', '0018', '0021', '2412', '4412']
+
+# Reynolds range of a printed turbine, from a few m/s on a small chord to storm wind on a large one
+RE_MIN = 2e4
+RE_MAX = 2e6
+
+# Angle of attack sweep (degrees) of every stored polar, so the resampled Reynolds grid shares one alpha range
+ALPHA_START = -20.0
+ALPHA_END = 20.0
+ALPHA_STEP = 0.5
+
+# Solvers a stored polar may come from; the two are never mixed in one Reynolds grid
+POLAR_SOURCES = ['xfoil', 'panel']
+
+
+def airfoil_key(name):
+    # 'NACA 0015', 'naca0015' and '0015' all refer to the same stored airfoil
+    name = name.strip()
+    if name.upper().startswith('NACA'):
+        name = name[4:].strip()
+    return name
+
+
+def polar_key(airfoil, mach, ncrit):
+    return airfoil_key(airfoil), round(float(mach), 3), round(float(ncrit), 2)
+
+
+def default_source(xfoil_path=XFOIL_PATH):
+    # XFOIL when it can run here, the panel method otherwise
+    return 'xfoil' if xfoil_available(xfoil_path) else 'panel'
+
+
+def sweep_job(reynolds, airfoil, mach=0.0, ncrit=9.0):
+    return polar_job(reynolds, naca=airfoil_key(airfoil), mach=mach, ncrit=ncrit, alpha_start=ALPHA_START, alpha_end=ALPHA_END, alpha_step=ALPHA_STEP)
+
+
+class PolarDatabase:
+    def __init__(self, path=POLAR_DB_PATH, runner=None, source=None):
+        # Serves and computes polars of one source only; runner(job) must produce polars of that source
+        self.path = path
+        self.source = source or default_source()
+        if self.source not in POLAR_SOURCES:
+            raise ValueError(f"Unknown polar source {self.source}")
+        self.runner = runner or (run_polar if self.source == 'xfoil' else panel.run_polar)
+        self.grids = {}
+        self.tables = {}
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            columns = [row[1] for row in db.execute('PRAGMA table_info(polars)')]
+            if columns and 'source' not in columns:
+                # Polars of an unknown solver are kept aside and never served
+                db.execute('ALTER TABLE polars RENAME TO polars_without_source')
+            db.execute('CREATE TABLE IF NOT EXISTS polars (airfoil TEXT, reynolds REAL, mach REAL, ncrit REAL, source TEXT, '
+                       + ', '.join(f'{name} BLOB' for name in POLAR_COLUMNS)
+                       + ', PRIMARY KEY (airfoil, reynolds, mach, ncrit, source))')
+            # +-180 degree tables of table(), valid until a polar of the same airfoil, Mach, Ncrit and source changes
+            db.execute('CREATE TABLE IF NOT EXISTS polar_tables (airfoil TEXT, reynolds REAL, mach REAL, ncrit REAL, source TEXT, step REAL, '
+                       'CL BLOB, CD BLOB, PRIMARY KEY (airfoil, reynolds, mach, ncrit, source, step))')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def add(self, polar, airfoil=None):
+        # polar is a parsed XFOIL polar with a header and column arrays, or a panel polar (marked by its source)
+        airfoil, mach, ncrit = polar_key(airfoil or polar['name'], polar['mach'], polar['ncrit'])
+        if len(polar['alpha']) == 0:
+            return
+        values = [np.asarray(polar[name], dtype=np.float64).tobytes() for name in POLAR_COLUMNS]
+        source = polar.get('source', 'xfoil')
+        with self._lock, self._connect() as db:
+            db.execute(f'INSERT OR REPLACE INTO polars VALUES ({", ".join("?" * (5 + len(POLAR_COLUMNS)))})',
+                       [airfoil, float(polar['reynolds']), mach, ncrit, source] + values)
+            db.execute('DELETE FROM polar_tables WHERE airfoil = ? AND mach = ? AND ncrit = ? AND source = ?', (airfoil, mach, ncrit, source))
+            self.grids.pop((airfoil, mach, ncrit), None)
+            self.tables = {key: table for key, table in self.tables.items() if key[0] != (airfoil, mach, ncrit)}
+
+    def grid(self, airfoil, mach=0.0, ncrit=9.0):
+        key = polar_key(airfoil, mach, ncrit)
+        grid = self.grids.get(key)
+        if grid is None:
+            # Loaded under the lock add() writes with, so a polar added meanwhile is never cached away
+            with self._lock:
+                grid = self.grids.get(key)
+                if grid is None:
+                    grid = self._load_grid(key)
+                    self.grids[key] = grid
+        return grid
+
+    def _load_grid(self, key):
+        with self._connect() as db:
+            rows = db.execute(f'SELECT reynolds, {", ".join(POLAR_COLUMNS)} FROM polars WHERE airfoil = ? AND mach = ? AND ncrit = ? AND source = ? ORDER BY reynolds',
+                              key + (self.source,)).fetchall()
+        if not rows:
+            return None
+        polars = [[np.frombuffer(blob, dtype=np.float64) for blob in row[1:]] for row in rows]
+        # Unconverged points are missing from some polars, so every polar is resampled
+        # onto the densest alpha grid and gaps become NaN
+        alpha = max((polar[0] for polar in polars), key=len)
+        grid = {'reynolds': np.array([row[0] for row in rows]), 'alpha': alpha}
+        grid['log_re'] = np.log(grid['reynolds'])
+        grid['log_re_list'] = grid['log_re'].tolist()
+        for c, name in enumerate(POLAR_COLUMNS[1:], start=1):
+            grid[name] = np.array([np.interp(alpha, polar[0], polar[c], left=np.nan, right=np.nan) for polar in polars])
+        return grid
+
+    def covers(self, airfoil, reynolds, mach=0.0, ncrit=9.0):
+        grid = self.grid(airfoil, mach, ncrit)
+        return grid is not None and grid['reynolds'][0] <= reynolds <= grid['reynolds'][-1]
+
+    def lookup(self, airfoil, reynolds, mach=0.0, ncrit=9.0):
+        # Stored polar interpolated in log(Re); XFOIL runs only when Re is outside the stored range
+        if not self.covers(airfoil, reynolds, mach, ncrit):
+            polar = self.runner(sweep_job(reynolds, airfoil, mach, ncrit))
+            if len(polar['alpha']) == 0:
+                raise RuntimeError(f"No converged points in the polar for NACA {airfoil_key(airfoil)} at Re={reynolds:.0f}")
+            if polar.get('source', 'xfoil') != self.source:
+                raise RuntimeError(f"The polar runner gave a {polar.get('source', 'xfoil')} polar to the {self.source} database")
+            self.add(polar, airfoil)
+        grid = self.grid(airfoil, mach, ncrit)
+        if grid is None:
+            raise RuntimeError(f"No converged polar for NACA {airfoil_key(airfoil)} at Re={reynolds}")
+        return interpolate(grid, reynolds)
+
+    def table(self, airfoil, reynolds, mach=0.0, ncrit=9.0, step=TABLE_STEP):
+        # lookup() extended to +-180 degrees and compiled into a uniform polar_tables.compiled_table, stored in
+        # polar_tables and kept in memory until the airfoil's grid changes
+        key = (polar_key(airfoil, mach, ncrit), float(reynolds), step)
+        table = self.tables.get(key)
+        if table is None:
+            row = key[0] + (self.source, float(reynolds), float(step))
+            grid = self.grid(airfoil, mach, ncrit)
+            with self._connect() as db:
+                stored = db.execute('SELECT CL, CD FROM polar_tables WHERE airfoil = ? AND mach = ? AND ncrit = ? AND source = ? AND reynolds = ? AND step = ?', row).fetchone()
+            if stored:
+                grids = [np.frombuffer(blob, dtype=np.float64) for blob in stored]
+            else:
+                polar = self.lookup(airfoil, reynolds, mach, ncrit)
+                grid = self.grids.get(key[0])
+                grids = table_grids(polar, step, symmetric=naca_symmetric(airfoil_key(airfoil)))
+            table = uniform_table(*grids)
+            with self._lock:
+                # Neither stored nor kept if a polar was added meanwhile: the table would already be out of date
+                if self.grids.get(key[0]) is grid:
+                    if not stored:
+                        with self._connect() as db:
+                            db.execute('INSERT OR REPLACE INTO polar_tables VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                       (row[0], row[4], row[1], row[2], row[3], row[5], grids[0].tobytes(), grids[1].tobytes()))
+                    self.tables[key] = table
+        return table
+
+    def missing(self, airfoil, reynolds_numbers, mach=0.0, ncrit=9.0):
+        grid = self.grid(airfoil, mach, ncrit)
+        if grid is None:
+            return list(reynolds_numbers)
+        return [re for re in reynolds_numbers if not grid['reynolds'][0] <= re <= grid['reynolds'][-1]]
+
+    def precompute(self, airfoils=NACA_PROFILES, re_min=RE_MIN, re_max=RE_MAX, count=16, mach=0.0, ncrit=9.0, xfoil_path=XFOIL_PATH, workers=None):
+        reynolds_numbers = np.geomspace(re_min, re_max, count)
+        jobs = [sweep_job(re, airfoil, mach, ncrit) for airfoil in airfoils for re in reynolds_numbers]
+        if self.source == 'xfoil':
+            polars = run_polar_batches(jobs, batch_size=count, workers=workers, xfoil_path=xfoil_path)
+        else:
+            polars = map(panel.run_polar, jobs)
+        for polar in polars:
+            self.add(polar)
+        return len(jobs)
+
+
+def interpolate(grid, reynolds):
+    # Linear in log(Re) between the two neighbouring stored polars; reynolds may be a scalar or an array
+    if np.ndim(reynolds) == 0:
+        return _interpolate_scalar(grid, float(reynolds))
+    log_re = grid['log_re']
+    x = np.log(reynolds)
+    if len(log_re) == 1:
+        lo = hi = np.zeros(len(x), dtype=int)
+        weight = np.zeros(len(x))
+    else:
+        hi = np.clip(np.searchsorted(log_re, x), 1, len(log_re) - 1)
+        lo = hi - 1
+        weight = np.clip((x - log_re[lo]) / (log_re[hi] - log_re[lo]), 0.0, 1.0)
+    weight = weight[:, None]
+    polar = {'alpha': grid['alpha'], 'reynolds': np.asarray(reynolds)}
+    for name in POLAR_COLUMNS[1:]:
+        polar[name] = grid[name][lo] * (1.0 - weight) + grid[name][hi] * weight
+    return polar
+
+
+def _interpolate_scalar(grid, reynolds):
+    log_re = grid['log_re_list']
+    x = math.log(reynolds)
+    hi = min(max(bisect.bisect_left(log_re, x), 1), len(log_re) - 1)
+    lo = max(hi - 1, 0)
+    weight = min(max((x - log_re[lo]) / (log_re[hi] - log_re[lo]), 0.0), 1.0) if hi != lo else 0.0
+    polar = {'alpha': grid['alpha'], 'reynolds': reynolds}
+    for name in POLAR_COLUMNS[1:]:
+        values = grid[name]
+        polar[name] = values[lo] + weight * (values[hi] - values[lo])
+    return polar
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fill the polar database with an XFOIL (or panel method) Reynolds sweep')
+    parser.add_argument('command', choices=['precompute'])
+    parser.add_argument('--db', default=POLAR_DB_PATH)
+    parser.add_argument('--naca', nargs='+', default=NACA_PROFILES)
+    parser.add_argument('--re-min', type=float, default=RE_MIN)
+    parser.add_argument('--re-max', type=float, default=RE_MAX)
+    parser.add_argument('--count', type=int, default=16)
+    parser.add_argument('--mach', type=float, default=0.0)
+    parser.add_argument('--ncrit', type=float, default=9.0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--xfoil', default=XFOIL_PATH)
+    parser.add_argument('--source', choices=POLAR_SOURCES, default=None, help='solver of the stored polars (default: XFOIL when it runs here)')
+    args = parser.parse_args()
+
+    database = PolarDatabase(args.db, source=args.source or default_source(args.xfoil))
+    total = database.precompute(args.naca, args.re_min, args.re_max, args.count, args.mach, args.ncrit, args.xfoil, args.workers)
+    print(f"Stored {total} polars in {args.db}")
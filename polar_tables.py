@@ -0,0 +1,140 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from turbine_design import naca_symmetric
+
+# Uniform lookup tables cover -180..180 degrees in steps of this many degrees
+TABLE_STEP = 0.25
+
+# Viterna's maximum drag coefficient of a blade of aspect ratio AR is 1.11 + 0.018 AR, with AR capped at 50
+ASPECT_RATIO_MAX = 50.0
+
+# Lift of an airfoil in reverse flow (trailing edge first) relative to the forward polar
+REVERSE_LIFT = 0.7
+
+
+def polar_table(polar):
+    # alpha in radians with CL/CD, sorted and without unconverged (NaN) points
+    alpha = np.asarray(polar['alpha'], dtype=np.float64)
+    cl = np.asarray(polar['CL'], dtype=np.float64)
+    cd = np.asarray(polar['CD'], dtype=np.float64)
+    keep = ~(np.isnan(alpha) | np.isnan(cl) | np.isnan(cd))
+    order = np.argsort(alpha[keep])
+    return np.radians(alpha[keep][order]), cl[keep][order], cd[keep][order]
+
+
+def viterna_cd_max(aspect_ratio=None):
+    # None stands for a 2-D section, i.e. the capped aspect ratio
+    return 1.11 + 0.018 * min(ASPECT_RATIO_MAX if aspect_ratio is None else aspect_ratio, ASPECT_RATIO_MAX)
+
+
+def _extend_positive(alpha, cl, cd, cd_max):
+    # CL and CD from the last polar point to +180 degrees: Viterna-Corrigan up to 90, its mirror image with
+    # REVERSE_LIFT beyond, and the reversed polar (trailing edge first) for the last alpha_s before 180
+    stall, cl_s, cd_s = alpha[-1], cl[-1], cd[-1]
+    if stall >= 0.5 * math.pi:
+        return np.empty(0), np.empty(0), np.empty(0)
+    b2 = (cd_s - cd_max * math.sin(stall) ** 2) / math.cos(stall)
+    a2 = (cl_s - cd_max * math.sin(stall) * math.cos(stall)) * math.sin(stall) / math.cos(stall) ** 2
+
+    def viterna(a):
+        return cd_max / 2.0 * np.sin(2.0 * a) + a2 * np.cos(a) ** 2 / np.sin(a), cd_max * np.sin(a) ** 2 + b2 * np.cos(a)
+
+    extension = np.radians(np.arange(math.floor(math.degrees(stall) + 1e-6) + 1.0, 180.5, 1.0))
+    forward = extension <= 0.5 * math.pi
+    mirrored = ~forward & (extension <= math.pi - stall)
+    reverse = extension > math.pi - stall
+    cl_out = np.empty(len(extension))
+    cd_out = np.empty(len(extension))
+    cl_out[forward], cd_out[forward] = viterna(extension[forward])
+    cl_v, cd_v = viterna(math.pi - extension[mirrored])
+    cl_out[mirrored], cd_out[mirrored] = -REVERSE_LIFT * cl_v, cd_v
+    cl_out[reverse] = REVERSE_LIFT * np.interp(extension[reverse] - math.pi, alpha, cl)
+    cd_out[reverse] = np.interp(extension[reverse] - math.pi, alpha, cd)
+    return extension, cl_out, cd_out
+
+
+def viterna_extrapolate(polar, aspect_ratio=None, symmetric=False):
+    # The polar extended to the full -180..180 degree range (alpha in degrees, like a parsed polar). Stall is
+    # taken at the last converged point at either end, so XFOIL's -5..15 sweep joins the extrapolation smoothly.
+    # A symmetric airfoil's polar is mirrored first, so the negative side is not extrapolated from -5 degrees.
+    alpha, cl, cd = polar_table(polar)
+    if symmetric:
+        alpha, inverse = np.unique(np.round(np.concatenate((alpha, -alpha)), 9), return_inverse=True)
+        counts = np.bincount(inverse)
+        cl = np.bincount(inverse, np.concatenate((cl, -cl))) / counts
+        cd = np.bincount(inverse, np.concatenate((cd, cd))) / counts
+    cd_max = viterna_cd_max(aspect_ratio)
+    up = _extend_positive(alpha, cl, cd, cd_max)
+    down = _extend_positive(-alpha[::-1], -cl[::-1], cd[::-1], cd_max)
+    return {
+        'alpha': np.degrees(np.concatenate((-down[0][::-1], alpha, up[0]))),
+        'CL': np.concatenate((-down[1][::-1], cl, up[1])),
+        'CD': np.concatenate((down[2][::-1], cd, up[2])),
+    }
+
+
+def uniform_index(alpha, size):
+    # Cell and fraction of alpha (radians, wrapped into -pi..pi) on a grid of size equal cells over -pi..pi
+    x = np.mod(np.asarray(alpha, dtype=np.float64) + math.pi, 2.0 * math.pi) * (size / (2.0 * math.pi))
+    index = np.minimum(x.astype(np.int64), size - 1)
+    return index, x - index
+
+
+def table_grids(polar, step=TABLE_STEP, aspect_ratio=None, symmetric=False):
+    # CL and CD of the Viterna-extended polar at -180..180 degrees in steps of step, both ends included
+    alpha, cl, cd = polar_table(viterna_extrapolate(polar, aspect_ratio, symmetric))
+    grid = np.linspace(-math.pi, math.pi, int(round(360.0 / step)) + 1)
+    return np.interp(grid, alpha, cl), np.interp(grid, alpha, cd)
+
+
+def compiled_table(polar, step=TABLE_STEP, aspect_ratio=None, symmetric=False):
+    # Viterna-extended polar resampled on a uniform alpha grid: a lookup is one index computation and a
+    # linear blend, instead of np.interp's binary search. Works as a dmst polar table (alpha, W^2) -> (CL, CD).
+    return uniform_table(*table_grids(polar, step, aspect_ratio, symmetric))
+
+
+def uniform_table(cl_grid, cd_grid):
+    # compiled_table from the grids of table_grids, e.g. as stored by the polar database
+    size = len(cl_grid) - 1
+    grid = np.linspace(-math.pi, math.pi, size + 1)
+    cl_slope = np.diff(cl_grid)
+    cd_slope = np.diff(cd_grid)
+
+    def table(alpha, w2=None):
+        index, fraction = uniform_index(alpha, size)
+        return cl_grid[index] + fraction * cl_slope[index], cd_grid[index] + fraction * cd_slope[index]
+
+    table.alpha = grid
+    table.cl = cl_grid
+    table.cd = cd_grid
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Extend a polar to +-180 degrees and time the uniform lookup table')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=3e5)
+    parser.add_argument('--aspect-ratio', type=float, default=None)
+    parser.add_argument('--samples', type=int, default=1000000)
+    args = parser.parse_args()
+
+    from polar_store import PolarDatabase
+    polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    extended = viterna_extrapolate(polar, args.aspect_ratio, naca_symmetric(args.naca))
+    for a in (-180, -135, -90, -45, -20, 0, 20, 45, 90, 135, 180):
+        print(f"{a:6.0f}  CL {np.interp(a, extended['alpha'], extended['CL']):7.3f}  CD {np.interp(a, extended['alpha'], extended['CD']):7.3f}")
+
+    table = compiled_table(polar, aspect_ratio=args.aspect_ratio, symmetric=naca_symmetric(args.naca))
+    alpha_table, cl_table, cd_table = polar_table(extended)
+    alpha = np.random.default_rng(0).uniform(-math.pi, math.pi, args.samples)
+    start = time.perf_counter()
+    np.interp(alpha, alpha_table, cl_table), np.interp(alpha, alpha_table, cd_table)
+    searched = time.perf_counter() - start
+    start = time.perf_counter()
+    table(alpha)
+    compiled = time.perf_counter() - start
+    print(f"{args.samples} lookups: np.interp {searched * 1e3:.1f} ms, uniform table {compiled * 1e3:.1f} ms")
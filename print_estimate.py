@@ -0,0 +1,152 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from turbine_design import blade_arc, design_batch, naca_half_thickness, naca_section, turbine_design
+
+# Fixed feature sizes in createTurbine, in Fusion internal units (cm)
+BOTTOM_PIN_RADIUS = 0.05 * 25.4  # bCircleRad
+TOP_PIN_RADIUS = 0.0375 * 25.4  # tCircleRad
+PIN_OFFSET = 0.0125 * 25.4  # cone height above the section's half thickness
+PIN_CUT_EXTRA = 0.025 * 25.4
+CONNECTOR_DIAMETER = 0.3 * 24.5  # as passed to create_connectors
+CONNECTOR_HEIGHT = 1.0 * 2.54
+CONNECTOR_HEX_DIAMETER = 0.0575 * 25.4
+CONNECTOR_SHAFT_DEPTH = 0.75 * 2.54  # hex socket in the top connector
+SCREW_RADIUS = 0.25
+SCREW_DEPTH = 0.25 * 2.54
+
+# Slicer settings: lengths in cm, rates in cm^3 of extruded plastic per hour, density in g/cm^3 (PLA)
+DEFAULT_PRINT_SETTINGS = {
+    'infill': 0.20,
+    'wallThickness': 0.12,  # 3 perimeters of a 0.4 mm nozzle
+    'topBottomThickness': 0.08,
+    'density': 1.24,
+    'wallRate': 11.5,
+    'infillRate': 26.0,
+}
+
+
+def print_settings(**settings):
+    unknown = set(settings) - set(DEFAULT_PRINT_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown print settings: {', '.join(sorted(unknown))}")
+    merged = dict(DEFAULT_PRINT_SETTINGS)
+    merged.update(settings)
+    return merged
+
+
+def hexagon_area(circumradius):
+    return 1.5 * math.sqrt(3.0) * circumradius ** 2
+
+
+def airfoil_span(design):
+    # createTurbine extrudes f'{0.5 * turbineHeight + 0.3} in' as the full symmetric length
+    return (0.5 * np.asarray(design['turbineHeight'], dtype=np.float64) + 0.3) * 2.54
+
+
+def _naca_columns(nacaProfile):
+    # Unit-chord section area, perimeter and mid-chord half thickness for one profile or a list of them
+    if isinstance(nacaProfile, str):
+        area, perimeter = naca_section(nacaProfile)
+        return area, perimeter, naca_half_thickness(nacaProfile, 0.5)
+    columns = np.array([naca_section(p) + (naca_half_thickness(p, 0.5),) for p in nacaProfile])
+    return columns[:, 0], columns[:, 1], columns[:, 2]
+
+
+def _prism(area, perimeter, length, count, settings, holes=0.0):
+    # (solid volume, wall + skin volume) of count extrusions; holes is the wall area around cut-outs
+    volume = area * length
+    shell = np.minimum(perimeter * length * settings['wallThickness'] + 2.0 * area * settings['topBottomThickness'] + holes * settings['wallThickness'], volume)
+    return volume * count, shell * count
+
+
+def module_parts(design, settings=None):
+    # Solid and shell volume (cm^3) of every part of one module, for a design or a design_batch
+    settings = settings or DEFAULT_PRINT_SETTINGS
+    height = np.asarray(design['turbineHeight'], dtype=np.float64)
+    hole_radius = np.asarray(design['holeDiameter'], dtype=np.float64) / 2.0
+    parts = {}
+
+    # Savonius blades: the annular sector between the arc and its bladeThickness offset, swept up the height.
+    # A twisted sweep keeps the section, so the volume does not depend on twistCount.
+    arc_radius, sweep_angle = blade_arc(design)
+    thickness = np.asarray(design['bladeThickness'], dtype=np.float64)
+    inner = arc_radius - thickness
+    parts['blades'] = _prism(0.5 * sweep_angle * (arc_radius ** 2 - inner ** 2), sweep_angle * (arc_radius + inner) + 2.0 * thickness, height, design['bladeCount'], settings)
+
+    # Shaft with the hex bore
+    shaft_radius = np.asarray(design['shaftDiameter'], dtype=np.float64) / 2.0
+    parts['shaft'] = _prism(math.pi * shaft_radius ** 2 - hexagon_area(hole_radius), 2.0 * math.pi * shaft_radius + 6.0 * hole_radius, height, 1, settings)
+
+    # Airfoils
+    unit_area, unit_perimeter, half_thickness = _naca_columns(design['nacaProfile'])
+    chord = np.asarray(design['chordLength'], dtype=np.float64)
+    parts['airfoils'] = _prism(unit_area * chord ** 2, unit_perimeter * chord, airfoil_span(design), design['airfoilCount'], settings)
+
+    # Cone pins at both ends of every airfoil: frustums bCircleRad -> tCircleRad with a hex cut,
+    # small enough that the slicer prints them solid
+    pin_height = half_thickness * chord + PIN_OFFSET
+    cone = math.pi * pin_height * (BOTTOM_PIN_RADIUS ** 2 + BOTTOM_PIN_RADIUS * TOP_PIN_RADIUS + TOP_PIN_RADIUS ** 2) / 3.0
+    cut = hexagon_area(hole_radius) * np.minimum(half_thickness + PIN_CUT_EXTRA, pin_height)
+    pins = 2.0 * (cone - cut) * design['airfoilCount']
+    parts['pins'] = (pins, pins)
+
+    # Top and bottom connectors: discs with a hex socket and a screw hole per airfoil, the centre hex
+    # for the shaft (through the bottom disc, CONNECTOR_SHAFT_DEPTH into the top) and the top screw
+    hex_radius = CONNECTOR_HEX_DIAMETER / 2.0
+    socket_depth = CONNECTOR_DIAMETER / 4.0
+    screw = math.pi * SCREW_RADIUS ** 2 * SCREW_DEPTH
+    screw_walls = 2.0 * math.pi * SCREW_RADIUS * SCREW_DEPTH
+    per_airfoil = hexagon_area(hex_radius) * socket_depth + screw
+    per_airfoil_walls = 6.0 * hex_radius * socket_depth + screw_walls
+    centre = hexagon_area(hex_radius) * (CONNECTOR_HEIGHT + CONNECTOR_SHAFT_DEPTH) + screw
+    centre_walls = 6.0 * hex_radius * (CONNECTOR_HEIGHT + CONNECTOR_SHAFT_DEPTH) + screw_walls
+    disc = math.pi * (CONNECTOR_DIAMETER / 2.0) ** 2
+    volume, shell = _prism(disc, math.pi * CONNECTOR_DIAMETER, CONNECTOR_HEIGHT, 2, settings, (per_airfoil_walls * np.asarray(design['airfoilCount']) + centre_walls) / 2.0)
+    cuts = per_airfoil * np.asarray(design['airfoilCount']) + centre
+    parts['connectors'] = (volume - cuts, np.minimum(shell, volume - cuts))
+    return parts
+
+
+def estimate_print(design, settings=None):
+    # Volume, filament mass and print time of one module; a design_batch gives arrays
+    settings = settings or DEFAULT_PRINT_SETTINGS
+    parts = module_parts(design, settings)
+    volume = sum(v for v, _ in parts.values())
+    shell = sum(s for _, s in parts.values())
+    infill = settings['infill'] * (volume - shell)
+    result = {
+        'volume_cm3': volume,
+        'printed_cm3': shell + infill,
+        'mass_g': (shell + infill) * settings['density'],
+        'print_hours': shell / settings['wallRate'] + infill / settings['infillRate'],
+    }
+    for name, (part_volume, _) in parts.items():
+        result[f'{name}_cm3'] = part_volume
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analytic volume, filament mass and print time of a generated module')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--infill', type=float, default=DEFAULT_PRINT_SETTINGS['infill'])
+    parser.add_argument('--wall-thickness', type=float, default=DEFAULT_PRINT_SETTINGS['wallThickness'], help='cm')
+    parser.add_argument('--benchmark', type=int, default=10000, help='batch size for the timing run')
+    args = parser.parse_args()
+
+    settings = print_settings(infill=args.infill, wallThickness=args.wall_thickness)
+    result = estimate_print(turbine_design(nacaProfile=args.naca), settings)
+    for name, value in result.items():
+        print(f"{name:>16}: {float(value):9.2f}")
+
+    rng = np.random.default_rng(0)
+    designs = [turbine_design(chordLength=float(c), airfoilCount=int(n), nacaProfile=p)
+               for c, n, p in zip(rng.uniform(2.54, 15.24, args.benchmark), rng.integers(2, 7, args.benchmark), rng.choice(['0012', '0015', '0018', '4412'], args.benchmark))]
+    batch = design_batch(designs)
+    start = time.perf_counter()
+    estimate_print(batch, settings)
+    elapsed = time.perf_counter() - start
+    print(f"{args.benchmark} designs in {elapsed * 1e3:.1f} ms ({elapsed / args.benchmark * 1e6:.2f} us per design)")
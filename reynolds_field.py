@@ -0,0 +1,103 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from polar_store import RE_MAX, RE_MIN, PolarDatabase
+from polar_tables import uniform_index
+from turbine_design import CM, turbine_design
+
+AIR_VISCOSITY = 1.8e-5  # Pa.s, as in the web app
+
+# Polars are fetched on log-spaced Reynolds bins; 8 per decade keeps neighbouring bins within ~33 %
+BINS_PER_DECADE = 8
+
+# Tip-speed ratio a lift ring is usually run near, for single-point summaries
+DESIGN_TSR = 3.0
+
+
+def relative_velocity(theta, tsr, velocity_ratio=None):
+    # W / V of a blade at azimuth theta (as in dmst: theta = 0 where the blade heads into the wind)
+    # for every TSR: shape (len(tsr), len(theta)). Without a dmst velocity_ratio the wake is ignored.
+    if velocity_ratio is not None:
+        return np.asarray(velocity_ratio)
+    tsr = np.atleast_1d(np.asarray(tsr, dtype=np.float64))[:, None]
+    return np.sqrt((tsr + np.cos(theta)) ** 2 + np.sin(theta) ** 2)
+
+
+def reynolds_field(design, tsr, wind_speed, air_density=1.225, viscosity=AIR_VISCOSITY, n_theta=72, velocity_ratio=None, theta=None):
+    # Chord Reynolds number of the airfoils over a revolution for every TSR in one pass.
+    # Pass a dmst() result's theta and velocity_ratio to include the induced velocities.
+    if theta is None:
+        theta = (np.arange(n_theta) + 0.5) * 2.0 * math.pi / n_theta
+    w = relative_velocity(theta, tsr, velocity_ratio)
+    return {
+        'theta': theta,
+        'tsr': np.atleast_1d(tsr),
+        'reynolds': air_density * wind_speed * w * design['chordLength'] * CM / viscosity,
+    }
+
+
+def reynolds_bins(reynolds, bins_per_decade=BINS_PER_DECADE):
+    # Distinct log-spaced bin centres covering a Reynolds field, and the bin of every point
+    index = np.rint(np.log10(np.maximum(reynolds, 1.0)) * bins_per_decade).astype(np.int64)
+    levels, inverse = np.unique(index, return_inverse=True)
+    return 10.0 ** (levels / bins_per_decade), inverse.reshape(np.shape(reynolds))
+
+
+def bin_polars(database, airfoil, reynolds, bins_per_decade=BINS_PER_DECADE, mach=0.0, ncrit=9.0):
+    # One polar per distinct Reynolds bin of the field, from the polar store (XFOIL only runs for bins
+    # outside its stored range); bins are kept inside the range the store is meant to cover
+    centres, inverse = reynolds_bins(np.clip(reynolds, RE_MIN, RE_MAX), bins_per_decade)
+    return centres, inverse, [database.lookup(airfoil, re, mach, ncrit) for re in centres]
+
+
+def reynolds_table(database, design, wind_speed, tsr_range=(0.1, 8.0), air_density=1.225, viscosity=AIR_VISCOSITY, bins_per_decade=BINS_PER_DECADE, mach=0.0, ncrit=9.0):
+    # Callable polar table for dmst(): picks the polar of each blade element's Reynolds bin.
+    # The bins cover every relative velocity the blades can see in tsr_range (|tsr - 1| .. tsr + 1 times V).
+    reynolds_per_velocity = air_density * wind_speed * design['chordLength'] * CM / viscosity
+    low, high = tsr_range
+    reynolds = reynolds_per_velocity * np.array([max(low - 1.0, 0.1), high + 1.0])
+    lo, hi = (np.rint(np.log10(np.clip(reynolds, RE_MIN, RE_MAX)) * bins_per_decade)).astype(np.int64)
+    levels = np.arange(lo, hi + 1)
+    centres = 10.0 ** (levels / bins_per_decade)
+    # The bins' uniform tables stacked, so every blade element is looked up at once by (bin, alpha cell)
+    tables = [database.table(design['nacaProfile'], re, mach, ncrit) for re in centres]
+    cl_grid = np.stack([t.cl for t in tables])
+    cd_grid = np.stack([t.cd for t in tables])
+    size = cl_grid.shape[1] - 1
+
+    def table(alpha, w2):
+        level = np.rint(np.log10(np.maximum(reynolds_per_velocity * np.sqrt(w2), 1.0)) * bins_per_decade)
+        row = np.clip(level, lo, hi).astype(np.int64) - lo
+        index, fraction = uniform_index(alpha, size)
+        cl = cl_grid[row, index] + fraction * (cl_grid[row, index + 1] - cl_grid[row, index])
+        cd = cd_grid[row, index] + fraction * (cd_grid[row, index + 1] - cd_grid[row, index])
+        return cl, cd
+
+    table.reynolds_bins = centres
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Reynolds number of the airfoil ring over a revolution, and the polar bins it needs')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--wind-speed', type=float, default=5.0)
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--tsr', type=float, nargs='+', default=[1.0, 2.0, 3.0, 4.0])
+    parser.add_argument('--bins-per-decade', type=int, default=BINS_PER_DECADE)
+    parser.add_argument('--fetch', action='store_true', help='fetch the bin polars from the polar database')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca, chordLength=args.chord * 2.54)
+    start = time.perf_counter()
+    field = reynolds_field(design, args.tsr, args.wind_speed)
+    centres, inverse = reynolds_bins(np.clip(field['reynolds'], RE_MIN, RE_MAX), args.bins_per_decade)
+    elapsed = time.perf_counter() - start
+    for tsr, row in zip(field['tsr'], field['reynolds']):
+        print(f"tsr={tsr:4.1f}  Re {row.min():9.0f} .. {row.max():9.0f}")
+    print(f"{field['reynolds'].size} blade positions -> {len(centres)} Reynolds bins: {', '.join(f'{re:.0f}' for re in centres)} ({elapsed * 1e3:.2f} ms)")
+    if args.fetch:
+        centres, _, polars = bin_polars(PolarDatabase(), args.naca, field['reynolds'], args.bins_per_decade)
+        print(f"Fetched {len(polars)} polars")
@@ -0,0 +1,152 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from dmst import dmst, flat_plate_polar
+from turbine_design import turbine_design
+
+# Points per revolution on which stack torque is evaluated (and the grid of candidate phase offsets)
+STACK_SAMPLES = 720
+
+# Coordinate descent passes over the modules of a stack before giving up on further improvement
+SWEEPS = 20
+
+
+def curve_harmonics(azimuth, torque):
+    # Fourier coefficients of a periodic torque curve sampled uniformly over one revolution, referred to
+    # azimuth 0: torque(theta) = sum_m Re(c_m exp(i m theta)) with c_0 the mean
+    azimuth = np.asarray(azimuth, dtype=np.float64)
+    torque = np.asarray(torque, dtype=np.float64)
+    n = len(torque)
+    coefficients = np.fft.rfft(torque) / n
+    coefficients[1:] *= 2.0
+    if n % 2 == 0:
+        coefficients[-1] /= 2.0
+    return coefficients * np.exp(-1j * np.arange(len(coefficients)) * azimuth[0])
+
+
+def dmst_module_harmonics(design, result, index=0):
+    # Torque coefficient harmonics of one module at TSR index of a dmst() result: the single blade tangential
+    # load (cq share c / 2R each) plus its copies every 2 pi / N, which leaves only multiples of N
+    blades = design['airfoilCount']
+    blade = curve_harmonics(result['theta'], result['tangential'][index])
+    blade *= design['chordLength'] / (2.0 * design['distanceFromCenter'])
+    m = np.arange(len(blade))
+    return np.where(m % blades == 0, blades * blade, 0.0)
+
+
+def wake_module_harmonics(result):
+    # Torque coefficient harmonics of one module from the last revolution of a vortex_wake.simulate() result
+    steps = int(round(2.0 * math.pi / ((result['azimuth'][1] - result['azimuth'][0]) % (2.0 * math.pi))))
+    return curve_harmonics(result['azimuth'][-steps:], result['cq'][-steps:])
+
+
+def _torque(coefficients, comb, samples):
+    # Inverse FFT of the module harmonics times the offset comb's harmonics (..., len(coefficients))
+    spectrum = coefficients * comb
+    spectrum[..., 1:] /= 2.0
+    return np.fft.irfft(spectrum[..., :samples // 2 + 1], samples) * samples
+
+
+def stack_torque(coefficients, offsets, samples=STACK_SAMPLES):
+    # Shaft torque over one revolution of stacks whose modules are turned by offsets (radians, shape (..., modules)),
+    # for every leading index at once. The stack is the module curve convolved with a comb at the offsets,
+    # i.e. a product of harmonics followed by one inverse FFT.
+    offsets = np.asarray(offsets, dtype=np.float64)
+    m = np.arange(len(coefficients))
+    return _torque(coefficients, np.exp(-1j * offsets[..., None] * m).sum(axis=-2), samples)
+
+
+def ripple(torque):
+    # Peak to peak torque over the mean, along the last axis
+    return (torque.max(axis=-1) - torque.min(axis=-1)) / np.abs(torque.mean(axis=-1))
+
+
+def best_phase_step(coefficients, modules, samples=STACK_SAMPLES):
+    # Best constant rotation between neighbouring modules (the VAWT360 Phase Offset), by trying every grid step
+    # The comb of offsets 0, s, .., (n - 1) s is a geometric series: (1 - z^n) / (1 - z) with z = exp(-i m s)
+    steps = np.arange(samples) * (2.0 * math.pi / samples)
+    z = np.exp(-1j * steps[:, None] * np.arange(len(coefficients)))
+    aligned = np.abs(1.0 - z) < 1e-9
+    comb = np.where(aligned, modules, (1.0 - z ** modules) / np.where(aligned, 1.0, 1.0 - z))
+    values = ripple(_torque(coefficients, comb, samples))
+    best = int(np.argmin(values))
+    return steps[best], values[best]
+
+
+def optimal_offsets(coefficients, modules, period=2.0 * math.pi, samples=STACK_SAMPLES, sweeps=SWEEPS):
+    # Phase layout with the least ripple: starts from the better of the even spread over the module torque period
+    # and the best constant step, then moves one module at a time to its best grid position until no move helps.
+    # All positions of a module are tried in one batch, updating the comb harmonics instead of rebuilding them.
+    # Module 0 stays at 0. Returns the offsets (radians) and their ripple.
+    cell = 2.0 * math.pi / samples
+    grid = np.arange(int(round(period / cell))) * cell
+    m = np.arange(len(coefficients))
+    shifts = np.exp(-1j * grid[:, None] * m)
+    step, best = best_phase_step(coefficients, modules, samples)
+    offsets = (np.arange(modules) * step) % (2.0 * math.pi)
+    spread = np.round(np.arange(modules) * period / modules / cell) * cell
+    spread_ripple = float(ripple(stack_torque(coefficients, spread, samples)))
+    if spread_ripple <= best:
+        offsets, best = spread, spread_ripple
+    comb = np.exp(-1j * offsets[:, None] * m).sum(axis=0)
+    for _ in range(sweeps):
+        improved = False
+        for j in range(1, modules):
+            others = comb - np.exp(-1j * offsets[j] * m)
+            values = ripple(_torque(coefficients, others + shifts, samples))
+            k = int(np.argmin(values))
+            if values[k] < best - 1e-12:
+                best, offsets[j], comb = float(values[k]), grid[k], others + shifts[k]
+                improved = True
+        if not improved:
+            break
+    return np.sort(offsets % period), float(best)
+
+
+def phase_table(coefficients, module_counts, period=2.0 * math.pi, samples=STACK_SAMPLES):
+    # Aligned, best constant step and optimal ripple with the solve time for every stack size
+    rows = []
+    for modules in module_counts:
+        start = time.perf_counter()
+        step, step_ripple = best_phase_step(coefficients, modules, samples)
+        offsets, best = optimal_offsets(coefficients, modules, period, samples)
+        elapsed = time.perf_counter() - start
+        aligned = float(ripple(stack_torque(coefficients, np.zeros(modules), samples)))
+        rows.append({'modules': modules, 'aligned': aligned, 'step': step, 'step_ripple': float(step_ripple),
+                     'offsets': offsets, 'ripple': best, 'seconds': elapsed})
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shaft torque ripple of stacked modules and the phase offsets that minimise it')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=None, help='look the polar up in the polar database instead of using a flat plate')
+    parser.add_argument('--airfoil-count', type=int, default=3)
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--radius', type=float, default=15.0, help='distance from center in inches')
+    parser.add_argument('--height', type=float, default=10.0, help='turbine height in inches')
+    parser.add_argument('--tsr', type=float, default=3.0)
+    parser.add_argument('--modules', type=int, nargs=2, default=[2, 20], help='smallest and largest stack')
+    parser.add_argument('--wake', action='store_true', help='module torque curve from the free-vortex wake instead of DMST')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca, airfoilCount=args.airfoil_count, chordLength=args.chord * 2.54, distanceFromCenter=args.radius * 2.54, turbineHeight=args.height * 2.54)
+    if args.reynolds:
+        from polar_store import PolarDatabase
+        polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    else:
+        polar = flat_plate_polar()
+    if args.wake:
+        from vortex_wake import simulate
+        coefficients = wake_module_harmonics(simulate(design, polar, args.tsr))
+    else:
+        coefficients = dmst_module_harmonics(design, dmst(design, polar, [args.tsr], n_theta=90))
+    period = 2.0 * math.pi / design['airfoilCount']
+    print(f"single module: Cq {coefficients[0].real:.4f}, ripple {float(ripple(stack_torque(coefficients, [0.0]))):.3f}")
+    for row in phase_table(coefficients, range(args.modules[0], args.modules[1] + 1), period):
+        offsets = ' '.join(f"{math.degrees(x):.1f}" for x in row['offsets'])
+        print(f"{row['modules']:3d} modules  aligned {row['aligned']:.3f}  step {math.degrees(row['step']):5.1f} deg {row['step_ripple']:.4f}  "
+              f"optimal {row['ripple']:.4f} [{offsets}]  {row['seconds'] * 1e3:.1f} ms")
@@ -0,0 +1,117 @@
+import argparse
+import time
+
+import numpy as np
+
+from turbine_design import CM, blade_arc, design_batch, turbine_design, twist_angle
+
+# Reference rotor: two semicircular blades, no overlap, aspect ratio 2, no twist.
+# Torque coefficient falls roughly linearly with TSR, Cq = CQ0 * (1 - tsr / TSR_RUNAWAY),
+# giving Cp_max = CQ0 * TSR_RUNAWAY / 4 ~ 0.17 at tsr ~ 0.85 (typical wind tunnel data).
+CQ0 = 0.40
+TSR_RUNAWAY = 1.7
+REFERENCE_ASPECT_RATIO = 2.0
+
+# Static torque of an untwisted rotor swings around its mean with the blade passing frequency;
+# for the two-bladed reference rotor the swing is about as large as the mean itself.
+STATIC_RIPPLE = 0.9
+
+# Overlap ratio with the best Cp, and how quickly Cp falls away from it
+BEST_OVERLAP = 0.15
+
+
+def savonius_factors(design):
+    # Empirical corrections to the reference rotor, all as arrays broadcast over a batch of designs
+    blade_count = np.asarray(design['bladeCount'], dtype=np.float64)
+    diameter = np.asarray(design['outerDiameter'], dtype=np.float64)
+    aspect_ratio = np.asarray(design['turbineHeight'], dtype=np.float64) / diameter
+
+    # Aspect ratio: tip losses over the free ends, ~1/(1 + 0.25/AR), normalised to the reference rotor
+    aspect = (1.0 + 0.25 / REFERENCE_ASPECT_RATIO) / (1.0 + 0.25 / aspect_ratio)
+
+    # Blade count: each extra blade returns more flow onto the advancing one, lowering torque and runaway speed
+    count_torque = np.clip(1.0 - 0.12 * (blade_count - 2.0), 0.4, 1.1)
+    count_speed = (2.0 / blade_count) ** 0.3
+
+    # Overlap: the blades in createTurbine all start on the axis, so there is no overlap passage and
+    # the shaft blocks the centre; a negative effective overlap of shaft radius over rotor diameter
+    overlap = -0.5 * np.asarray(design['shaftDiameter'], dtype=np.float64) / diameter
+    overlap_factor = np.clip(1.0 - 4.0 * (overlap - BEST_OVERLAP) ** 2 + 4.0 * BEST_OVERLAP ** 2, 0.5, 1.1)
+
+    # Blade curvature: the semicircle (depth = quarter of the diameter) is the reference, flatter or
+    # deeper cups lose concave-side drag
+    depth_ratio = np.asarray(design['bladeDepth'], dtype=np.float64) / (diameter / 4.0)
+    curvature = np.clip(1.0 - 0.3 * (1.0 - depth_ratio) ** 2, 0.3, 1.0)
+
+    # Blade thickness eats into the cup
+    arc_radius, _ = blade_arc(design)
+    thickness = np.clip(1.0 - 0.5 * np.asarray(design['bladeThickness'], dtype=np.float64) / arc_radius, 0.5, 1.0)
+
+    # Helical twist: a few percent of peak Cp is lost, in exchange for a smooth static torque
+    twist = twist_angle(design)
+    twist_factor = 1.0 - 0.05 * np.minimum(twist / np.pi, 1.0)
+
+    torque = aspect * count_torque * overlap_factor * curvature * thickness * twist_factor
+    return torque, count_speed * np.sqrt(aspect)
+
+
+def static_torque(design, azimuth=None, n_azimuth=72):
+    # Static torque coefficient versus rotor azimuth. A helix twisted by phi averages the blade-passing
+    # harmonic cos(N theta) over the height, which scales its amplitude by sin(N phi / 2) / (N phi / 2).
+    torque, _ = savonius_factors(design)
+    blade_count = np.asarray(design['bladeCount'], dtype=np.float64)[..., None]
+    if azimuth is None:
+        azimuth = np.linspace(0.0, 2.0 * np.pi, n_azimuth, endpoint=False)
+    half_phase = blade_count * twist_angle(design)[..., None] / 2.0
+    smoothing = np.where(half_phase > 1e-9, np.sin(half_phase) / np.where(half_phase > 1e-9, half_phase, 1.0), 1.0)
+    ripple = STATIC_RIPPLE * (2.0 / blade_count) * np.abs(smoothing)
+    mean = CQ0 * torque[..., None]
+    return mean * (1.0 + ripple * np.cos(blade_count * azimuth))
+
+
+def savonius(design, tsr):
+    # Cp and torque coefficient of the drag rotor for every design in a batch (arrays in design)
+    # at every tip-speed ratio: result arrays have shape batch + (len(tsr),)
+    tsr = np.asarray(tsr, dtype=np.float64)
+    torque, speed = savonius_factors(design)
+    cq0 = CQ0 * torque[..., None]
+    runaway = TSR_RUNAWAY * speed[..., None]
+    cq = np.maximum(cq0 * (1.0 - tsr / runaway), 0.0)
+    static = static_torque(design)
+    return {
+        'tsr': tsr,
+        'cq': cq,
+        'cp': cq * tsr,
+        'runaway_tsr': runaway[..., 0],
+        'static_cq_mean': static.mean(axis=-1),
+        'static_cq_min': static.min(axis=-1),
+    }
+
+
+def drag_rotor_area(design):
+    # Frontal area of the drag rotor in square metres
+    return np.asarray(design['outerDiameter']) * CM * np.asarray(design['turbineHeight']) * CM
+
+
+def starting_torque(design, wind_speed, air_density=1.225):
+    # Worst-case static shaft torque in N m at a wind speed; negative means the rotor can stall at some azimuth
+    result = savonius(design, [0.0])
+    radius = np.asarray(design['outerDiameter']) * CM / 2.0
+    return result['static_cq_min'] * 0.5 * air_density * drag_rotor_area(design) * radius * wind_speed ** 2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Savonius drag rotor Cp, torque and self-start estimate')
+    parser.add_argument('--wind-speed', type=float, default=3.0)
+    args = parser.parse_args()
+
+    designs = [turbine_design(bladeCount=n, twistCount=t) for n in (2, 3, 4) for t in (1, 2, 3)]
+    batch = design_batch(designs)
+    tsr = np.linspace(0.0, 2.0, 41)
+    start = time.perf_counter()
+    result = savonius(batch, tsr)
+    torque = starting_torque(batch, args.wind_speed)
+    elapsed = time.perf_counter() - start
+    for design, cp, q in zip(designs, result['cp'], torque):
+        print(f"blades={design['bladeCount']} twist={design['twistCount']}  Cp_max={cp.max():.3f} at tsr={tsr[cp.argmax()]:.2f}  start torque={q:.4f} N m")
+    print(f"{len(designs)} designs x {len(tsr)} TSR points in {elapsed * 1e3:.2f} ms")
@@ -0,0 +1,134 @@
+import argparse
+import functools
+import math
+import time
+
+import numpy as np
+
+from print_estimate import (BOTTOM_PIN_RADIUS, DEFAULT_PRINT_SETTINGS, SCREW_DEPTH, SCREW_RADIUS, airfoil_span,
+                            hexagon_area, module_parts)
+from turbine_design import CM, design_batch, naca4, turbine_design
+
+# Printed PLA, loads across the layer lines (the airfoils are printed standing up), in Pa
+STRENGTH = {
+    'bending': 20e6,
+    'pin_shear': 12e6,
+    'screw_bearing': 30e6,
+}
+SAFETY_FACTOR = 2.0
+
+# Peak normal force coefficient of a blade going through dynamic stall on the upwind pass
+CN_MAX = 1.5
+
+
+@functools.lru_cache(maxsize=None)
+def naca_bending(nacaProfile):
+    # Second moment of area of the unit-chord section about its centroidal chordwise axis (bending in the
+    # thickness direction, i.e. radially on the ring) and the largest distance of the outline from that axis
+    X, Y = naca4(nacaProfile)
+    x0, y0, x1, y1 = X, Y, np.roll(X, -1), np.roll(Y, -1)
+    cross = x0 * y1 - x1 * y0
+    area = 0.5 * np.sum(cross)
+    centroid = np.sum((y0 + y1) * cross) / (6.0 * area)
+    inertia = np.sum((y0 ** 2 + y0 * y1 + y1 ** 2) * cross) / 12.0 - area * centroid ** 2
+    return abs(float(inertia)), float(np.max(np.abs(Y - centroid)))
+
+
+def _bending_columns(nacaProfile):
+    if isinstance(nacaProfile, str):
+        return naca_bending(nacaProfile)
+    columns = np.array([naca_bending(p) for p in nacaProfile])
+    return columns[:, 0], columns[:, 1]
+
+
+def airfoil_loads(design, rpm, wind_speed, air_density=1.225, settings=None):
+    # Radial line load on one airfoil in N/m: centrifugal plus the peak aerodynamic normal force at
+    # relative speed omega R + V. rpm and wind_speed broadcast against the design batch with a trailing axis.
+    settings = settings or DEFAULT_PRINT_SETTINGS
+    airfoil_count = np.asarray(design['airfoilCount'], dtype=np.float64)
+    volume, shell = module_parts(design, settings)['airfoils']
+    printed = (shell + settings['infill'] * (volume - shell)) / airfoil_count  # cm^3 per airfoil
+    span = airfoil_span(design) * CM
+    mass_per_length = printed * settings['density'] * 1e-3 / span  # kg/m
+
+    radius = np.asarray(design['distanceFromCenter'], dtype=np.float64) * CM
+    chord = np.asarray(design['chordLength'], dtype=np.float64) * CM
+    mass_per_length, radius, chord, span = (np.asarray(v)[..., None] for v in (mass_per_length, radius, chord, span))
+    omega = np.asarray(rpm, dtype=np.float64) * 2.0 * math.pi / 60.0
+    centrifugal = mass_per_length * omega ** 2 * radius
+    aerodynamic = 0.5 * air_density * (omega * radius + wind_speed) ** 2 * chord * CN_MAX
+    return {'centrifugal': centrifugal, 'aerodynamic': aerodynamic, 'line_load': centrifugal + aerodynamic, 'span': span, 'chord': chord}
+
+
+def stress_screen(design, rpm, wind_speed=0.0, air_density=1.225, settings=None):
+    # Stresses in Pa and their safety factors for a design (or design_batch) at every rpm.
+    # Each airfoil is a beam simply supported by its cone pins; each end reaction goes through one pin
+    # in shear and bears on the connector screw hole.
+    loads = airfoil_loads(design, rpm, wind_speed, air_density, settings)
+    q, span, chord = loads['line_load'], loads['span'], loads['chord']
+    inertia, extreme = _bending_columns(design['nacaProfile'])
+    inertia = np.asarray(inertia)[..., None] * chord ** 4
+    extreme = np.asarray(extreme)[..., None] * chord
+    reaction = q * span / 2.0
+
+    hole_radius = np.asarray(design['holeDiameter'], dtype=np.float64)[..., None] * CM / 2.0
+    pin_area = math.pi * (BOTTOM_PIN_RADIUS * CM) ** 2 - hexagon_area(hole_radius)
+    stresses = {
+        'bending': q * span ** 2 / 8.0 * extreme / inertia,
+        'pin_shear': reaction / pin_area,
+        'screw_bearing': reaction / (2.0 * SCREW_RADIUS * CM * SCREW_DEPTH * CM),
+    }
+    result = dict(loads)
+    safety = np.full(np.shape(q), np.inf)
+    for name, stress in stresses.items():
+        result[name] = stress
+        result[f'{name}_safety'] = STRENGTH[name] / stress
+        safety = np.minimum(safety, result[f'{name}_safety'])
+    result['safety'] = safety
+    result['fails'] = safety < SAFETY_FACTOR
+    return result
+
+
+def max_safe_rpm(design, wind_speed=0.0, air_density=1.225, settings=None):
+    # Highest rpm at which every stress keeps SAFETY_FACTOR. All stresses are proportional to the line load
+    # q = m' omega^2 R + k (omega R + V)^2, so the allowable load gives a quadratic in omega.
+    reference = stress_screen(design, 60.0 / (2.0 * math.pi), 0.0, air_density, settings)  # omega = 1 rad/s, still air
+    allowable = reference['line_load'][..., 0] * reference['safety'][..., 0] / SAFETY_FACTOR
+    m_r = reference['centrifugal'][..., 0]  # m' R
+    k = np.asarray(reference['aerodynamic'][..., 0]) / (np.asarray(design['distanceFromCenter'], dtype=np.float64) * CM) ** 2
+    radius = np.asarray(design['distanceFromCenter'], dtype=np.float64) * CM
+    a = m_r + k * radius ** 2
+    b = 2.0 * k * radius * wind_speed
+    c = k * wind_speed ** 2 - allowable
+    omega = (-b + np.sqrt(np.maximum(b ** 2 - 4.0 * a * c, 0.0))) / (2.0 * a)
+    return np.where(c < 0.0, omega, 0.0) * 60.0 / (2.0 * math.pi)
+
+
+def structural_problems(design, rpm, wind_speed, air_density=1.225, settings=None):
+    # design_problems-style messages for the operating points (rpm, wind_speed arrays) of one design
+    result = stress_screen(design, rpm, wind_speed, air_density, settings)
+    problems = []
+    for name in STRENGTH:
+        failing = result[f'{name}_safety'] < SAFETY_FACTOR
+        if np.any(failing):
+            where = np.flatnonzero(np.broadcast_to(failing, np.shape(result['safety'])))[0]
+            problems.append(f"{name.replace('_', ' ')} safety factor {np.ravel(result[f'{name}_safety'])[where]:.2f} at {np.ravel(np.broadcast_to(rpm, np.shape(result['safety'])))[where]:.0f} rpm")
+    return problems
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Centrifugal, bending and pin shear screen for the printed airfoils')
+    parser.add_argument('--wind-speed', type=float, default=10.0)
+    parser.add_argument('--rpm', type=float, nargs='+', default=[100, 300, 600, 1000])
+    args = parser.parse_args()
+
+    designs = [turbine_design(chordLength=c * 2.54, distanceFromCenter=r * 2.54, nacaProfile=p) for c in (2.0, 3.0, 5.0) for r in (10.0, 15.0, 20.0) for p in ('0012', '0018')]
+    batch = design_batch(designs)
+    start = time.perf_counter()
+    result = stress_screen(batch, args.rpm, args.wind_speed)
+    limits = max_safe_rpm(batch, args.wind_speed)
+    elapsed = time.perf_counter() - start
+    for design, safety, limit in zip(designs, result['safety'], limits):
+        flags = ' '.join(f"{rpm:g}:{'FAIL' if s < SAFETY_FACTOR else f'{s:.1f}'}" for rpm, s in zip(args.rpm, safety))
+        print(f"chord={design['chordLength'] / 2.54:.0f}in r={design['distanceFromCenter'] / 2.54:.0f}in NACA {design['nacaProfile']}  safety {flags}  max {limit:.0f} rpm")
+    print(f"{len(designs)} designs x {len(args.rpm)} speeds in {elapsed * 1e3:.2f} ms")
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from turbine_design import DEFAULT_DESIGN, design_problems
+
+SURROGATE_DB_PATH = os.environ.get('SURROGATE_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'evaluations.sqlite')
+
+NUMERIC_PARAMETERS = [name for name in DEFAULT_DESIGN if name != 'nacaProfile']
+FEATURES = NUMERIC_PARAMETERS + ['naca_camber', 'naca_camber_position', 'naca_thickness']
+
+
+def design_features(design):
+    # Numeric feature vector of a design; the NACA code enters through its three geometric digits
+    naca = design['nacaProfile']
+    return [float(design[name]) for name in NUMERIC_PARAMETERS] + [int(naca[0]) / 100.0, int(naca[1]) / 10.0, int(naca[2:]) / 100.0]
+
+
+def design_key(design):
+    return json.dumps([design[name] for name in DEFAULT_DESIGN], separators=(',', ':'))
+
+
+def context_key(context):
+    # Hash of everything besides the design that changes an evaluation (site wind, polar source, model code)
+    return hashlib.sha1(json.dumps(context, sort_keys=True, separators=(',', ':')).encode()).hexdigest()[:16]
+
+
+def source_digest(paths):
+    # Hash of the model's source files, so evaluations recorded by an earlier version of the model are not reused
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()[:16]
+
+
+class GaussianProcess:
+    # Zero-mean GP with a squared-exponential kernel on standardised inputs and outputs.
+    # The length scale is picked from a small grid by marginal likelihood.
+    def __init__(self, noise=1e-4, length_scales=(0.5, 1.0, 2.0, 4.0)):
+        self.noise = noise
+        self.length_scales = length_scales
+
+    def _kernel(self, a, b, length_scale):
+        d2 = np.sum(a ** 2, axis=1)[:, None] + np.sum(b ** 2, axis=1)[None, :] - 2.0 * a @ b.T
+        return np.exp(-0.5 * np.maximum(d2, 0.0) / length_scale ** 2)
+
+    def fit(self, x, y):
+        self.x_mean = x.mean(axis=0)
+        self.x_std = np.where(x.std(axis=0) > 0, x.std(axis=0), 1.0)
+        self.y_mean = y.mean(axis=0)
+        self.y_std = np.where(y.std(axis=0) > 0, y.std(axis=0), 1.0)
+        xs = (x - self.x_mean) / self.x_std
+        ys = (y - self.y_mean) / self.y_std
+        best = None
+        for length_scale in self.length_scales:
+            k = self._kernel(xs, xs, length_scale) + self.noise * np.eye(len(xs))
+            try:
+                chol = np.linalg.cholesky(k)
+            except np.linalg.LinAlgError:
+                continue
+            weights = np.linalg.solve(chol.T, np.linalg.solve(chol, ys))
+            # Log marginal likelihood summed over outputs (constant terms dropped)
+            likelihood = -0.5 * np.sum(ys * weights) - ys.shape[1] * np.sum(np.log(np.diag(chol)))
+            if best is None or likelihood > best[0]:
+                best = (likelihood, length_scale, chol, weights)
+        if best is None:
+            raise np.linalg.LinAlgError("Surrogate kernel matrix is not positive definite")
+        _, self.length_scale, self.chol, self.weights = best
+        self.xs = xs
+        return self
+
+    def predict(self, x):
+        # Mean and standard deviation in output units, shapes (n, outputs)
+        xs = (np.atleast_2d(x) - self.x_mean) / self.x_std
+        k = self._kernel(xs, self.xs, self.length_scale)
+        mean = k @ self.weights
+        v = np.linalg.solve(self.chol, k.T)
+        variance = np.maximum(1.0 - np.sum(v ** 2, axis=0), 0.0)
+        return self.y_mean + mean * self.y_std, np.sqrt(variance)[:, None] * self.y_std
+
+
+class SurrogateCache:
+    # Records every full evaluation and answers from a GP fitted on them when it is confident:
+    # predicted standard deviation below `threshold` times the metric's spread in the training data.
+    # Evaluations are stored per context (a JSON-able dict of whatever else the evaluation depends on), and only
+    # those of the cache's own context are returned or trained on.
+    def __init__(self, evaluate, metrics, context=None, path=SURROGATE_DB_PATH, threshold=0.02, min_points=30, max_points=1500, refit_after=20):
+        self.evaluate = evaluate
+        self.metrics = list(metrics)
+        self.context = context_key(context or {})
+        self.path = path
+        self.threshold = threshold
+        self.min_points = min_points
+        self.max_points = max_points
+        self.refit_after = refit_after
+        self.model = None
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            columns = [row[1] for row in db.execute('PRAGMA table_info(evaluations)')]
+            if columns and 'context' not in columns:
+                # Evaluations of an unknown context are kept aside and never used
+                db.execute('ALTER TABLE evaluations RENAME TO evaluations_without_context')
+            db.execute('CREATE TABLE IF NOT EXISTS evaluations (context TEXT, key TEXT, parameters TEXT, metrics TEXT, created REAL, PRIMARY KEY (context, key))')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(self, design, metrics):
+        with self._lock, self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?)', (self.context, design_key(design), json.dumps(design), json.dumps(metrics), time.time()))
+            self.pending += 1
+
+    def stored(self, design):
+        with self._connect() as db:
+            row = db.execute('SELECT metrics FROM evaluations WHERE context = ? AND key = ?', (self.context, design_key(design))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def training_data(self):
+        with self._connect() as db:
+            rows = db.execute('SELECT parameters, metrics FROM evaluations WHERE context = ? ORDER BY created DESC LIMIT ?', (self.context, self.max_points)).fetchall()
+        x, y = [], []
+        for parameters, metrics in rows:
+            metrics = json.loads(metrics)
+            # Only valid designs with finite metrics describe the smooth response being modelled
+            if metrics.get('valid', True) and all(np.isfinite(metrics[name]) for name in self.metrics):
+                x.append(design_features(json.loads(parameters)))
+                y.append([metrics[name] for name in self.metrics])
+        return np.array(x), np.array(y)
+
+    def fit(self):
+        x, y = self.training_data()
+        self.pending = 0
+        if len(x) < self.min_points:
+            self.model = None
+            return None
+        self.model = GaussianProcess().fit(x, y)
+        return self.model
+
+    def predict(self, designs):
+        # Surrogate answers for a batch: (metrics or None per design); None means the full model is needed
+        if self.model is None or self.pending >= self.refit_after:
+            self.fit()
+        if self.model is None:
+            return [None] * len(designs)
+        mean, std = self.model.predict(np.array([design_features(design) for design in designs]))
+        # Designs failing the geometry checks always go to the (cheap) full model, which rejects them
+        feasible = np.array([not design_problems(design) for design in designs])
+        confident = np.all(std <= self.threshold * self.model.y_std, axis=1) & feasible
+        return [dict(zip(self.metrics, row.tolist()), valid=True, surrogate=True) if ok else None for row, ok in zip(mean, confident)]
+
+    def query(self, design):
+        answer = self.stored(design) or self.predict([design])[0]
+        if answer is not None:
+            self.hits += 1
+            return answer
+        self.misses += 1
+        metrics = self.evaluate(design)
+        self.record(design, metrics)
+        return metrics
@@ -0,0 +1,45 @@
+import os
+import stat
+import sys
+
+import pytest
+
+# The modules under test live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_xfoil(tmp_path):
+    # Executable running fake_xfoil.py, in place of an XFOIL build
+    path = tmp_path / 'xfoil'
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_xfoil.py')
+    path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{script}" "$@"\n')
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def wind_app(monkeypatch, tmp_path):
+    # The Website Wind Flask app with its offline stores pointed at empty directories
+    monkeypatch.setenv('GEOCODER_PATH', str(tmp_path / 'geocoder'))
+    monkeypatch.setenv('WIND_STORE_PATH', str(tmp_path / 'wind_store'))
+    directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Website Wind')
+    monkeypatch.syspath_prepend(directory)
+    import app
+    return app
+
+
+@pytest.fixture
+def onshape_server():
+    from onshape_server import StandIn
+    server = StandIn()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def onshape_client(onshape_server):
+    from onshape import OnshapeClient
+    from onshape_server import ACCESS_KEY, SECRET_KEY
+    with OnshapeClient(ACCESS_KEY, SECRET_KEY, onshape_server.url, timeout=(1.0, 0.3), retries=2, backoff=0.01) as client:
+        yield client
@@ -0,0 +1,121 @@
+# Scripted stand-in for an XFOIL 6.99 session, driven through stdin like the real binary. It follows the menus the
+# generated command scripts use, cuts commands to four characters at the first digit as XFOIL's ASKC does, answers
+# unknown commands with format 1050 of xfoil.f and writes polar files in XFOIL's layout with synthetic values.
+# Without GFORTRAN_UNBUFFERED_PRECONNECTED=y the output is held back until exit, like gfortran writing to a pipe.
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numpy as np
+from polar_parser import synthetic_polar
+
+output = sys.stdout if os.environ.get('GFORTRAN_UNBUFFERED_PRECONNECTED') == 'y' else io.StringIO()
+
+
+def write(text):
+    output.write(text)
+    output.flush()
+
+
+def ask(prompt):
+    write(prompt)
+    line = sys.stdin.readline()
+    if not line:
+        finish(0)
+    return line.rstrip('\n')
+
+
+def command(line):
+    # XFOIL's ASKC: leading blanks skipped, the command ends at a blank or the first digit, arguments follow
+    line = line.strip()
+    end = 0
+    while end < len(line) and not line[end].isspace() and not line[end].isdigit():
+        end += 1
+    return line[:end].upper()[:4], line[end:].split()
+
+
+def not_recognized(name):
+    write(f' {name:<4} command not recognized.  Type a "?" for command list\n')
+
+
+def finish(code):
+    if output is not sys.stdout:
+        sys.stdout.write(output.getvalue())
+    sys.stdout.flush()
+    sys.exit(code)
+
+
+def oper(state):
+    while True:
+        name, args = command(ask('.OPERv   c>  ' if state['viscous'] else '.OPERi   c>  '))
+        if not name:
+            return
+        if name == 'VISC':
+            state['viscous'] = not state['viscous']
+            if args:
+                state['reynolds'] = float(args[0])
+        elif name == 'MACH':
+            state['mach'] = float(args[0])
+        elif name == 'VPAR':
+            while True:
+                name, args = command(ask('..VPAR   c>  '))
+                if not name:
+                    break
+                if name == 'N':
+                    state['ncrit'] = float(args[0])
+        elif name == 'ITER':
+            pass
+        elif name == 'PACC':
+            if state['polar_file'] is None:
+                state['polar_file'] = ask(' Enter  polar save filename  OR  <return> for no file   s>  ').strip() or None
+                ask(' Enter  polar dump filename  OR  <return> for no file   s>  ')
+                write(' Polar accumulation enabled\n')
+            else:
+                state['polar_file'] = None
+                write(' Polar accumulation disabled\n')
+        elif name == 'ASEQ':
+            start, end, step = (float(arg) for arg in args)
+            alpha = np.arange(start, end + step / 2, step)
+            if state['polar_file']:
+                with open(state['polar_file'], 'w') as handle:
+                    handle.write(synthetic_polar(state['name'], state['reynolds'], alpha))
+        else:
+            not_recognized(name)
+
+
+def main():
+    state = {'name': None, 'reynolds': 1e6, 'mach': 0.0, 'ncrit': 9.0, 'viscous': False, 'polar_file': None}
+    write('\n ===================================================\n  XFOIL Version 6.99 (scripted stand-in)\n')
+    while True:
+        name, args = command(ask('\n XFOIL   c>  '))
+        if not name:
+            continue
+        if name == 'QUIT':
+            finish(0)
+        elif name == 'PLOP':
+            while command(ask('..PLOP   c>  '))[0]:
+                pass
+        elif name == 'NACA':
+            if args and args[0] == '9999':
+                # Crashes like a diverging Fortran run, for the pool's restart path
+                finish(2)
+            state['name'] = f'NACA {args[0]}'
+        elif name == 'LOAD':
+            # The file name is the rest of the line, kept in a CHARACTER*64 like XFOIL's FNAME
+            path = ' '.join(args)[:64]
+            if not os.path.exists(path):
+                write(' File OPEN error.  Nonexistent file\n')
+                continue
+            with open(path) as handle:
+                state['name'] = handle.readline().strip()
+        elif name == 'PANE':
+            pass
+        elif name == 'OPER':
+            oper(state)
+        else:
+            not_recognized(name)
+
+
+if __name__ == '__main__':
+    main()
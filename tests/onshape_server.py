@@ -0,0 +1,197 @@
+# Local stand-in for the Onshape REST API: checks the HMAC signature of every request, answers the document,
+# workspace and part studio calls, checks features against the BTM schema subset onshape.py writes, and can be
+# told to fail or stall the next requests to a path
+import json
+import re
+import threading
+import time
+from base64 import b64encode
+from hashlib import sha256
+from hmac import compare_digest, new as hmac_new
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+ACCESS_KEY = 'test-access'
+SECRET_KEY = 'test-secret'
+
+STANDARD_PLANES = {'Top', 'Front', 'Right'}
+
+# Parameters every feature type needs, with the enum each enum parameter takes and its values
+REQUIRED = {
+    'cPlane': {'cplaneType', 'entities', 'offset'},
+    'extrude': {'bodyType', 'operationType', 'entities', 'endBound', 'depth'},
+    'revolve': {'bodyType', 'operationType', 'entities', 'axis', 'revolveType'},
+    'loft': {'bodyType', 'operationType', 'sheetProfilesArray'},
+}
+ENUMS = {
+    'ExtendedToolBodyType': {'SOLID', 'SURFACE'},
+    'NewBodyOperationType': {'NEW', 'ADD', 'REMOVE', 'INTERSECT'},
+    'BoundingType': {'BLIND', 'SYMMETRIC', 'THROUGH_ALL', 'UP_TO_NEXT'},
+    'RevolveType': {'FULL', 'ONE_DIRECTION', 'SYMMETRIC', 'TWO_DIRECTIONS'},
+    'CPlaneType': {'OFFSET'},
+}
+QUERY = re.compile(r'query=(qCreatedBy\(makeId\("([^"]+)"\), EntityType\.FACE\)|qSketchRegion\(makeId\("([^"]+)"\), false\)'
+                   r'|sketchEntityQuery\(makeId\("([^"]+)"\), EntityType\.EDGE, "([^"]+)"\));')
+
+
+class Invalid(Exception):
+    pass
+
+
+class StandIn:
+    def __init__(self):
+        self.requests = []
+        self.faults = []  # (method, path, status or 'stall'), used up in order
+        self.documents = 0
+        self.elements = 0
+        self.features = {}  # element -> {featureId: feature} in creation order
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+            def do_POST(self):
+                server.handle(self)
+
+            def do_DELETE(self):
+                server.handle(self)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def signed(self, handler, path, query):
+        message = f"{handler.command}\n{handler.headers['On-Nonce']}\n{handler.headers['Date']}\n{handler.headers['Content-Type']}\n{path}\n{query}\n".lower()
+        signature = b64encode(hmac_new(SECRET_KEY.encode(), message.encode(), sha256).digest()).decode()
+        return compare_digest(handler.headers.get('Authorization', ''), f'On {ACCESS_KEY}:HmacSHA256:{signature}')
+
+    def handle(self, handler):
+        url = urlsplit(handler.path)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+        with self._lock:
+            self.requests.append((handler.command, url.path, body))
+            fault = next((f for f in self.faults if f[0] == handler.command and f[1] == url.path), None)
+            if fault:
+                self.faults.remove(fault)
+        if fault and fault[2] == 'stall':
+            time.sleep(1.0)
+            return self.reply(handler, 504, {'message': 'stalled'})
+        if fault:
+            return self.reply(handler, fault[2], {'message': 'injected fault'})
+        if not self.signed(handler, url.path, url.query):
+            return self.reply(handler, 401, {'message': 'bad signature'})
+        status, payload = self.route(handler.command, url.path.split('/')[2:], body)
+        self.reply(handler, status, payload)
+
+    def route(self, method, parts, body):
+        with self._lock:
+            if method == 'POST' and parts == ['documents']:
+                self.documents += 1
+                document = f'd{self.documents}'
+                return 200, {'id': document, 'name': body['name'], 'defaultWorkspace': {'id': f'{document}w'}}
+            if method == 'GET' and parts[0] == 'documents' and len(parts) == 2:
+                return 200, {'id': parts[1], 'defaultWorkspace': {'id': f'{parts[1]}w'}}
+            if method == 'DELETE' and parts[0] == 'documents':
+                return 200, None
+            if method == 'POST' and parts[0] == 'partstudios' and len(parts) == 5:
+                self.elements += 1
+                self.features[f'e{self.elements}'] = {}
+                return 200, {'id': f'e{self.elements}', 'name': body['name']}
+            if method == 'POST' and parts[0] == 'partstudios' and len(parts) == 8 and parts[7] == 'features' and parts[6] in self.features:
+                features = self.features[parts[6]]
+                try:
+                    feature = self.check(body, features)
+                except Invalid as e:
+                    return 400, {'message': str(e)}
+                feature = dict(feature, featureId=f'F{sum(map(len, self.features.values()))}')
+                features[feature['featureId']] = feature
+                return 200, {'feature': feature, 'featureState': {'featureStatus': 'OK'}}
+        return 404, {'message': 'not found'}
+
+    def reply(self, handler, status, payload):
+        data = json.dumps(payload).encode() if payload is not None else b''
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def check(self, body, features):
+        # The feature of an add feature call, raising Invalid where it is not what Onshape accepts
+        if set(body) != {'btType', 'feature'} or body['btType'] != 'BTFeatureDefinitionCall-1406':
+            raise Invalid('expected a BTFeatureDefinitionCall-1406 with one feature')
+        feature = body['feature']
+        parameters = {}
+        for parameter in feature.get('parameters', []):
+            parameters[parameter['parameterId']] = parameter
+            self.check_parameter(parameter, features)
+        if feature.get('btType') == 'BTMSketch-151':
+            if feature.get('featureType') != 'newSketch' or set(parameters) != {'sketchPlane'} or feature.get('constraints') != []:
+                raise Invalid(f"bad sketch {feature.get('name')}")
+            ids = [self.check_entity(entity) for entity in feature['entities']]
+            if not ids or len(set(ids)) != len(ids):
+                raise Invalid(f"sketch {feature['name']} has no or repeated entity ids")
+        elif feature.get('btType') == 'BTMFeature-134':
+            missing = REQUIRED.get(feature.get('featureType'), {None}) - set(parameters)
+            if missing:
+                raise Invalid(f"{feature.get('featureType')} {feature.get('name')} lacks {sorted(map(str, missing))}")
+        else:
+            raise Invalid(f"unknown feature type {feature.get('btType')}")
+        if not feature.get('name'):
+            raise Invalid('feature without a name')
+        return feature
+
+    def check_parameter(self, parameter, features):
+        kind = parameter.get('btType')
+        if kind == 'BTMParameterEnum-145':
+            if parameter['value'] not in ENUMS.get(parameter['enumName'], ()):
+                raise Invalid(f"{parameter['enumName']} has no value {parameter['value']}")
+        elif kind == 'BTMParameterQuantity-147':
+            if not re.fullmatch(r'-?\d+(\.\d+)?(e-?\d+)? (m|rad|deg)', parameter['expression']):
+                raise Invalid(f"bad expression {parameter['expression']!r}")
+        elif kind == 'BTMParameterBoolean-144':
+            if not isinstance(parameter['value'], bool):
+                raise Invalid(f"{parameter['parameterId']} is not a boolean")
+        elif kind == 'BTMParameterQueryList-148':
+            for query in parameter['queries']:
+                match = QUERY.fullmatch(query.get('queryString', ''))
+                if query.get('btType') != 'BTMIndividualQuery-138' or not match:
+                    raise Invalid(f"bad query {query.get('queryString')!r}")
+                target = match.group(2) or match.group(3) or match.group(4)
+                if target not in features and not (match.group(2) and target in STANDARD_PLANES):
+                    raise Invalid(f"query refers to unknown feature {target}")
+                if match.group(3) and features[target]['btType'] != 'BTMSketch-151':
+                    raise Invalid(f"{target} is no sketch")
+                if match.group(4) and not any(e['entityId'] == match.group(5) and e['isConstruction'] for e in features[target]['entities']):
+                    raise Invalid(f"{target} has no construction line {match.group(5)}")
+        elif kind == 'BTMParameterArray-2025':
+            for item in parameter['items']:
+                if item.get('btType') != 'BTMArrayParameterItem-1843':
+                    raise Invalid('bad array item')
+                for inner in item['parameters']:
+                    self.check_parameter(inner, features)
+        else:
+            raise Invalid(f"unknown parameter type {kind}")
+
+    def check_entity(self, entity):
+        geometry = entity.get('geometry', {})
+        if entity.get('btType') == 'BTMSketchCurveSegment-155' and geometry.get('btType') == 'BTCurveGeometryLine-117':
+            if entity['endParam'] <= entity['startParam'] or abs(geometry['dirX'] ** 2 + geometry['dirY'] ** 2 - 1.0) > 1e-9:
+                raise Invalid(f"degenerate line {entity['entityId']}")
+        elif entity.get('btType') == 'BTMSketchCurve-4' and geometry.get('btType') == 'BTCurveGeometryCircle-115':
+            if geometry['radius'] <= 0:
+                raise Invalid(f"degenerate circle {entity['entityId']}")
+        else:
+            raise Invalid(f"unsupported sketch entity {entity.get('btType')}")
+        return entity['entityId']
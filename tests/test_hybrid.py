@@ -0,0 +1,28 @@
+import numpy as np
+
+from dmst import dmst, flat_plate_polar
+from hybrid import LIFT_TSR, power_curve, quadratic_load, shaft_torque
+from turbine_design import turbine_design
+
+
+def starting_torque(design, polar, wind_speed):
+    lift_torque, drag_torque = shaft_torque(design, dmst(design, polar, LIFT_TSR), 0.0, wind_speed)
+    return float(lift_torque + drag_torque)
+
+
+def test_rotor_stalls_when_the_load_exceeds_the_starting_torque():
+    design, polar = turbine_design(), flat_plate_polar()
+    friction = 1.2 * starting_torque(design, polar, 5.0)
+    # Above the stall friction the load falls below the drive torque at speed, which must not count
+    curve = power_curve(design, polar, [5.0, 15.0], load=quadratic_load(0.0, friction))
+    assert not curve['self_starting'][0]
+    assert curve['power'][0] == 0.0 and curve['omega'][0] == 0.0
+    assert curve['self_starting'][1] and curve['power'][1] > 0.0
+
+
+def test_operating_point_is_the_first_speed_without_positive_net_torque():
+    design, polar = turbine_design(), flat_plate_polar()
+    curve = power_curve(design, polar, np.arange(2.0, 12.0), load=quadratic_load(1e-6))
+    assert curve['self_starting'].all()
+    lift_torque, drag_torque = shaft_torque(design, dmst(design, polar, LIFT_TSR), curve['omega'], curve['wind_speed'])
+    assert np.allclose(lift_torque + drag_torque, 1e-6 * curve['omega'] ** 2, rtol=0.05, atol=1e-4)
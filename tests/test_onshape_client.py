@@ -0,0 +1,48 @@
+import pytest
+
+from onshape import OnshapeClient, OnshapeError
+
+
+def posts(server, path):
+    return [request for request in server.requests if request[:2] == ('POST', path)]
+
+
+def test_requests_are_signed(onshape_server, onshape_client):
+    document = onshape_client.create_document('Stack')
+    assert document['name'] == 'Stack'
+    assert onshape_client.default_workspace(document['id']) == document['defaultWorkspace']['id']
+
+
+def test_keys_are_required(monkeypatch):
+    monkeypatch.delenv('ONSHAPE_ACCESS_KEY', raising=False)
+    monkeypatch.delenv('ONSHAPE_SECRET_KEY', raising=False)
+    with pytest.raises(OnshapeError, match='ONSHAPE_ACCESS_KEY'):
+        OnshapeClient()
+
+
+def test_get_is_retried_after_server_errors(onshape_server, onshape_client):
+    onshape_server.faults += [('GET', '/api/documents/d7', 503), ('GET', '/api/documents/d7', 'stall')]
+    assert onshape_client.default_workspace('d7') == 'd7w'
+    assert len([r for r in onshape_server.requests if r[1] == '/api/documents/d7']) == 3
+
+
+def test_post_is_not_retried_after_server_errors(onshape_server, onshape_client):
+    onshape_server.faults.append(('POST', '/api/documents', 500))
+    with pytest.raises(OnshapeError) as error:
+        onshape_client.create_document()
+    assert error.value.status == 500
+    assert len(posts(onshape_server, '/api/documents')) == 1
+
+
+def test_post_is_not_retried_after_a_timeout(onshape_server, onshape_client):
+    onshape_server.faults.append(('POST', '/api/documents', 'stall'))
+    with pytest.raises(OnshapeError, match='failed'):
+        onshape_client.create_document()
+    assert len(posts(onshape_server, '/api/documents')) == 1
+    assert onshape_server.documents == 0
+
+
+def test_post_is_retried_when_rate_limited(onshape_server, onshape_client):
+    onshape_server.faults.append(('POST', '/api/documents', 429))
+    assert onshape_client.create_document()['id'] == 'd1'
+    assert len(posts(onshape_server, '/api/documents')) == 2
@@ -0,0 +1,55 @@
+import math
+
+import pytest
+
+from onshape import OnshapeError, create_stack, create_turbine, hexagon, turbine_features
+from print_estimate import CONNECTOR_HEIGHT
+from turbine_design import CM, turbine_design
+
+
+def feature(server, element, name):
+    return next(f for f in server.features[element].values() if f['name'] == name)
+
+
+def test_stack_modules_are_turned_and_raised(onshape_server, onshape_client):
+    design = turbine_design()
+    phase = math.radians(40.0)
+    modules = create_stack(onshape_client, 'd1', 'd1w', design, [0.0, phase], workers=2)
+    assert [module['module'] for module in modules] == [1, 2]
+    pitch = design['turbineHeight'] + 2 * CONNECTOR_HEIGHT
+    counts = [len(turbine_features(design, module['phase'], i * pitch)) for i, module in enumerate(modules)]
+    for module, count in zip(modules, counts):
+        assert len(module['requests']) == count
+        assert len(onshape_server.features[module['element_id']]) == count
+    first, second = (module['element_id'] for module in modules)
+
+    # One feature per request, every one accepted by the stand-in's schema checks
+    assert len([r for r in onshape_server.requests if r[1].endswith('/features')]) == sum(counts)
+
+    # Module 1 starts on the Top plane, module 2 one module pitch higher
+    assert feature(onshape_server, first, 'Shaft sketch')['parameters'][0]['queries'][0]['queryString'] == 'query=qCreatedBy(makeId("Top"), EntityType.FACE);'
+    plane = feature(onshape_server, second, 'Plane 1')
+    offset = next(p for p in plane['parameters'] if p['parameterId'] == 'offset')
+    assert float(offset['expression'].split()[0]) == pytest.approx(pitch * CM)
+
+    # The hex bore of module 2 is turned by the phase offset
+    x, y = hexagon(design['holeDiameter'] / 2.0)[0]
+    for element, angle in ((first, 0.0), (second, phase)):
+        line = feature(onshape_server, element, 'Shaft hex bore sketch')['entities'][0]['geometry']
+        assert (line['pntX'], line['pntY']) == pytest.approx(((x * math.cos(angle) - y * math.sin(angle)) * CM, (x * math.sin(angle) + y * math.cos(angle)) * CM))
+
+
+def test_later_features_refer_to_earlier_feature_ids(onshape_server, onshape_client):
+    element = onshape_client.create_part_studio('d1', 'd1w', 'Module')['id']
+    create_turbine(onshape_client, 'd1', 'd1w', element, turbine_design())
+    extrude = feature(onshape_server, element, 'Shaft')
+    sketch_id = next(i for i, f in onshape_server.features[element].items() if f['name'] == 'Shaft sketch')
+    assert extrude['parameters'][2]['queries'][0]['queryString'] == f'query=qSketchRegion(makeId("{sketch_id}"), false);'
+
+
+def test_unknown_references_are_rejected(onshape_server, onshape_client):
+    element = onshape_client.create_part_studio('d1', 'd1w', 'Module')['id']
+    loft = next(f for f in turbine_features(turbine_design()) if f['featureType'] == 'loft')
+    with pytest.raises(OnshapeError) as error:
+        onshape_client.add_feature('d1', 'd1w', element, loft)
+    assert error.value.status == 400
@@ -0,0 +1,21 @@
+import numpy as np
+
+import optimizer
+import surrogate
+from optimizer import Optimizer, evaluation_context
+
+
+def test_resume_restores_the_counter_and_the_surrogate_context(tmp_path, monkeypatch):
+    monkeypatch.setattr(optimizer, 'SurrogateCache', lambda *args, **kwargs: surrogate.SurrogateCache(*args, path=str(tmp_path / 'evaluations.sqlite'), **kwargs))
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    first = Optimizer(population=4, mean_wind_speed=7.0, polar_source='flat', checkpoint=checkpoint, surrogate=True)
+    first.generation, first.units, first.metrics = 3, np.zeros((4, 2)), [{'valid': True}] * 4
+    first.archive = [([0.0, 0.0], {'valid': True})] * 10
+    first.full_evaluations = 6
+    first.save()
+
+    resumed = Optimizer(population=4, mean_wind_speed=5.0, polar_source='flat', checkpoint=checkpoint, surrogate=True)
+    resumed.load()
+    assert resumed.full_evaluations == 6
+    assert resumed.mean_wind_speed == 7.0
+    assert resumed.surrogate.context == surrogate.context_key(evaluation_context(7.0, 'flat'))
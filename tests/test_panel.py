@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pytest
+
+from panel import compare, panel_polar
+from polar_parser import read_polars
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Panel method against XFOIL 6.99 (built from the bundled source), Ncrit 9: airfoil, Reynolds number, alpha range,
+# and the largest errors accepted, each just above the measured one: RMS CL and CD over the mean |CL| and mean CD
+# of the XFOIL polar, and RMS CM (XFOIL's CM of a symmetric section is too close to 0 for a relative error)
+REFERENCES = [
+    ('0012', 1000000, 6.0, 0.07, 0.23, 0.0045),
+    ('0015', 300000, 6.0, 0.12, 0.11, 0.008),
+    ('4412', 500000, 6.0, 0.07, 0.22, 0.006),
+    ('0012', 1000000, 12.0, 0.055, 0.5, 0.007),
+    ('0015', 300000, 12.0, 0.12, 0.75, 0.016),
+    ('4412', 500000, 12.0, 0.14, 1.0, 0.027),
+]
+
+
+def reference(naca, reynolds, alpha_end=12.0):
+    polar = read_polars(os.path.join(DATA, f'xfoil_naca{naca}_re{reynolds}.txt'))[0]
+    keep = polar['alpha'] <= alpha_end
+    return {name: value[keep] if isinstance(value, np.ndarray) else value for name, value in polar.items()}
+
+
+@pytest.mark.parametrize('naca, reynolds, alpha_end, cl_error, cd_error, cm_rms', REFERENCES)
+def test_panel_polar_against_xfoil(naca, reynolds, alpha_end, cl_error, cd_error, cm_rms):
+    xfoil = reference(naca, reynolds, alpha_end)
+    result = compare(panel_polar(naca, reynolds, xfoil['alpha']), xfoil)
+    assert result['points'] == len(xfoil['alpha'])
+    assert result['CL_rms'] / np.mean(np.abs(xfoil['CL'])) < cl_error
+    assert result['CD_rms'] / np.mean(xfoil['CD']) < cd_error
+    assert result['CM_rms'] < cm_rms
+
+
+@pytest.mark.parametrize('naca, reynolds', [('0015', 300000), ('4412', 500000)])
+def test_moment_follows_xfoil_at_small_angles(naca, reynolds):
+    # The viscous decambering moment turns the inviscid nose-down slope of a thick section round, as in XFOIL
+    xfoil = reference(naca, reynolds, 3.0)
+    polar = panel_polar(naca, reynolds, xfoil['alpha'])
+    slope = np.polyfit(xfoil['alpha'], polar['CM'], 1)[0]
+    assert np.sign(slope) == np.sign(np.polyfit(xfoil['alpha'], xfoil['CM'], 1)[0])
@@ -0,0 +1,50 @@
+import re
+
+import numpy as np
+import pytest
+
+from polar_parser import parse_dumps, parse_polars, synthetic_polar
+
+
+def overflow(text, row, column):
+    # Replaces one field of a table row with asterisks of the same width, as a Fortran F format does
+    lines = text.splitlines()
+    dashes = next(i for i, line in enumerate(lines) if line.lstrip().startswith('------'))
+    fields = [(m.start(), m.end()) for m in re.finditer(r'-+', lines[dashes])]
+    start = fields[column - 1][1] if column else 0
+    end = fields[column][1]
+    line = lines[dashes + 1 + row]
+    lines[dashes + 1 + row] = line[:start] + '*' * (end - start) + line[end:]
+    return '\n'.join(lines) + '\n'
+
+
+def test_concatenated_polars():
+    alpha = np.arange(-4.0, 8.5, 0.5)
+    polars = parse_polars(''.join(synthetic_polar('NACA 0015', reynolds, alpha) for reynolds in (1e5, 2e5, 4e5)))
+    assert [polar['reynolds'] for polar in polars] == pytest.approx([1e5, 2e5, 4e5])
+    assert all(np.array_equal(polar['alpha'], alpha) for polar in polars)
+
+
+def test_overflowed_field_becomes_nan():
+    alpha = np.arange(-2.0, 3.0, 1.0)
+    text = synthetic_polar('NACA 0012', 2e5, alpha)
+    reference = parse_polars(text)[0]
+    # CD of the middle row overflows and runs into the CL field before it
+    polars = parse_polars(overflow(text, 2, 2) + synthetic_polar('NACA 0015', 3e5, alpha))
+    assert len(polars) == 2
+    assert np.isnan(polars[0]['CD'][2])
+    assert np.array_equal(polars[0]['CL'], reference['CL'])
+    assert np.array_equal(np.delete(polars[0]['CD'], 2), np.delete(reference['CD'], 2))
+    assert polars[1]['reynolds'] == pytest.approx(3e5)
+
+
+def test_overflowed_alpha_keeps_the_row():
+    text = overflow(synthetic_polar('NACA 0012', 2e5, np.arange(-2.0, 3.0, 1.0)), 0, 0)
+    polar = parse_polars(text)[0]
+    assert len(polar['alpha']) == 5 and np.isnan(polar['alpha'][0])
+
+
+def test_dump_wake_rows_are_padded():
+    dump = parse_dumps('#    s        x        y     Ue/Vinf    Dstar     Theta      Cf       H\n'
+                       ' 0.0 1.0 0.0 0.5 0.001 0.0005 0.003 2.0\n 1.1 1.1 0.0 0.8 0.002 0.001\n')[0]
+    assert np.isnan(dump['Cf'][1]) and dump['Ue/Vinf'][1] == 0.8
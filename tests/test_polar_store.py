@@ -0,0 +1,97 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from polar_parser import parse_polar, synthetic_polar
+from polar_store import ALPHA_END, ALPHA_START, PolarDatabase
+
+
+class Runner:
+    # Polar runner recording its jobs, answering with synthetic XFOIL polars
+    def __init__(self, empty=False):
+        self.jobs = []
+        self.empty = empty
+
+    def __call__(self, job):
+        self.jobs.append(job)
+        alpha = np.empty(0) if self.empty else np.arange(job['alpha_start'], job['alpha_end'] + job['alpha_step'] / 2, job['alpha_step'])
+        return parse_polar(synthetic_polar(f"NACA {job['naca']}", job['reynolds'], alpha))
+
+
+def test_lookup_runs_the_precompute_sweep(tmp_path):
+    runner = Runner()
+    database = PolarDatabase(str(tmp_path / 'polars.sqlite'), runner=runner, source='xfoil')
+    polar = database.lookup('0015', 3e5)
+    assert (runner.jobs[0]['alpha_start'], runner.jobs[0]['alpha_end']) == (ALPHA_START, ALPHA_END)
+    assert polar['alpha'][0] == ALPHA_START and polar['alpha'][-1] == ALPHA_END
+    database.lookup('NACA 0015', 3e5)
+    assert len(runner.jobs) == 1
+
+
+def test_lookup_rejects_an_empty_polar(tmp_path):
+    database = PolarDatabase(str(tmp_path / 'polars.sqlite'), runner=Runner(empty=True), source='xfoil')
+    with pytest.raises(RuntimeError, match='No converged points'):
+        database.lookup('0015', 3e5)
+
+
+def test_panel_polars_are_not_served_as_xfoil_polars(tmp_path):
+    path = str(tmp_path / 'polars.sqlite')
+    PolarDatabase(path, source='panel').lookup('0015', 3e5)
+    runner = Runner()
+    database = PolarDatabase(path, runner=runner, source='xfoil')
+    assert not database.covers('0015', 3e5)
+    database.lookup('0015', 3e5)
+    assert len(runner.jobs) == 1
+    with sqlite3.connect(path) as db:
+        assert sorted(db.execute('SELECT source FROM polars')) == [('panel',), ('xfoil',)]
+
+
+def test_runner_of_another_source_is_rejected(tmp_path):
+    database = PolarDatabase(str(tmp_path / 'polars.sqlite'), runner=Runner(), source='panel')
+    with pytest.raises(RuntimeError, match='xfoil polar to the panel database'):
+        database.lookup('0015', 3e5)
+
+
+def test_polars_without_a_source_are_set_aside(tmp_path):
+    path = str(tmp_path / 'polars.sqlite')
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE polars (airfoil TEXT, reynolds REAL, mach REAL, ncrit REAL, alpha BLOB, CL BLOB, CD BLOB, CDp BLOB, CM BLOB, '
+                   'Top_Xtr BLOB, Bot_Xtr BLOB, PRIMARY KEY (airfoil, reynolds, mach, ncrit))')
+        db.execute('INSERT INTO polars VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', ['0015', 3e5, 0.0, 9.0] + [np.zeros(3).tobytes()] * 7)
+    database = PolarDatabase(path, runner=Runner(), source='xfoil')
+    assert database.grid('0015') is None
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT COUNT(*) FROM polars_without_source').fetchone() == (1,)
+
+
+def test_tables_are_stored_until_the_grid_changes(tmp_path):
+    path = str(tmp_path / 'polars.sqlite')
+    runner = Runner()
+    table = PolarDatabase(path, runner=runner, source='xfoil').table('0015', 3e5)
+    database = PolarDatabase(path, runner=runner, source='xfoil')
+    database.lookup = None  # a stored table needs no polar
+    assert np.array_equal(database.table('0015', 3e5).cl, table.cl)
+    assert len(runner.jobs) == 1
+
+    database = PolarDatabase(path, runner=runner, source='xfoil')
+    database.add(runner(dict(runner.jobs[0], reynolds=6e5)))
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT COUNT(*) FROM polar_tables').fetchone() == (0,)
+
+
+def test_table_compiled_while_a_polar_is_added_is_not_kept(tmp_path, monkeypatch):
+    import polar_store
+    runner = Runner()
+    database = PolarDatabase(str(tmp_path / 'polars.sqlite'), runner=runner, source='xfoil')
+    compile_grids = polar_store.table_grids
+
+    def racing(*args, **kwargs):
+        database.add(runner(dict(runner.jobs[0], reynolds=6e5)))
+        return compile_grids(*args, **kwargs)
+
+    monkeypatch.setattr(polar_store, 'table_grids', racing)
+    database.table('0015', 3e5)
+    assert database.tables == {}
+    with sqlite3.connect(database.path) as db:
+        assert db.execute('SELECT COUNT(*) FROM polar_tables').fetchone() == (0,)
@@ -0,0 +1,42 @@
+import sqlite3
+
+from optimizer import evaluation_context
+from surrogate import SurrogateCache
+from turbine_design import turbine_design
+
+
+def cache(path, context, calls):
+    def evaluate(design):
+        calls.append(design)
+        return {'valid': True, 'energy_kwh': design['chordLength']}
+    return SurrogateCache(evaluate, ['energy_kwh'], context, path=str(path))
+
+
+def test_evaluations_are_kept_per_context(tmp_path):
+    calls = []
+    design = turbine_design()
+    first = cache(tmp_path / 'evaluations.sqlite', {'mean_wind_speed': 5.0}, calls)
+    first.query(design)
+    first.query(design)
+    assert len(calls) == 1
+    other = cache(tmp_path / 'evaluations.sqlite', {'mean_wind_speed': 7.0}, calls)
+    assert other.stored(design) is None
+    assert len(other.training_data()[0]) == 0
+    other.query(design)
+    assert len(calls) == 2
+
+
+def test_context_follows_wind_and_polar_source():
+    assert evaluation_context(5.0, 'flat') == evaluation_context(5, 'flat')
+    assert evaluation_context(5.0, 'flat') != evaluation_context(6.0, 'flat')
+    assert evaluation_context(5.0, 'flat') != evaluation_context(5.0, 'database')
+
+
+def test_evaluations_without_context_are_set_aside(tmp_path):
+    path = tmp_path / 'evaluations.sqlite'
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE evaluations (key TEXT PRIMARY KEY, parameters TEXT, metrics TEXT, created REAL)')
+        db.execute("INSERT INTO evaluations VALUES ('k', '{}', '{}', 0)")
+    assert len(cache(path, {}, []).training_data()[0]) == 0
+    with sqlite3.connect(path) as db:
+        assert db.execute('SELECT COUNT(*) FROM evaluations_without_context').fetchone() == (1,)
@@ -0,0 +1,112 @@
+import time
+
+import pytest
+
+
+def wait_for(app, job_id):
+    for _ in range(200):
+        if app.job_queue.get(job_id)['status'] in ('done', 'failed'):
+            return
+        time.sleep(0.01)
+    raise AssertionError('job did not finish')
+
+
+def failing(url):
+    raise RuntimeError(f"Connection refused: {url}")
+
+
+def test_failed_job_hides_the_exception(wind_app):
+    job_id = wind_app.job_queue.submit('failing', failing, 'http://api.example/geo?appid=secret')
+    wait_for(wind_app, job_id)
+    client = wind_app.app.test_client()
+    response = client.get(f'/jobs/{job_id}/result', headers={'Accept': 'application/json'})
+    assert response.status_code == 500
+    assert response.get_json() == {'status': 'failed', 'error': wind_app.job_queue.get(job_id)['error']}
+    for response in (client.get(f'/jobs/{job_id}/result'), client.get(f'/jobs/{job_id}')):
+        assert b'secret' not in response.data
+
+
+def test_pending_job_answers_json_clients_with_json(wind_app):
+    job_id = wind_app.job_queue.submit('sleeping', time.sleep, 0.5)
+    response = wind_app.app.test_client().get(f'/jobs/{job_id}/result', headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    assert response.get_json()['status'] in ('queued', 'running')
+    assert response.get_json()['error'] is None
+    html = wind_app.app.test_client().get(f'/jobs/{job_id}/result')
+    assert html.status_code == 202 and html.mimetype == 'text/html'
+
+
+def test_screening_rows_hide_upstream_errors(wind_app, capsys):
+    from screening import screen_site
+    site = {'row': 0, 'id': 'a', 'location': 'Parma', 'lat': None, 'lon': None}
+    result = screen_site(site, None, failing, None)
+    assert result['error'] == 'Geocoding failed'
+    result = screen_site(dict(site, lat=44.8, lon=10.3), None, None, lambda lat, lon: failing('http://api.example/history?appid=secret'))
+    assert result['error'] == 'Wind data request failed'
+    assert 'secret' not in str(result)
+    assert 'appid=secret' in capsys.readouterr().out
+
+
+GEONAMES = [
+    ('Paris', 48.8534, 2.3488, 2138551, 'FR', '11'),
+    ('Parma', 44.8015, 10.3279, 175895, 'IT', '45'),
+    ('Bath', 51.3751, -2.3618, 94782, 'GB', 'ENG'),
+]
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    from geocoder import Geocoder, build
+    dump = tmp_path / 'places.txt'
+    dump.write_text(''.join(f"{i}\t{name}\t{name}\t\t{lat}\t{lon}\tP\tPPL\t{country}\t\t{admin1}\t\t\t\t{population}\t\t\t\t\n"
+                            for i, (name, lat, lon, population, country, admin1) in enumerate(GEONAMES)))
+    build(str(dump), str(tmp_path / 'geocoder'))
+    return Geocoder(str(tmp_path / 'geocoder'))
+
+
+def test_lookup_takes_only_unambiguous_near_misses(gazetteer):
+    assert gazetteer.lookup('Paris')['match'] == 'exact'
+    assert gazetteer.lookup('Pariss')['name'] == 'Paris'
+    assert gazetteer.lookup('Pariss')['match'] == 'fuzzy'
+    assert gazetteer.lookup('Bth')['name'] == 'Bath'
+    assert gazetteer.lookup('Parms') is None
+    assert gazetteer.lookup('Barthe') is None
+
+
+
+def test_fuzzy_matches_are_found_among_many_neighbouring_keys(tmp_path):
+    # Thousands of keys sort between each misspelling and the name it means
+    from geocoder import Geocoder, build
+    places = GEONAMES + [(f'Paris {i}', 0.0, 0.0, 100, 'XX', '') for i in range(2000)] + \
+        [(f'Oa {i}', 0.0, 0.0, 100, 'XX', '') for i in range(2000)]
+    dump = tmp_path / 'places.txt'
+    dump.write_text(''.join(f"{i}\t{name}\t{name}\t\t{lat}\t{lon}\tP\tPPL\t{country}\t\t{admin1}\t\t\t\t{population}\t\t\t\t\n"
+                            for i, (name, lat, lon, population, country, admin1) in enumerate(places)))
+    build(str(dump), str(tmp_path / 'geocoder'))
+    gazetteer = Geocoder(str(tmp_path / 'geocoder'))
+    assert gazetteer.lookup('Pqris')['name'] == 'Paris'
+    assert gazetteer.lookup('Oaris')['name'] == 'Paris'
+    assert gazetteer.lookup('Oaris')['match'] == 'fuzzy'
+    assert [place['name'] for place in gazetteer.search('Oarys', fuzzy=True)] == ['Paris']
+
+
+
+class Response:
+    def __init__(self, places):
+        self.status_code = 200
+        self.places = places
+
+    def json(self):
+        return self.places
+
+
+def test_fuzzy_matches_defer_to_the_geocoding_api(wind_app, gazetteer, monkeypatch):
+    requests = []
+    answers = {'Pariss': [], 'Bth': [{'lat': 1.0, 'lon': 2.0}]}
+    monkeypatch.setattr(wind_app, 'get_geocoder', lambda: gazetteer)
+    monkeypatch.setattr(wind_app, 'upstream_get', lambda service, url: requests.append(url) or Response(answers[url.split('q=')[1].split('&')[0]]))
+    assert wind_app.geocode_location('Paris') == (48.8534, 2.3488)
+    assert requests == []
+    assert wind_app.geocode_location('Bth') == (1.0, 2.0)
+    assert wind_app.geocode_location('Pariss') == (48.8534, 2.3488)
+    assert len(requests) == 2
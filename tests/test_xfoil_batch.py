@@ -0,0 +1,33 @@
+import pytest
+
+from xfoil_batch import build_script, polar_job, run_polar, run_polar_batches, stage_coordinates
+
+
+def test_relative_coordinates_file_resolves_in_workdir(fake_xfoil, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'blade.dat').write_text('VAWT blade\n1.0 0.0\n0.0 0.0\n1.0 0.0\n')
+    job = polar_job(2e5, coordinates_file='blade.dat')
+    assert job['coordinates_file'] == str(tmp_path / 'blade.dat')
+    assert run_polar(job, xfoil_path=fake_xfoil)['name'] == 'VAWT blade'
+
+
+def test_long_coordinates_path_is_loaded_by_a_short_name(fake_xfoil, tmp_path):
+    directory = tmp_path / ('a_directory_name_long_enough_to_overflow_xfoil_file_names' * 2)
+    directory.mkdir()
+    (directory / 'blade.dat').write_text('VAWT blade\n1.0 0.0\n0.0 0.0\n1.0 0.0\n')
+    job = polar_job(2e5, coordinates_file=str(directory / 'blade.dat'))
+    assert len(job['coordinates_file']) > 64
+    assert run_polar(job, xfoil_path=fake_xfoil)['name'] == 'VAWT blade'
+    assert 'LOAD airfoil0.dat' in build_script([stage_coordinates(job, str(tmp_path), 'airfoil0.dat')], ['polar0.txt'])
+
+
+def test_batches_keep_job_order(fake_xfoil):
+    jobs = [polar_job(re, alpha_step=5.0) for re in (1e5, 2e5, 3e5, 4e5, 5e5)]
+    polars = run_polar_batches(jobs, batch_size=2, workers=2, xfoil_path=fake_xfoil)
+    assert [polar['reynolds'] for polar in polars] == pytest.approx([1e5, 2e5, 3e5, 4e5, 5e5])
+
+
+def test_script_ends_at_top_level():
+    script = build_script([polar_job(1e5)], ['polar0.txt']).splitlines()
+    assert script[:3] == ['PLOP', 'G F', '']
+    assert script[-1] == 'QUIT'
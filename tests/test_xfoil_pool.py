@@ -0,0 +1,53 @@
+import os
+import time
+
+import pytest
+
+from polar_parser import parse_polar
+from xfoil_batch import polar_job
+from xfoil_pool import XfoilPool, XfoilWorker
+
+
+def test_pool_runs_jobs_without_waiting_for_timeout(fake_xfoil):
+    jobs = [polar_job(re, alpha_start=-2, alpha_end=4, alpha_step=1) for re in (1e5, 2e5, 4e5, 8e5)]
+    start = time.perf_counter()
+    with XfoilPool(workers=2, xfoil_path=fake_xfoil, timeout=10.0) as pool:
+        polars = [parse_polar(text) for text in pool.map(jobs)]
+    # The end of every job is seen from XFOIL's own output, well before the timeout
+    assert time.perf_counter() - start < 10.0
+    assert [polar['reynolds'] for polar in polars] == pytest.approx([1e5, 2e5, 4e5, 8e5])
+    assert all(len(polar['alpha']) == 7 for polar in polars)
+
+
+def test_worker_reuses_its_session(fake_xfoil):
+    worker = XfoilWorker(fake_xfoil, timeout=10.0)
+    try:
+        process = worker.process
+        for re in (1e5, 3e5):
+            assert parse_polar(worker.run(polar_job(re)))['reynolds'] == pytest.approx(re)
+        assert worker.process is process
+        assert worker.jobs_run == 2
+    finally:
+        worker.close()
+
+
+def test_worker_restarts_after_crash(fake_xfoil):
+    worker = XfoilWorker(fake_xfoil, timeout=10.0)
+    try:
+        with pytest.raises(RuntimeError, match='exited'):
+            worker.run(polar_job(1e5, naca='9999'))
+        assert parse_polar(worker.run(polar_job(1e5)))['name'] == 'NACA 0015'
+    finally:
+        worker.close()
+
+
+def test_worker_loads_long_coordinates_paths(fake_xfoil, tmp_path):
+    directory = tmp_path / ('a_directory_name_long_enough_to_overflow_xfoil_file_names' * 2)
+    directory.mkdir()
+    (directory / 'blade.dat').write_text('VAWT blade\n1.0 0.0\n0.0 0.0\n1.0 0.0\n')
+    worker = XfoilWorker(fake_xfoil, timeout=10.0)
+    try:
+        assert parse_polar(worker.run(polar_job(2e5, coordinates_file=str(directory / 'blade.dat'))))['name'] == 'VAWT blade'
+        assert not [name for name in os.listdir(worker.workdir) if name.endswith('.dat')]
+    finally:
+        worker.close()
@@ -0,0 +1,145 @@
+import functools
+import math
+
+import numpy as np
+
+# Headless description of what createTurbine builds. Lengths are in Fusion internal units (cm),
+# the same values the command dialog passes to createTurbine.
+CM = 0.01  # metres per internal unit
+
+DEFAULT_DESIGN = {
+    # DragTurbine (Savonius)
+    'holeDiameter': 0.0575 * 25.4,
+    'shaftDiameter': 1.0 * 2.54,
+    'outerDiameter': 10.0 * 2.54,
+    'bladeThickness': 0.125 * 2.54,
+    'bladeDepth': 1.0 * 2.54,
+    'turbineHeight': 10.0 * 2.54,
+    'bladeCount': 2,
+    'twistCount': 1,
+    # Airfoils (Darrieus ring)
+    'nacaProfile': '0015',
+    'airfoilCount': 3,
+    'chordLength': 3.0 * 2.54,
+    'distanceFromCenter': 15.0 * 2.54,
+}
+
+
+def turbine_design(**parameters):
+    unknown = set(parameters) - set(DEFAULT_DESIGN)
+    if unknown:
+        raise ValueError(f"Unknown turbine parameters: {', '.join(sorted(unknown))}")
+    design = dict(DEFAULT_DESIGN)
+    design.update(parameters)
+    return design
+
+
+def rotor_radius(design):
+    # Radius swept by the airfoil ring in metres
+    return design['distanceFromCenter'] * CM
+
+
+def swept_area(design):
+    # Frontal area of the airfoil ring in square metres
+    return 2.0 * rotor_radius(design) * design['turbineHeight'] * CM
+
+
+def solidity(design):
+    return design['airfoilCount'] * design['chordLength'] / (2.0 * math.pi * design['distanceFromCenter'])
+
+
+def design_batch(designs):
+    # List of designs -> one dict of arrays, so models can evaluate a whole batch with broadcasting
+    batch = {}
+    for name in DEFAULT_DESIGN:
+        values = [design[name] for design in designs]
+        batch[name] = values if name == 'nacaProfile' else np.asarray(values, dtype=np.int64 if name in ('bladeCount', 'twistCount', 'airfoilCount') else np.float64)
+    return batch
+
+
+def blade_arc(design):
+    # Savonius blade arc as sketched in createTurbine: the chord runs from the shaft axis to the
+    # outer radius (outerDiameter / 2) with bladeDepth as the arc's sagitta. Works on scalars or arrays.
+    half_chord = np.asarray(design['outerDiameter']) / 4.0
+    depth = np.asarray(design['bladeDepth'])
+    radius = (half_chord ** 2 / depth + depth) / 2.0
+    sweep_angle = 2 * np.arcsin(np.minimum(np.asarray(design['outerDiameter']) / ((2 * (half_chord ** 2) / depth) + depth), 1.0))
+    return radius, sweep_angle
+
+
+def twist_angle(design):
+    # Total helical twist of the sweep in createTurbine, in radians
+    return np.radians((360.0 / np.asarray(design['bladeCount'])) * np.asarray(design['twistCount']))
+
+
+def naca_thickness(nacaProfile):
+    # Maximum thickness as a fraction of chord, the last two digits of a NACA 4-digit code
+    return int(nacaProfile[2:]) / 100.0
+
+
+def naca_symmetric(nacaProfile):
+    # No camber (NACA 00xx): CL(-alpha) = -CL(alpha)
+    return int(nacaProfile[0]) == 0
+
+
+def design_problems(design):
+    # Geometry checks createTurbine would otherwise only fail on (or silently build wrong) in Fusion
+    problems = []
+    D = design['outerDiameter']
+    depth = design['bladeDepth']
+    if len(design['nacaProfile']) != 4 or not design['nacaProfile'].isdigit():
+        problems.append("nacaProfile must be a 4-digit NACA code")
+    if depth <= 0 or D / ((2 * ((D / 4.0) ** 2) / depth) + depth) > 1.0:
+        problems.append("bladeDepth too deep for the blade sweep angle")
+    if design['bladeThickness'] >= depth:
+        problems.append("bladeThickness must be smaller than bladeDepth")
+    if design['shaftDiameter'] <= design['holeDiameter']:
+        problems.append("shaftDiameter must be larger than the hex hole")
+    if design['shaftDiameter'] >= D:
+        problems.append("shaftDiameter must be smaller than outerDiameter")
+    if not problems:
+        # Airfoil inner surface must clear the Savonius blades
+        inner = design['distanceFromCenter'] - naca_thickness(design['nacaProfile']) * design['chordLength']
+        if inner <= D / 2.0 + 0.5:
+            problems.append("airfoils intersect the drag turbine")
+        if design['airfoilCount'] * design['chordLength'] >= 0.9 * 2.0 * math.pi * design['distanceFromCenter']:
+            problems.append("airfoils overlap each other on the ring")
+    return problems
+
+
+def naca4(number, n=100, finite_TE=False, half_cosine_spacing=True):
+    # Vectorized version of the naca4 in createTurbine (same defaults as the command), unit chord.
+    # Returns the closed outline X, Y: upper surface from the leading edge, then the lower surface back.
+    m = int(number[0]) / 100.0
+    p = int(number[1]) / 10.0
+    t = int(number[2:]) / 100.0
+    i = np.arange(n + 1)
+    x = 0.5 * (1 - np.cos(np.pi * i / n)) if half_cosine_spacing else i / n
+    a4 = -0.1015 if finite_TE else -0.1036
+    yt = 5 * t * (0.2969 * np.sqrt(x) - 0.126 * x - 0.3516 * x ** 2 + 0.2843 * x ** 3 + a4 * x ** 4)
+    if m > 0:
+        front = x < p
+        yc = np.where(front, m / p ** 2 * (2 * p * x - x ** 2), m / (1 - p) ** 2 * ((1 - 2 * p) + 2 * p * x - x ** 2))
+        theta = np.arctan(np.where(front, 2 * m / p ** 2 * (p - x), 2 * m / (1 - p) ** 2 * (p - x)))
+    else:
+        yc = np.zeros_like(x)
+        theta = np.zeros_like(x)
+    xu, yu = x - yt * np.sin(theta), yc + yt * np.cos(theta)
+    xl, yl = x + yt * np.sin(theta), yc - yt * np.cos(theta)
+    return np.concatenate([xu, xl[::-1]]), np.concatenate([yu, yl[::-1]])
+
+
+@functools.lru_cache(maxsize=None)
+def naca_section(nacaProfile):
+    # (area, perimeter) of the unit-chord section createTurbine sketches, from the naca4 outline
+    X, Y = naca4(nacaProfile)
+    area = 0.5 * abs(np.dot(X, np.roll(Y, -1)) - np.dot(Y, np.roll(X, -1)))
+    perimeter = np.sum(np.hypot(np.diff(X, append=X[0]), np.diff(Y, append=Y[0])))
+    return float(area), float(perimeter)
+
+
+def naca_half_thickness(nacaProfile, x, finite_TE=False):
+    # Half thickness of the section at chord fraction x (calculate_thickness in createNacaAirfoil)
+    t = naca_thickness(nacaProfile)
+    a4 = -0.1015 if finite_TE else -0.1036
+    return 5 * t * (0.2969 * math.sqrt(x) - 0.126 * x - 0.3516 * x ** 2 + 0.2843 * x ** 3 + a4 * x ** 4)
@@ -0,0 +1,282 @@
+import argparse
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from dmst import dmst, flat_plate_polar, polar_coefficients
+from dynamic_stall import initial_state, stall_model, stall_step
+from polar_tables import compiled_table
+from turbine_design import naca_symmetric, turbine_design
+
+# Everything below is non-dimensional: lengths in rotor radii (distanceFromCenter), velocities in
+# free-stream speed, so the rotor turns at tsr radians per unit time. The wind blows along +x, the rotor
+# axis is z and the blade azimuth theta follows dmst (theta = 0 heading into the wind, 0..pi upwind).
+
+# Viscous core radius of every filament as a fraction of the chord, keeps the Biot-Savart kernel finite
+CORE_RADIUS = 0.25
+
+# Point-filament pairs evaluated per NumPy block, bounds the size of the temporaries
+BLOCK_SIZE = 1 << 16
+
+# Tree-code: filaments are binned in cubic cells of TREE_CELL_SIZE radii; a cell acts as one net vortex
+# element on points farther away than its diagonal / TREE_THETA. With half-radius cells the velocities stay
+# within about 1 % of the direct sum and the tree-code is faster from about 2000 filaments (a 2 revolution
+# wake of 3 blades and 6 elements at 24 steps); it is 3x faster at 7500 and 4x at 15000. One-radius cells are
+# within 0.1 % but only win beyond about 5000 filaments, as nearly the whole wake is then near field.
+TREE_THETA = 0.5
+TREE_CELL_SIZE = 0.5
+
+
+def _filament_terms(points, starts, ends, core):
+    # Biot-Savart of unit straight filaments starts -> ends (S, 3) at points (M, 3): velocity = factor * (r1 x r2).
+    # core cuts the 1/r singularity off inside that distance from the filament.
+    r0 = ends - starts
+    core2 = core ** 2 * np.einsum('ij,ij->i', r0, r0) + 1e-12
+    ax, ay, az = (points[:, i, None] - starts[:, i] for i in range(3))
+    bx, by, bz = (points[:, i, None] - ends[:, i] for i in range(3))
+    cx, cy, cz = ay * bz - az * by, az * bx - ax * bz, ax * by - ay * bx
+    na = np.maximum(np.sqrt(ax * ax + ay * ay + az * az), 1e-12)
+    nb = np.maximum(np.sqrt(bx * bx + by * by + bz * bz), 1e-12)
+    dot = r0[:, 0] * (ax / na - bx / nb) + r0[:, 1] * (ay / na - by / nb) + r0[:, 2] * (az / na - bz / nb)
+    return dot / (4.0 * math.pi * (cx * cx + cy * cy + cz * cz + core2)), cx, cy, cz
+
+
+def filament_kernel(points, starts, ends, core=0.0):
+    # Velocity induced at points (M, 3) by every unit-strength filament separately: (M, S, 3)
+    factor, cx, cy, cz = _filament_terms(points, starts, ends, core)
+    return np.stack((factor * cx, factor * cy, factor * cz), axis=-1)
+
+
+def direct_velocity(points, starts, ends, strengths, core=0.0, block_size=BLOCK_SIZE):
+    # O(M S) Biot-Savart sum, evaluated in blocks of points so the temporaries stay around block_size pairs
+    velocity = np.zeros(np.shape(points))
+    if len(strengths) == 0 or len(points) == 0:
+        return velocity
+    step = max(block_size // len(strengths), 1)
+    for lo in range(0, len(points), step):
+        factor, cx, cy, cz = _filament_terms(points[lo:lo + step], starts, ends, core)
+        factor *= strengths
+        velocity[lo:lo + step] = np.stack((np.sum(factor * cx, axis=1), np.sum(factor * cy, axis=1), np.sum(factor * cz, axis=1)), axis=1)
+    return velocity
+
+
+def tree_velocity(points, starts, ends, strengths, core=0.0, theta=TREE_THETA, cell_size=TREE_CELL_SIZE, block_size=BLOCK_SIZE):
+    # Cell tree-code: filaments are binned by midpoint; a cell that is far from a point (diagonal / distance
+    # below theta) acts as a single vortex element, the sum of strength * (end - start) at the cell centre,
+    # while near cells are summed filament by filament
+    velocity = np.zeros(np.shape(points))
+    if len(strengths) == 0 or len(points) == 0:
+        return velocity
+    middle = 0.5 * (starts + ends)
+    _, cell, counts = np.unique(np.floor(middle / cell_size).astype(np.int64), axis=0, return_inverse=True, return_counts=True)
+    cell = cell.ravel()
+    n_cells = len(counts)
+    centre = np.zeros((n_cells, 3))
+    moment = np.zeros((n_cells, 3))
+    np.add.at(centre, cell, middle)
+    np.add.at(moment, cell, strengths[:, None] * (ends - starts))
+    centre /= counts[:, None]
+
+    r = points[:, None, :] - centre[None, :, :]
+    distance2 = np.einsum('mci,mci->mc', r, r)
+    far = 3.0 * cell_size ** 2 < theta ** 2 * distance2
+    weight = np.where(far, 1.0 / (4.0 * math.pi * np.maximum(distance2, 1e-12) ** 1.5), 0.0)
+    velocity += np.einsum('mc,mci->mi', weight, np.cross(moment[None, :, :], r))
+
+    order = np.argsort(cell, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    for c in range(n_cells):
+        near = np.flatnonzero(~far[:, c])
+        if len(near):
+            members = order[bounds[c]:bounds[c + 1]]
+            velocity[near] += direct_velocity(points[near], starts[members], ends[members], strengths[members], core, block_size)
+    return velocity
+
+
+def lattice_filaments(nodes, rings):
+    # Net filaments of a vortex-ring lattice. nodes (B, K + 1, J + 1, 3) are rows of span nodes, rings (B, K, J)
+    # the ring strengths between neighbouring rows; shared edges carry the difference of their two rings.
+    padded = np.pad(rings, ((0, 0), (1, 1), (0, 0)))
+    spanwise = padded[:, 1:] - padded[:, :-1]  # row k, node j -> j + 1
+    padded = np.pad(rings, ((0, 0), (0, 0), (1, 1)))
+    trailing = padded[:, :, :-1] - padded[:, :, 1:]  # node j, row k -> k + 1
+    starts = np.concatenate((nodes[:, :, :-1].reshape(-1, 3), nodes[:, :-1, :].reshape(-1, 3)))
+    ends = np.concatenate((nodes[:, :, 1:].reshape(-1, 3), nodes[:, 1:, :].reshape(-1, 3)))
+    return starts, ends, np.concatenate((spanwise.ravel(), trailing.ravel()))
+
+
+def ring_kernel(points, nodes, core=0.0):
+    # Velocity at points from every unit ring between rows 0 and 1 of nodes (B, 2, J + 1, 3): (M, B * J, 3)
+    a, b = nodes[:, 0, :-1].reshape(-1, 3), nodes[:, 0, 1:].reshape(-1, 3)
+    c, d = nodes[:, 1, 1:].reshape(-1, 3), nodes[:, 1, :-1].reshape(-1, 3)
+    return sum(filament_kernel(points, s, e, core) for s, e in ((a, b), (b, c), (c, d), (d, a)))
+
+
+def blade_nodes(azimuth, z):
+    # Lifting-line nodes of every blade at radius 1: (B, len(z), 3)
+    x = -np.sin(azimuth)[:, None] * np.ones_like(z)
+    y = np.cos(azimuth)[:, None] * np.ones_like(z)
+    return np.stack((x, y, np.broadcast_to(z, x.shape)), axis=-1)
+
+
+def simulate(design, polar, tsr, revolutions=6, steps_per_revolution=24, n_span=6, wake_revolutions=4.0, core=CORE_RADIUS, tree=False, theta=TREE_THETA, cell_size=TREE_CELL_SIZE, relaxation=0.5, tolerance=1e-6, iterations=100, dynamic_stall=False):
+    # Lifting-line free-vortex wake of the airfoil ring at one tip-speed ratio. Every time step each blade sheds a
+    # row of span nodes whose vortex rings carry the bound circulation of that step; the wake is convected by
+    # the free stream plus its own induced velocity and truncated after wake_revolutions, so run more
+    # revolutions than that and keep the wake long: a short wake under-predicts the induction.
+    # dynamic_stall runs the blade loads through dynamic_stall.stall_step (needs a single polar, not a table).
+    if dynamic_stall and callable(polar):
+        raise ValueError("Dynamic stall needs a single polar, not a Reynolds-dependent table")
+    table = polar if callable(polar) else compiled_table(polar, symmetric=naca_symmetric(design['nacaProfile']))
+    blades = int(design['airfoilCount'])
+    chord = design['chordLength'] / design['distanceFromCenter']
+    height = design['turbineHeight'] / design['distanceFromCenter']
+    z = np.linspace(-0.5 * height, 0.5 * height, n_span + 1)
+    dz = np.diff(z)
+    z_control = 0.5 * (z[:-1] + z[1:])
+    phase = 2.0 * math.pi * np.arange(blades) / blades
+    dt = 2.0 * math.pi / (steps_per_revolution * tsr)
+    max_rows = max(int(round(wake_revolutions * steps_per_revolution)), 1) + 1
+    velocity_function = (lambda p, s, e, g: tree_velocity(p, s, e, g, core * chord, theta, cell_size)) if tree else (lambda p, s, e, g: direct_velocity(p, s, e, g, core * chord))
+    free_stream = np.array([1.0, 0.0, 0.0])
+    model = stall_model(polar, chord, naca_symmetric(design['nacaProfile'])) if dynamic_stall else None
+    stall = None
+
+    steps = int(round(revolutions * steps_per_revolution))
+    nodes = blade_nodes(phase - tsr * dt, z)[:, None]  # (B, rows, J + 1, 3)
+    rings = np.zeros((blades, 0, n_span))
+    circulation = np.zeros((blades, n_span))
+    history = {name: np.zeros((steps, blades, n_span)) for name in ('alpha', 'circulation', 'tangential')}
+    cq = np.zeros(steps)
+    filaments = np.zeros(steps, dtype=np.int64)
+    seconds = np.zeros(steps)
+    for step in range(steps):
+        start = time.perf_counter()
+        azimuth = phase + tsr * step * dt
+        nodes = np.concatenate((blade_nodes(azimuth, z)[:, None], nodes), axis=1)
+        control = blade_nodes(azimuth, z_control).reshape(-1, 3)
+        tangent = np.repeat(np.stack((-np.cos(azimuth), -np.sin(azimuth), np.zeros(blades)), axis=1), n_span, axis=0)
+        radial = np.repeat(np.stack((-np.sin(azimuth), np.cos(azimuth), np.zeros(blades)), axis=1), n_span, axis=0)
+
+        # Older wake at the blades, then the newest rings (strength = bound circulation) solved by fixed point
+        starts, ends, strengths = lattice_filaments(nodes[:, 1:], rings)
+        filaments[step] = len(strengths)
+        base = free_stream + velocity_function(control, starts, ends, strengths) - tsr * tangent
+        near = ring_kernel(control, nodes[:, :2], core * chord)
+        gamma = circulation.ravel()
+        for _ in range(iterations):
+            relative = base - np.einsum('msi,s->mi', near, gamma)
+            chordwise = -np.einsum('mi,mi->m', relative, tangent)
+            normal = np.einsum('mi,mi->m', relative, radial)
+            w2 = chordwise ** 2 + normal ** 2
+            alpha = np.arctan2(normal, chordwise)
+            if stall is not None:
+                cl, cd, stepped = stall_step(model, stall, alpha, np.sqrt(w2), dt, chord)
+            else:
+                cl, cd = polar_coefficients(table, alpha, w2)
+            # Kutta-Joukowski with the bound vortex pointing down the span gives lift along z x W
+            gamma_new = 0.5 * np.sqrt(w2) * chord * cl
+            change = np.max(np.abs(gamma_new - gamma))
+            gamma = gamma + relaxation * (gamma_new - gamma)
+            if change < tolerance:
+                break
+        circulation = gamma.reshape(blades, n_span)
+        if model is not None:
+            # The first step starts the lag states from the static solution
+            stall = stepped if stall is not None else initial_state(model, alpha)
+        rings = np.concatenate((-circulation[:, None], rings), axis=1)
+
+        tangential = w2 * (cl * np.sin(alpha) - cd * np.cos(alpha))
+        history['alpha'][step] = alpha.reshape(blades, n_span)
+        history['circulation'][step] = circulation
+        history['tangential'][step] = tangential.reshape(blades, n_span)
+        # Torque coefficient Q / (0.5 rho V^2 2RH R), as dmst's cq
+        cq[step] = np.sum(tangential.reshape(blades, n_span) * dz) * chord / (2.0 * height)
+
+        # Convect every wake node (the rows just shed included) and drop the oldest rows
+        starts, ends, strengths = lattice_filaments(nodes, rings)
+        flat = nodes.reshape(-1, 3)
+        nodes = (flat + dt * (free_stream + velocity_function(flat, starts, ends, strengths))).reshape(nodes.shape)
+        nodes, rings = nodes[:, :max_rows], rings[:, :max_rows - 1]
+        seconds[step] = time.perf_counter() - start
+
+    last = slice(steps - steps_per_revolution, steps)
+    return {
+        'tsr': tsr,
+        'cp': tsr * float(np.mean(cq[last])),
+        'cq': cq,
+        'azimuth': (tsr * np.arange(steps) * dt) % (2.0 * math.pi),
+        'alpha': history['alpha'],
+        'circulation': history['circulation'],
+        'tangential': history['tangential'],
+        'filaments': filaments,
+        'nodes': nodes,
+        'rings': rings,
+        'seconds': seconds,
+        'seconds_per_revolution': float(np.sum(seconds[last])),
+    }
+
+
+def _simulate_case(case):
+    return simulate(**case)
+
+
+def simulate_cases(cases, workers=None):
+    # Independent simulate() runs (dicts of its keyword arguments) across a process pool
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_simulate_case, cases))
+
+
+def benchmark(design, polar, tsr, wake_lengths=(1.0, 2.0, 4.0, 8.0), **options):
+    # Time of one revolution against the number of wake filaments, direct sum and tree-code, timed once the
+    # wake has grown to each length
+    rows = []
+    for wake in wake_lengths:
+        for tree in (False, True):
+            result = simulate(design, polar, tsr, revolutions=wake + 1.0, wake_revolutions=wake, tree=tree, **options)
+            steps = options.get('steps_per_revolution', 24)
+            rows.append((wake, tree, int(result['filaments'][-steps:].mean()), result['seconds_per_revolution'], result['cp']))
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Free-vortex wake simulation of the airfoil ring')
+    parser.add_argument('--naca', default='0015')
+    parser.add_argument('--reynolds', type=float, default=None, help='look the polar up in the polar database instead of using a flat plate')
+    parser.add_argument('--airfoil-count', type=int, default=3)
+    parser.add_argument('--chord', type=float, default=3.0, help='chord length in inches')
+    parser.add_argument('--radius', type=float, default=15.0, help='distance from center in inches')
+    parser.add_argument('--height', type=float, default=10.0, help='turbine height in inches')
+    parser.add_argument('--tsr', type=float, nargs='+', default=[2.0, 3.0, 4.0])
+    parser.add_argument('--revolutions', type=float, default=6)
+    parser.add_argument('--steps', type=int, default=24, help='time steps per revolution')
+    parser.add_argument('--span', type=int, default=6, help='lifting-line elements per blade')
+    parser.add_argument('--wake', type=float, default=4.0, help='wake length kept, in revolutions')
+    parser.add_argument('--tree', action='store_true', help='tree-code instead of the direct Biot-Savart sum')
+    parser.add_argument('--dynamic-stall', action='store_true', help='dynamic stall and virtual camber on the blade loads')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--benchmark', action='store_true', help='time per revolution vs. wake filament count')
+    args = parser.parse_args()
+
+    design = turbine_design(nacaProfile=args.naca, airfoilCount=args.airfoil_count, chordLength=args.chord * 2.54, distanceFromCenter=args.radius * 2.54, turbineHeight=args.height * 2.54)
+    if args.reynolds:
+        from polar_store import PolarDatabase
+        polar = PolarDatabase().lookup(args.naca, args.reynolds)
+    else:
+        polar = flat_plate_polar()
+    options = {'steps_per_revolution': args.steps, 'n_span': args.span}
+
+    if args.benchmark:
+        for wake, tree, filaments, seconds, cp in benchmark(design, polar, args.tsr[0], **options):
+            print(f"wake {wake:4.1f} rev  {'tree  ' if tree else 'direct'}  {filaments:6d} filaments  {seconds:8.3f} s/rev  Cp {cp:7.4f}")
+    else:
+        cases = [dict(design=design, polar=polar, tsr=tsr, revolutions=args.revolutions, wake_revolutions=args.wake, tree=args.tree, dynamic_stall=args.dynamic_stall, **options) for tsr in args.tsr]
+        start = time.perf_counter()
+        results = simulate_cases(cases, args.workers)
+        elapsed = time.perf_counter() - start
+        streamtube = dmst(design, polar, args.tsr)
+        for result, cp in zip(results, streamtube['cp']):
+            print(f"tsr={result['tsr']:4.1f}  Cp {result['cp']:7.4f} (DMST {cp:7.4f})  {result['seconds_per_revolution']:.2f} s/rev")
+        print(f"{len(cases)} cases in {elapsed:.1f} s")
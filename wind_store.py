@@ -0,0 +1,252 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+WIND_STORE_PATH = os.environ.get('WIND_STORE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wind_store')
+
+# Quantities a grid may carry: mean wind speed (m/s), Weibull shape k and scale A (m/s), air density (kg/m^3)
+VARIABLES = ['wind_speed', 'weibull_k', 'weibull_a', 'air_density']
+
+# Imported grids are cut into chunks of at most this many cells a side, each its own memory-mapped file
+CHUNK_SIZE = 1024
+
+# Cell size in degrees of the spatial index from lat/lon to the chunks covering it
+INDEX_CELL = 1.0
+
+# Weibull shape assumed where a grid only has the mean speed (k = 2 is the Rayleigh distribution)
+DEFAULT_WEIBULL_K = 2.0
+
+
+def weibull_mean(k, a):
+    return a * np.vectorize(math.gamma)(1.0 + 1.0 / np.asarray(k, dtype=np.float64))
+
+
+def weibull_moments(speeds, axis=0):
+    # Method-of-moments (Justus) fit of hourly or daily wind speeds along axis: mean, k = (sigma / mean)^-1.086
+    # and A = mean / Gamma(1 + 1/k)
+    mean = np.nanmean(speeds, axis=axis)
+    k = np.clip((np.nanstd(speeds, axis=axis) / mean) ** -1.086, 1.0, 10.0)
+    return mean, k, mean / weibull_mean(k, 1.0)
+
+
+def _axis(values):
+    # Start and spacing of a regular, ascending coordinate axis
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        raise ValueError("A grid needs at least two points along each axis")
+    step = (values[-1] - values[0]) / (len(values) - 1)
+    if step <= 0 or not np.allclose(np.diff(values), step, rtol=1e-3, atol=1e-9):
+        raise ValueError("Grid coordinates must be regularly spaced")
+    return float(values[0]), float(step)
+
+
+def read_csv(path):
+    # Points 'lat,lon,<variable>...' (latitude/longitude also accepted) on a regular grid; missing points are NaN
+    data = np.genfromtxt(path, delimiter=',', names=True, dtype=np.float64)
+    names = {name.lower(): name for name in data.dtype.names}
+    lat = data[names.get('lat') or names['latitude']]
+    lon = data[names.get('lon') or names['longitude']]
+    lats, rows = np.unique(lat, return_inverse=True)
+    lons, cols = np.unique(lon, return_inverse=True)
+    values = {}
+    for variable in VARIABLES:
+        if variable in names:
+            grid = np.full((len(lats), len(lons)), np.nan)
+            grid[rows, cols] = data[names[variable]]
+            values[variable] = grid
+    return lats, lons, values
+
+
+def read_geotiff(path, variable):
+    # One band of a north-up geographic (EPSG:4326) raster such as the Global Wind Atlas layers; needs rasterio
+    import rasterio
+    with rasterio.open(path) as source:
+        if source.crs is not None and not source.crs.is_geographic:
+            raise ValueError(f"{path} is not in geographic coordinates")
+        band = source.read(1, masked=True).astype(np.float64).filled(np.nan)
+        transform = source.transform
+    lons = transform.c + transform.a * (np.arange(band.shape[1]) + 0.5)
+    lats = transform.f + transform.e * (np.arange(band.shape[0]) + 0.5)
+    if transform.e < 0:
+        lats, band = lats[::-1], band[::-1]
+    return lats, lons, {variable: band}
+
+
+def read_netcdf(path, source_variable, variable):
+    # A (lat, lon) field, or a (time, lat, lon) wind speed series reduced to the mean and a Weibull fit; needs netCDF4
+    from netCDF4 import Dataset
+    with Dataset(path) as dataset:
+        names = dataset.variables
+        lats = np.asarray(names['lat' if 'lat' in names else 'latitude'][:], dtype=np.float64)
+        lons = np.asarray(names['lon' if 'lon' in names else 'longitude'][:], dtype=np.float64)
+        field = np.ma.filled(np.ma.asarray(names[source_variable][:], dtype=np.float64), np.nan)
+    if field.ndim == 3:
+        mean, k, a = weibull_moments(field)
+        values = {'wind_speed': mean, 'weibull_k': k, 'weibull_a': a}
+    else:
+        values = {variable: field}
+    if lats[0] > lats[-1]:
+        lats = lats[::-1]
+        values = {name: grid[::-1] for name, grid in values.items()}
+    return lats, lons, values
+
+
+class WindStore:
+    def __init__(self, path=WIND_STORE_PATH):
+        self.path = path
+        self.arrays = {}
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self.path, 'index.json')
+
+    def _load_index(self):
+        if os.path.exists(self._index_path()):
+            with open(self._index_path()) as handle:
+                self.chunks = json.load(handle)['chunks']
+        else:
+            self.chunks = []
+        # Finest grid first, so a regional high resolution import wins over a coarse global one
+        order = sorted(range(len(self.chunks)), key=lambda i: self.chunks[i]['dlat'] * self.chunks[i]['dlon'])
+        cells = {}
+        for i in order:
+            chunk = self.chunks[i]
+            lat1 = chunk['lat0'] + chunk['dlat'] * (chunk['ny'] - 1)
+            lon1 = chunk['lon0'] + chunk['dlon'] * (chunk['nx'] - 1)
+            for row in range(math.floor(chunk['lat0'] / INDEX_CELL - 1e-6), math.floor(lat1 / INDEX_CELL + 1e-6) + 1):
+                for col in range(math.floor(chunk['lon0'] / INDEX_CELL - 1e-6), math.floor(lon1 / INDEX_CELL + 1e-6) + 1):
+                    cells.setdefault((row, col), []).append(i)
+        self.cells = cells
+
+    def add_grid(self, lats, lons, values):
+        # values maps names from VARIABLES to (len(lats), len(lons)) arrays on the regular ascending lat/lon grid.
+        # Chunks overlap by one cell, so interpolation never needs a neighbouring chunk.
+        lat0, dlat = _axis(lats)
+        lon0, dlon = _axis(lons)
+        variables = [name for name in VARIABLES if name in values]
+        stacked = np.stack([np.asarray(values[name], dtype=np.float32) for name in variables])
+        ny, nx = stacked.shape[1:]
+        os.makedirs(os.path.join(self.path, 'chunks'), exist_ok=True)
+        with self._lock:
+            chunks = list(self.chunks)
+            for row in range(0, max(ny - 1, 1), CHUNK_SIZE):
+                for col in range(0, max(nx - 1, 1), CHUNK_SIZE):
+                    block = stacked[:, row:row + CHUNK_SIZE + 1, col:col + CHUNK_SIZE + 1]
+                    if np.isnan(block).all():
+                        continue
+                    name = f'{len(chunks):06d}.npy'
+                    np.save(os.path.join(self.path, 'chunks', name), np.ascontiguousarray(block))
+                    chunks.append({'file': name, 'variables': variables, 'lat0': lat0 + row * dlat, 'lon0': lon0 + col * dlon,
+                                   'dlat': dlat, 'dlon': dlon, 'ny': block.shape[1], 'nx': block.shape[2]})
+            temporary = self._index_path() + '.tmp'
+            with open(temporary, 'w') as handle:
+                json.dump({'chunks': chunks}, handle)
+            os.replace(temporary, self._index_path())
+            self._load_index()
+        return len(self.chunks)
+
+    def _array(self, i):
+        array = self.arrays.get(i)
+        if array is None:
+            array = np.load(os.path.join(self.path, 'chunks', self.chunks[i]['file']), mmap_mode='r')
+            self.arrays[i] = array
+        return array
+
+    def _sample(self, i, lat, lon):
+        # Bilinear values of chunk i at (lat, lon), nearest cell where a corner has no data; None outside
+        chunk = self.chunks[i]
+        y = (lat - chunk['lat0']) / chunk['dlat']
+        x = (lon - chunk['lon0']) / chunk['dlon']
+        if not (-1e-6 <= y <= chunk['ny'] - 1 + 1e-6 and -1e-6 <= x <= chunk['nx'] - 1 + 1e-6):
+            return None
+        y = min(max(y, 0.0), chunk['ny'] - 1.0)
+        x = min(max(x, 0.0), chunk['nx'] - 1.0)
+        row = min(int(y), chunk['ny'] - 2)
+        col = min(int(x), chunk['nx'] - 2)
+        fy, fx = y - row, x - col
+        corners = np.asarray(self._array(i)[:, row:row + 2, col:col + 2], dtype=np.float64)
+        values = (corners[:, 0, 0] * (1 - fx) + corners[:, 0, 1] * fx) * (1 - fy) + (corners[:, 1, 0] * (1 - fx) + corners[:, 1, 1] * fx) * fy
+        if np.isnan(values).any():
+            values = np.where(np.isnan(values), corners[:, int(fy >= 0.5), int(fx >= 0.5)], values)
+        return values
+
+    def lookup(self, lat, lon):
+        # Wind speed, Weibull k and A (and any other stored quantity) at a coordinate, or None without coverage.
+        # Each quantity comes from the finest chunk that has it; missing Weibull parameters follow from the mean
+        # speed with DEFAULT_WEIBULL_K, a missing mean speed from the Weibull parameters.
+        lon = (lon + 180.0) % 360.0 - 180.0
+        result = {}
+        for query in (lon, lon + 360.0):
+            for i in self.cells.get((math.floor(lat / INDEX_CELL), math.floor(query / INDEX_CELL)), ()):
+                values = self._sample(i, lat, query)
+                if values is None:
+                    continue
+                for name, value in zip(self.chunks[i]['variables'], values.tolist()):
+                    if name not in result and not math.isnan(value):
+                        result[name] = value
+        if 'wind_speed' not in result and 'weibull_a' in result:
+            result['wind_speed'] = float(weibull_mean(result.get('weibull_k', DEFAULT_WEIBULL_K), result['weibull_a']))
+        if 'wind_speed' not in result:
+            return None
+        if 'weibull_a' not in result:
+            result['weibull_k'] = result.get('weibull_k', DEFAULT_WEIBULL_K)
+            result['weibull_a'] = result['wind_speed'] / float(weibull_mean(result['weibull_k'], 1.0))
+        result.setdefault('weibull_k', DEFAULT_WEIBULL_K)
+        return result
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_wind_store():
+    # Shared store for the web apps, opened on first use
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = WindStore()
+    return _store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import gridded wind data into the offline wind store and look coordinates up')
+    parser.add_argument('command', choices=['import', 'lookup'])
+    parser.add_argument('args', nargs='+', help='files to import, or latitude and longitude to look up')
+    parser.add_argument('--store', default=WIND_STORE_PATH)
+    parser.add_argument('--variable', choices=VARIABLES, default='wind_speed', help='quantity held by a GeoTIFF or 2-D NetCDF field')
+    parser.add_argument('--source-variable', default='wind_speed', help='NetCDF variable to read')
+    parser.add_argument('--benchmark', type=int, default=10000, help='random lookups to time after a lookup')
+    args = parser.parse_args()
+
+    store = WindStore(args.store)
+    if args.command == 'import':
+        for path in args.args:
+            start = time.perf_counter()
+            extension = os.path.splitext(path)[1].lower()
+            if extension == '.csv':
+                grid = read_csv(path)
+            elif extension in ('.tif', '.tiff'):
+                grid = read_geotiff(path, args.variable)
+            elif extension in ('.nc', '.nc4'):
+                grid = read_netcdf(path, args.source_variable, args.variable)
+            else:
+                raise SystemExit(f"Unsupported file type: {path}")
+            total = store.add_grid(*grid)
+            print(f"{path}: {len(grid[0])} x {len(grid[1])} grid of {', '.join(grid[2])} in {time.perf_counter() - start:.1f} s, {total} chunks stored")
+    else:
+        lat, lon = float(args.args[0]), float(args.args[1])
+        print(store.lookup(lat, lon))
+        rng = np.random.default_rng(0)
+        lats = (lat + rng.uniform(-0.5, 0.5, args.benchmark)).tolist()
+        lons = (lon + rng.uniform(-0.5, 0.5, args.benchmark)).tolist()
+        start = time.perf_counter()
+        for a, b in zip(lats, lons):
+            store.lookup(a, b)
+        elapsed = time.perf_counter() - start
+        print(f"{args.benchmark} lookups in {elapsed * 1e3:.0f} ms ({elapsed / args.benchmark * 1e6:.1f} us each)")
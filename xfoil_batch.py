@@ -0,0 +1,128 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from polar_parser import POLAR_COLUMNS, parse_polar
+
+# XFOIL binary lookup: $XFOIL_PATH, then an xfoil on PATH (built from Website Wind/XFOIL6.99/Xfoil699src.zip),
+# then the bundled Windows executable
+XFOIL_PATH = os.environ.get('XFOIL_PATH') or shutil.which('xfoil') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Website Wind', 'XFOIL6.99', 'xfoil.exe')
+
+
+def xfoil_available(xfoil_path=XFOIL_PATH):
+    # The bundled xfoil.exe only runs on Windows
+    return os.path.exists(xfoil_path) and (os.name == 'nt' or not xfoil_path.lower().endswith('.exe'))
+
+
+def polar_job(reynolds_number, naca='0015', mach=0.0, ncrit=9.0, alpha_start=-5.0, alpha_end=15.0, alpha_step=1.0, iterations=200, coordinates_file=None):
+    return {
+        'naca': naca,
+        # XFOIL runs in its own temp directory, so a relative path would not resolve there (see stage_coordinates)
+        'coordinates_file': os.path.abspath(coordinates_file) if coordinates_file else None,
+        'reynolds': float(reynolds_number),
+        'mach': float(mach),
+        'ncrit': float(ncrit),
+        'alpha_start': float(alpha_start),
+        'alpha_end': float(alpha_end),
+        'alpha_step': float(alpha_step),
+        'iterations': int(iterations),
+    }
+
+
+def stage_coordinates(job, workdir, name):
+    # XFOIL keeps the LOAD file name in CHARACTER*64 (FNAME in XFOIL.INC) and silently cuts longer paths, so a
+    # job's coordinates file is copied into the session's directory and loaded by its short name there
+    if not job.get('coordinates_file'):
+        return job
+    shutil.copyfile(job['coordinates_file'], os.path.join(workdir, name))
+    return dict(job, coordinates_file=name)
+
+
+def job_commands(job, polar_file):
+    # Starts and ends at the XFOIL top level menu so a session can run any number of jobs
+    if job.get('coordinates_file'):
+        # Labeled coordinate file, the first line is the airfoil name
+        load = f"LOAD {job['coordinates_file']}"
+    else:
+        load = f"NACA {job['naca']}"
+    return [
+        load,
+        "PANE",
+        "OPER",
+        f"VISC {job['reynolds']}",
+        f"MACH {job['mach']}",
+        "VPAR",
+        f"N {job['ncrit']}",
+        "",
+        f"ITER {job['iterations']}",
+        "PACC",
+        polar_file,
+        "",
+        f"ASEQ {job['alpha_start']} {job['alpha_end']} {job['alpha_step']}",
+        "PACC",
+        "VISC",
+        "",
+    ]
+
+
+def build_script(jobs, polar_files):
+    # Complete session: plotting off, one polar per job, then QUIT
+    commands = ["PLOP", "G F", ""]
+    for job, polar_file in zip(jobs, polar_files):
+        commands += job_commands(job, polar_file)
+    commands.append("QUIT")
+    return '\n'.join(commands) + '\n'
+
+
+def format_polar(polar):
+    # Same table layout as an XFOIL polar file, for display
+    lines = [
+        f" Calculated polar for: {polar.get('name') or ''}",
+        f" Mach = {polar.get('mach') or 0.0:7.3f}     Re = {polar['reynolds'] / 1e6:9.3f} e 6     Ncrit = {polar.get('ncrit') or 9.0:7.3f}",
+        "",
+        "   alpha    CL        CD       CDp       CM     Top_Xtr  Bot_Xtr",
+        "  ------ -------- --------- --------- -------- -------- --------",
+    ]
+    for row in zip(*(polar[name] for name in POLAR_COLUMNS)):
+        if any(value != value for value in row):
+            continue  # Unconverged point
+        lines.append(" %7.3f %8.4f %9.5f %9.5f %8.4f %8.4f %8.4f" % row)
+    return '\n'.join(lines) + '\n'
+
+
+def run_polars(jobs, xfoil_path=XFOIL_PATH, timeout=60.0):
+    # Runs every job in a single XFOIL session fed from stdin in one shot
+    if not os.path.exists(xfoil_path):
+        raise FileNotFoundError(f"XFOIL executable not found at: {xfoil_path}")
+    with tempfile.TemporaryDirectory(prefix='xfoil_') as workdir:
+        polar_files = [f"polar{i}.txt" for i in range(len(jobs))]
+        jobs = [stage_coordinates(job, workdir, f"airfoil{i}.dat") for i, job in enumerate(jobs)]
+        try:
+            subprocess.run([xfoil_path], input=build_script(jobs, polar_files), cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            raise RuntimeError(f"XFOIL timed out after {timeout} s")
+        except Exception as e:
+            raise RuntimeError(f"Failed to run XFOIL: {e}")
+
+        results = []
+        for polar_file in polar_files:
+            polar_path = os.path.join(workdir, polar_file)
+            if not os.path.exists(polar_path):
+                raise FileNotFoundError("XFOIL did not create the polar file.")
+            with open(polar_path, "r") as file:
+                results.append(parse_polar(file.read()))
+        return results
+
+
+def run_polar(job, xfoil_path=XFOIL_PATH, timeout=60.0):
+    return run_polars([job], xfoil_path, timeout)[0]
+
+
+def run_polar_batches(jobs, batch_size=8, workers=None, xfoil_path=XFOIL_PATH, timeout=60.0):
+    # Splits jobs into sessions of batch_size polars and runs the sessions in parallel
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        results = executor.map(lambda batch: run_polars(batch, xfoil_path, timeout * len(batch)), batches)
+        return [polar for batch in results for polar in batch]
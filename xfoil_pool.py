@@ -0,0 +1,173 @@
+import itertools
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future
+
+from xfoil_batch import XFOIL_PATH, job_commands, stage_coordinates
+
+# Unknown top level command sent after every job. XFOIL reads commands into CHARACTER*4 and cuts them at the
+# first digit, so the marker is four letters; once the job is done it answers with format 1050 of xfoil.f:
+# ' ZZZZ command not recognized.  Type a "?" for command list'
+SENTINEL = 'ZZZZ'
+SENTINEL_REPLY = 'command not recognized'
+
+_job_ids = itertools.count()
+
+
+class XfoilWorker:
+    def __init__(self, xfoil_path=XFOIL_PATH, timeout=60.0):
+        self.xfoil_path = xfoil_path
+        self.timeout = timeout
+        self.workdir = tempfile.mkdtemp(prefix='xfoil_')
+        self.jobs_run = 0
+        self.process = None
+        self.start()
+
+    def start(self):
+        if not os.path.exists(self.xfoil_path):
+            raise FileNotFoundError(f"XFOIL executable not found at: {self.xfoil_path}")
+        # gfortran block-buffers stdout when it is a pipe, which would hold the marker reply back until exit
+        env = dict(os.environ, GFORTRAN_UNBUFFERED_PRECONNECTED='y')
+        try:
+            self.process = subprocess.Popen([self.xfoil_path], cwd=self.workdir, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1)
+        except Exception as e:
+            raise RuntimeError(f"Failed to start XFOIL: {e}")
+        self.lines = queue.Queue()
+        self.reader = threading.Thread(target=self._read_output, args=(self.process, self.lines), daemon=True)
+        self.reader.start()
+        # Turn off the plot window so XFOIL runs headless
+        self.send(["PLOP", "G F", ""])
+
+    @staticmethod
+    def _read_output(process, lines):
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def send(self, commands):
+        self.process.stdin.write('\n'.join(commands) + '\n')
+        self.process.stdin.flush()
+
+    def run(self, job):
+        job_id = next(_job_ids)
+        polar_file = f"polar{job_id}.txt"
+        polar_path = os.path.join(self.workdir, polar_file)
+        coordinates_path = os.path.join(self.workdir, f"airfoil{job_id}.dat")
+        job = stage_coordinates(job, self.workdir, os.path.basename(coordinates_path))
+        try:
+            self.send(job_commands(job, polar_file) + [SENTINEL])
+            self._wait_for_sentinel()
+            if not os.path.exists(polar_path):
+                raise FileNotFoundError("XFOIL did not create the polar file.")
+            with open(polar_path, "r") as file:
+                return file.read()
+        except Exception:
+            # A session in an unknown state is not reused
+            self.restart()
+            raise
+        finally:
+            self.jobs_run += 1
+            for path in (polar_path, coordinates_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _wait_for_sentinel(self):
+        while True:
+            try:
+                line = self.lines.get(timeout=self.timeout)
+            except queue.Empty:
+                raise RuntimeError(f"XFOIL timed out after {self.timeout} s")
+            if line is None:
+                raise RuntimeError("XFOIL exited unexpectedly")
+            if SENTINEL in line and SENTINEL_REPLY in line:
+                return
+
+    def restart(self):
+        self.kill()
+        self.start()
+
+    def kill(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self._release()
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            try:
+                self.send(["", "QUIT"])
+                self.process.wait(timeout=5)
+            except Exception:
+                self.kill()
+        self._release()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def _release(self):
+        # Pipes of the exited process; the reader stops at the end of its output
+        if self.process:
+            self.reader.join(timeout=5)
+            for pipe in (self.process.stdin, self.process.stdout):
+                try:
+                    pipe.close()
+                except OSError:
+                    pass
+
+
+class XfoilPool:
+    def __init__(self, workers=None, xfoil_path=XFOIL_PATH, timeout=60.0):
+        self.jobs = queue.Queue()
+        self.workers = [XfoilWorker(xfoil_path, timeout) for _ in range(workers or os.cpu_count() or 1)]
+        self.busy = 0
+        self._lock = threading.Lock()
+        self.threads = []
+        for worker in self.workers:
+            thread = threading.Thread(target=self._serve, args=(worker,), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _serve(self, worker):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                worker.close()
+                return
+            job, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self.busy += 1
+            try:
+                future.set_result(worker.run(job))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+
+    def submit(self, job):
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def map(self, jobs):
+        futures = [self.submit(job) for job in jobs]
+        return [future.result() for future in futures]
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def close(self):
+        for _ in self.workers:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()